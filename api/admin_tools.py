@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+from .replicas import use_replica
+
+"""
+Общие части админки для больших таблиц (миллионы строк).
+- EstimatedCountPaginator: для нефильтрованного списка вместо COUNT(*) берётся оценка числа строк
+  из статистики СУБД (PostgreSQL pg_class.reltuples, MySQL information_schema); если оценки нет
+  или таблица меньше ADMIN_ESTIMATED_COUNT_THRESHOLD — обычный COUNT(*).
+- ScalableModelAdmin: без второго COUNT(*) для "всего записей", поиск по префиксу
+  (field LIKE 'term%' — идёт по B-tree индексу) вместо icontains по всем полям, и навигация
+  по датам без SELECT DISTINCT по всей таблице (templatetags/scalable_admin.py).
+  Список (GET changelist) читается с реплики, если она настроена (api.replicas).
+"""
+
+# pk — это BIGINT, более длинные числа в поиске не рассматриваем
+_MAX_PK_DIGITS = 18
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Оценка числа строк таблицы model по статистике СУБД или None, если оценки нет.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+        params = [connection.ops.quote_name(table)]
+    elif connection.vendor == 'mysql':
+        sql = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+        params = [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    # reltuples = -1 у таблицы, по которой ещё не было ANALYZE
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator, у которого count для нефильтрованного queryset — оценка из статистики СУБД.
+    Фильтрованные списки (поиск, фильтры, дата) считаются точно: они уже сужены индексом.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.has_filters():
+            estimate = estimated_row_count(qs.model, qs.db)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    База для ModelAdmin больших таблиц. search_fields — простые имена полей (без ^, =, @),
+    по каждому ищется префикс с учётом регистра; число из цифр дополнительно ищется как pk.
+    Поля поиска должны быть проиндексированы (на PostgreSQL — с varchar_pattern_ops,
+    для unique-полей Django создаёт такой индекс сам).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/scalable_change_list.html'
+    search_help_text = "Поиск по началу значения (с учётом регистра) или по id."
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        query = Q()
+        if term.isdigit() and len(term) <= _MAX_PK_DIGITS:
+            query |= Q(pk=int(term))
+        for field in self.get_search_fields(request):
+            query |= Q(**{f'{field}__startswith': term})
+        # поиск только по полям самой модели и прямым FK — дублей строк не бывает
+        return queryset.filter(query), False
+
+    def changelist_view(self, request, extra_context=None):
+        # POST changelist — действия и list_editable, они пишут и читают из default
+        if request.method == 'GET':
+            with use_replica():
+                return super().changelist_view(request, extra_context)
+        return super().changelist_view(request, extra_context)
@@ -0,0 +1,310 @@
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.utils.log import log_response
+from django.views import View
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import Throttled
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from assessments.models import Assessment
+from assessments.pagination import AssessmentCursorPagination
+from assessments.serializers import AssessmentSerializer
+from planner.ai.cache import generate_parsed_plan_cached
+from planner.executor import ExecutorSaturated, get_plan_executor
+from planner.models import LearningPlan
+from planner.pagination import InvalidCursor, akeyset_page
+from planner.storage import store_plan
+from planner.views import _job_body, enqueue_for, validate_plan_request, wants_async
+from users.hashing import get_hash_executor, hash_new_password, verify_password
+from users.models import User
+from users.onboarding import save_users
+from users.serializers import UserSerializer
+from users.views import _user_data
+
+from .replicas import use_replica
+from .response_cache import (
+    add_validators,
+    conditional_response,
+    get_response_cache,
+    validators,
+)
+from .throttling import AuthRateThrottle, PlannerRateThrottle
+
+"""
+Async-варианты PlannerView, списка/деталей оценок, входа и регистрации для ASGI (config/asgi.py).
+Запросы к БД идут через async ORM, поток на время ожидания не занимается; генерация плана
+уходит в ограниченный пул (planner.executor), хэширование паролей — в свой пул
+(users.hashing), а при заполнении пула — 503 с Retry-After.
+Ответы совпадают по формату с DRF-версиями, кроме курсора списка оценок: здесь он keyset
+(как в planner.pagination), а не курсор CursorPagination.
+Запись в транзакции (store_plan, enqueue_for) async в Django 4.2 не поддерживается
+и выполняется через sync_to_async.
+"""
+
+logger = logging.getLogger(__name__)
+
+RETRY_AFTER_SECONDS = 1
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    # кодировщик DRF — даты и Decimal сериализуются так же, как в синхронных view
+    return JsonResponse(data, status=status_code, safe=False, encoder=JSONEncoder,
+                        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def _limit(value, default, maximum):
+    try:
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+def _busy(request, message):
+    response = _json({"error": message}, status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    # отказ при перегрузке — штатный: warning вместо error, иначе обработчик Django логирует
+    # каждый 503 как ошибку (mail_admins при DEBUG=False рендерит отчёт — дороже самого запроса)
+    log_response("Service Unavailable (load shed): %s", request.path, response=response,
+                 request=request, level='warning')
+    return response
+
+
+async def _throttled(throttle, request, view):
+    """
+    None, если throttle пропускает запрос, иначе ответ 429 — тело и Retry-After как у DRF
+    для исключения Throttled.
+    """
+    # без лимита — без перехода в поток (allow_request сразу пропускает)
+    if throttle.rate is None or await sync_to_async(throttle.allow_request)(request, view):
+        return None
+    exc = Throttled(throttle.wait())
+    response = _json({"detail": str(exc.detail)}, exc.status_code)
+    if exc.wait is not None:
+        response['Retry-After'] = str(exc.wait)
+    return response
+
+
+def _payload(request):
+    """
+    (тело запроса, None) или (None, ответ 400), если тело — не JSON.
+    """
+    try:
+        return json.loads(request.body or b'{}'), None
+    except ValueError as e:
+        return None, _json({"detail": f"JSON parse error - {e}"}, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncJSONView(View):
+    """
+    База async-view с JSON-ответами. Как и APIView, не требует CSRF-токена.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return _json({"detail": f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class AsyncPlannerView(AsyncJSONView):
+    """
+    GET/POST как у planner.views.PlannerView, включая лимит POST (PlannerRateThrottle; DRF-аутентификации
+    здесь нет, поэтому ключ — пользователь сессии или IP).
+    """
+
+    async def get(self, request):
+        limit = _limit(request.GET.get('limit', 10), 10, 100)
+        plans_qs = LearningPlan.objects.values('id', 'created_at', 'title', 'focus_keys', 'task_count')
+        try:
+            with use_replica():
+                rows, next_cursor = await akeyset_page(plans_qs, request.GET.get('cursor'), limit)
+        except InvalidCursor as e:
+            return _json({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+        plans = [{
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "plan_summary": {
+                "title": row["title"],
+                "focus": row["focus_keys"],
+                "task_count": row["task_count"],
+            },
+        } for row in rows]
+        return _json({
+            "count": len(plans),
+            "plans": plans,
+            "next_cursor": next_cursor,
+            "next": replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor) if next_cursor else None,
+        })
+
+    async def post(self, request):
+        throttled = await _throttled(PlannerRateThrottle(), request, self)
+        if throttled is not None:
+            return throttled
+        payload, error = _payload(request)
+        if error is not None:
+            return error
+        user_data, parsed, error = validate_plan_request(payload)
+        if error:
+            return _json(*error)
+        if wants_async(payload):
+            # request.user ленивый и читает сессию из БД — в потоке вместе с записью задания
+            job = await sync_to_async(enqueue_for)(request, [{"user_data": user_data, "user_id": payload.get('user_id')}])
+            return _json(_job_body(job), status.HTTP_202_ACCEPTED)
+        try:
+            learning_plan = await get_plan_executor().run(generate_parsed_plan_cached, parsed)
+        except ExecutorSaturated:
+            return _busy(request, "Planner is busy, retry later.")
+        try:
+            new_plan = LearningPlan.from_generated(user_data, learning_plan)
+            await sync_to_async(store_plan)(new_plan)
+        except Exception as e:
+            logger.exception("Error generating learning plan")
+            return _json({"error": "Failed to generate learning plan", "detail": str(e)},
+                         status.HTTP_500_INTERNAL_SERVER_ERROR)
+        response_data = {"plan_id": new_plan.id, "plan": learning_plan}
+        if parsed.warnings:
+            response_data["warnings"] = parsed.warnings
+        return _json(response_data, status.HTTP_201_CREATED)
+
+
+class AsyncAssessmentList(AsyncJSONView):
+    """
+    GET: страница оценок (?page_size=, ?cursor=) в порядке (-created_at, -id), один запрос.
+    """
+
+    async def get(self, request):
+        paginator = AssessmentCursorPagination
+        size = _limit(request.GET.get(paginator.page_size_query_param), paginator.page_size,
+                      paginator.max_page_size)
+        try:
+            with use_replica():
+                rows, next_cursor = await akeyset_page(
+                    Assessment.objects.with_related(), request.GET.get(paginator.cursor_query_param), size)
+        except InvalidCursor as e:
+            return _json({"detail": str(e)}, status.HTTP_404_NOT_FOUND)
+        url = request.build_absolute_uri()
+        return _json({
+            "next": replace_query_param(url, paginator.cursor_query_param, next_cursor) if next_cursor else None,
+            "previous": None,
+            # все связи уже подгружены with_related() — сериализатор к БД не обращается
+            "results": AssessmentSerializer(rows, many=True).data,
+        })
+
+
+class AsyncAssessmentDetail(AsyncJSONView):
+    """
+    GET как у AssessmentDetail: кэш ответов и ETag/Last-Modified (api.response_cache).
+    """
+    cache_namespace = 'assessment'
+
+    async def get(self, request, pk):
+        cache = get_response_cache()
+        entry = await cache.aget(self.cache_namespace, pk)
+        instance = None
+        if entry is None:
+            try:
+                instance = await Assessment.objects.with_related().aget(pk=pk)
+            except Assessment.DoesNotExist:
+                return _json({"detail": "Not found."}, status.HTTP_404_NOT_FOUND)
+            entry = validators(self.cache_namespace, instance.pk, instance.updated_at)
+        conditional = conditional_response(request, entry)
+        if conditional is not None:
+            cache.not_modified(self.cache_namespace)
+            return add_validators(conditional, entry)
+        if instance is not None:
+            entry["data"] = dict(AssessmentSerializer(instance).data)
+            await cache.aset(self.cache_namespace, pk, entry)
+        return add_validators(_json(entry["data"]), entry)
+
+
+def _credentials(payload):
+    payload = payload if isinstance(payload, dict) else {}
+    return (str(payload.get('email') or '').strip().lower(), payload.get('password'), payload)
+
+
+class AsyncLoginView(AsyncJSONView):
+    """
+    POST как у users.views.LoginView (токен): { "email", "password" } -> { "token", "user" }.
+    Пароль проверяется в пуле хэширования; сверх лимита по IP — 429 (AuthRateThrottle),
+    при заполненном пуле — 503. Устаревший хэш пароля обновляется, как при authenticate().
+    """
+
+    async def post(self, request):
+        throttled = await _throttled(AuthRateThrottle(), request, self)
+        if throttled is not None:
+            return throttled
+        payload, error = _payload(request)
+        if error is not None:
+            return error
+        email, password, _ = _credentials(payload)
+        if not email or not password:
+            return _json({"error": "email и password обязательны."}, status.HTTP_400_BAD_REQUEST)
+
+        executor = get_hash_executor()
+        AuthUser = get_user_model()
+        try:
+            # отказ при заполненном пуле — до запроса к БД, чтобы шторм не нагружал и её
+            executor.admit()
+            user = await AuthUser._default_manager.filter(**{AuthUser.USERNAME_FIELD: email}).afirst()
+            valid, new_hash = await executor.run(
+                verify_password, str(password), user.password if user is not None else None)
+        except ExecutorSaturated:
+            return _busy(request, "Authentication is busy, retry later.")
+        # неактивный пользователь — как у ModelBackend: неверные учетные данные
+        if not valid or not user.is_active:
+            return _json({"error": "Неверные учетные данные."}, status.HTTP_401_UNAUTHORIZED)
+        if new_hash is not None:
+            user.password = new_hash
+            await user.asave(update_fields=['password'])
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return _json({"token": token.key, "user": _user_data(user)})
+
+
+class AsyncRegisterView(AsyncJSONView):
+    """
+    POST как у users.views.RegisterView: { "email", "password", "first_name"?, "last_name"? }
+    -> 201 с users.User. validate_password и хэширование — в пуле хэширования (429/503 как
+    у AsyncLoginView); пользователь аутентификации и users.User создаются в одной транзакции.
+    """
+
+    async def post(self, request):
+        throttled = await _throttled(AuthRateThrottle(), request, self)
+        if throttled is not None:
+            return throttled
+        payload, error = _payload(request)
+        if error is not None:
+            return error
+        email, password, payload = _credentials(payload)
+        if not email or not password:
+            return _json({"error": "email и password обязательны."}, status.HTTP_400_BAD_REQUEST)
+        exists = {"error": "Пользователь с таким email уже существует."}
+        row = {"email": email,
+               "first_name": str(payload.get('first_name') or '').strip(),
+               "last_name": str(payload.get('last_name') or '').strip()}
+        executor = get_hash_executor()
+        try:
+            executor.admit()
+            # дубликат отсекается до хэширования — без затрат пула
+            if await User.objects.filter(email=email).aexists():
+                return _json(exists, status.HTTP_400_BAD_REQUEST)
+            result = await executor.run(hash_new_password, str(password), row)
+        except ExecutorSaturated:
+            return _busy(request, "Registration is busy, retry later.")
+        if isinstance(result, list):
+            return _json({"error": "Неподходящий пароль.", "details": result}, status.HTTP_400_BAD_REQUEST)
+        row["hash"] = result
+        try:
+            api_user, = await sync_to_async(save_users)([row])
+        except IntegrityError:
+            return _json(exists, status.HTTP_400_BAD_REQUEST)
+        return _json(UserSerializer(api_user).data, status.HTTP_201_CREATED)
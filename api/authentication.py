@@ -0,0 +1,156 @@
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache_backends import bounded_timeout
+
+"""
+Token-аутентификация DRF с кэшем token -> пользователь.
+TokenAuthentication на каждый запрос делает SELECT токена с JOIN пользователя; здесь найденный
+токен кладётся в Django-кэш TOKEN_AUTH_CACHE_ALIAS на TOKEN_AUTH_CACHE_TIMEOUT секунд, и повторные
+запросы с тем же токеном к БД не обращаются. В кэше — только значения полей: время создания
+токена и поля пользователя без пароля (хэш пароля в кэш не попадает); на hit пользователь
+собирается как загруженный с .defer('password'), так что save() пароль не перезапишет.
+Ключ кэша — sha256 токена (сам токен в кэш не попадает), плюс индекс пользователь -> ключ,
+чтобы снять запись по пользователю без запроса к БД.
+Инвалидация (api/signals.py) — сразу и ещё раз после коммита транзакции: удаление токена
+(LogoutView) и любое сохранение пользователя, кроме обновления last_login при входе
+(деактивация, смена пароля, прав). Во всех воркерах она действует только на общем кэше
+(CACHE_URL); на кэше процесса TTL ограничен LOCAL_CACHE_MAX_TIMEOUT (api.cache_backends).
+TTL ограничивает и срок жизни записи, если сигнал не пришёл (изменение через queryset.update()).
+Счётчики hits/misses/invalidations — по процессу, как у кэша ответов (api.response_cache).
+"""
+
+
+def _digest(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _user_fields():
+    return [f.attname for f in get_user_model()._meta.concrete_fields if f.attname != 'password']
+
+
+class TokenCache:
+    """
+    Кэш токенов поверх Django-кэша. backend — объект кэша или None (кэширование выключено).
+    """
+
+    def __init__(self, backend=None, timeout: int = 300, prefix: str = 'authtoken'):
+        self.backend = backend
+        self.timeout = timeout
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _token_key(self, digest: str) -> str:
+        return f"{self.prefix}:token:{digest}"
+
+    def _user_key(self, user_id: Any) -> str:
+        return f"{self.prefix}:user:{user_id}"
+
+    def get(self, key: str):
+        """
+        Token (с token.user) из кэша или None.
+        """
+        value = self.backend.get(self._token_key(_digest(key))) if self.backend is not None else None
+        self._count("hits" if value is not None else "misses")
+        if value is None:
+            return None
+        created, user_values = value
+        user = get_user_model().from_db(DEFAULT_DB_ALIAS, _user_fields(), user_values)
+        token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id', 'created'], [key, user.pk, created])
+        token.user = user
+        return token
+
+    def set(self, token) -> None:
+        if self.backend is None:
+            return
+        digest = _digest(token.key)
+        value = (token.created, tuple(getattr(token.user, field) for field in _user_fields()))
+        self.backend.set_many({self._token_key(digest): value, self._user_key(token.user_id): digest},
+                              bounded_timeout(self.backend, self.timeout))
+
+    def _delete(self, keys) -> None:
+        self.backend.delete_many(keys)
+        transaction.on_commit(lambda: self.backend.delete_many(keys))
+
+    def invalidate(self, key: str) -> None:
+        self._count("invalidations")
+        if self.backend is not None:
+            self._delete([self._token_key(_digest(key))])
+
+    def invalidate_user(self, user_id: Any) -> None:
+        if self.backend is None:
+            return
+        user_key = self._user_key(user_id)
+        digest = self.backend.get(user_key)
+        if digest is None:
+            return
+        self._count("invalidations")
+        self._delete([self._token_key(digest), user_key])
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        return dict(counters, enabled=self.backend is not None, timeout=bounded_timeout(self.backend, self.timeout),
+                    hit_rate=counters["hits"] / lookups if lookups else 0.0)
+
+
+_token_cache: Optional[TokenCache] = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCache:
+    """
+    Кэш токенов процесса, сконфигурированный из settings (создаётся лениво).
+    """
+    global _token_cache
+    if _token_cache is None:
+        from django.conf import settings
+        from django.core.cache import caches
+
+        with _token_cache_lock:
+            if _token_cache is None:
+                alias = getattr(settings, 'TOKEN_AUTH_CACHE_ALIAS', None)
+                _token_cache = TokenCache(
+                    backend=caches[alias] if alias else None,
+                    timeout=getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300),
+                )
+    return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication (заголовок "Authorization: Token <key>") с кэшем токенов.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = cache.get(key)
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if token.user.is_active:
+                cache.set(token)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+
+"""
+Общие правила для кэшей с инвалидацией по сигналам (api.authentication, api.response_cache).
+Сигнал удаляет запись только в кэше того процесса, который сделал запись в БД; у LocMem
+(кэш по умолчанию без CACHE_URL) остальные воркеры видят старую запись до истечения TTL,
+поэтому на нём TTL ограничивается LOCAL_CACHE_MAX_TIMEOUT.
+"""
+
+
+def is_process_local(backend) -> bool:
+    return isinstance(backend, LocMemCache)
+
+
+def bounded_timeout(backend, timeout: int) -> int:
+    """
+    TTL для записей с инвалидацией по сигналам: как есть на общем кэше, не больше
+    LOCAL_CACHE_MAX_TIMEOUT — на кэше процесса.
+    """
+    if backend is not None and is_process_local(backend):
+        return min(timeout, settings.LOCAL_CACHE_MAX_TIMEOUT)
+    return timeout
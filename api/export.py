@@ -0,0 +1,183 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models, router
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from assessments.models import Assessment, UserResponse
+from users.models import User, UserProfile
+from users.onboarding import chunked
+
+"""
+Потоковая выгрузка таблиц в NDJSON или CSV (GET /api/export/<name>/, manage.py export_data).
+Строки читаются курсором (.values_list().iterator(chunk_size)) — на PostgreSQL серверным,
+кодируются пачками по chunk_size и сразу отдаются клиенту (опционально через gzip), так что
+память не зависит от числа строк: в каждый момент в процессе одна пачка.
+Инкрементальная выгрузка: since — строки с updated_at > since; верхняя граница until
+фиксируется при старте (now - EXPORT_WATERMARK_LAG) и возвращается (X-Export-Until, итог
+команды) — это since следующей выгрузки. Отставание нужно, потому что updated_at ставится при
+save(), а видна строка только после commit: транзакция дольше EXPORT_WATERMARK_LAG может
+попасть между двумя выгрузками. Порядок — (updated_at, id) по индексу, без сортировки.
+Удаления не выгружаются.
+"""
+
+
+class ExportSpec(NamedTuple):
+    name: str
+    model: type
+    fields: Tuple[str, ...]
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    spec.name: spec for spec in (
+        ExportSpec('users', User,
+                   ('id', 'email', 'first_name', 'last_name', 'profile', 'created_at', 'updated_at')),
+        ExportSpec('profiles', UserProfile,
+                   ('id', 'user_id', 'date_of_birth', 'gender', 'preferences', 'updated_at')),
+        ExportSpec('responses', UserResponse,
+                   ('id', 'user_id', 'test_id', 'answers', 'score', 'created_at', 'updated_at')),
+        ExportSpec('assessments', Assessment,
+                   ('id', 'title', 'user_id', 'response_id', 'evaluator_id', 'score', 'result', 'metadata',
+                    'created_at', 'updated_at')),
+    )
+}
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+GZIP_LEVEL = 6
+
+
+def _default(value):
+    # без усечения микросекунд (DjangoJSONEncoder режет до миллисекунд) и без потери точности Decimal
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# один кодировщик на процесс: json.dumps с параметрами создаёт новый на каждую строку
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default).encode
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return _dumps(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def parse_since(value: Optional[str]) -> Optional[datetime]:
+    """
+    ISO 8601 дата-время (без зоны — в TIME_ZONE) или None. ValueError, если не разбирается.
+    """
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f"Invalid since: {value!r}; expected ISO 8601 datetime.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Export:
+    """
+    Одна выгрузка: name из EXPORTS (KeyError, если нет), fmt — ndjson | csv. Алиас БД
+    определяется при создании (внутри use_replica() — реплика), until — тоже.
+    chunks() — генератор байтов; rows — число отданных строк.
+    """
+
+    def __init__(self, name: str, fmt: str = 'ndjson', since: Optional[datetime] = None,
+                 chunk_size: Optional[int] = None, using: Optional[str] = None):
+        self.spec = EXPORTS[name]
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt!r}; use one of: {', '.join(FORMATS)}.")
+        self.fmt = fmt
+        self.since = since
+        self.until = timezone.now() - timedelta(seconds=settings.EXPORT_WATERMARK_LAG)
+        self.chunk_size = max(1, chunk_size or settings.EXPORT_CHUNK_SIZE)
+        self.using = using or router.db_for_read(self.spec.model)
+        self.rows = 0
+
+    @property
+    def content_type(self) -> str:
+        return FORMATS[self.fmt][0]
+
+    @property
+    def filename(self) -> str:
+        return f"{self.spec.name}.{FORMATS[self.fmt][1]}"
+
+    def queryset(self) -> models.QuerySet:
+        queryset = self.spec.model._default_manager.using(self.using).filter(updated_at__lte=self.until)
+        if self.since is not None:
+            queryset = queryset.filter(updated_at__gt=self.since)
+        return queryset.order_by('updated_at', 'id')
+
+    def chunks(self) -> Iterator[bytes]:
+        fields = self.spec.fields
+        rows = self.queryset().values_list(*fields).iterator(chunk_size=self.chunk_size)
+        if self.fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(fields)
+            for batch in chunked(rows, self.chunk_size):
+                writer.writerows([_csv_cell(value) for value in row] for row in batch)
+                self.rows += len(batch)
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+            if not self.rows:
+                yield buffer.getvalue().encode('utf-8')
+            return
+        for batch in chunked(rows, self.chunk_size):
+            self.rows += len(batch)
+            yield ''.join(_dumps(dict(zip(fields, row))) + '\n' for row in batch).encode('utf-8')
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    """
+    Сжимает поток в один gzip-член по мере чтения (без буферизации всего ответа).
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def async_chunks(chunks: Iterable[bytes]):
+    """
+    Async-обёртка для StreamingHttpResponse под ASGI: синхронный итератор Django 4.2 сначала
+    целиком собирает в список. Каждый шаг (и курсор БД) — в общем sync-потоке.
+    """
+    iterator = iter(chunks)
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await step(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
@@ -0,0 +1,17 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.throttling import DatabaseRateStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет устаревшие счётчики throttle (ThrottleCounter) — строки ключей, от которых не было "
+        "запросов два окна и больше. Нужна только при API_THROTTLE_STORE=db; запускать по расписанию."
+    )
+
+    def handle(self, *args, **options):
+        deleted = DatabaseRateStore(settings.API_THROTTLE_DB_ALIAS).purge(time.time())
+        self.stdout.write(self.style.SUCCESS(f"Done: {deleted} expired counters deleted."))
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleCounter',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('window_index', models.BigIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('previous', models.IntegerField(default=0)),
+                ('expires_at', models.FloatField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class ThrottleCounter(models.Model):
+    """
+    Счётчик скользящего окна throttle (api.throttling.DatabaseRateStore): одна строка на ключ
+    scope:идентификатор — число запросов в текущем и предыдущем окне.
+    """
+    key = models.CharField(max_length=200, primary_key=True)
+    window_index = models.BigIntegerField()
+    count = models.IntegerField(default=0)
+    previous = models.IntegerField(default=0)
+    # unix time, после которого строка не влияет на лимит (удаляется purge_throttle_counters)
+    expires_at = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.count} (+{self.previous} previous)"
@@ -0,0 +1,145 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+"""
+Чтение с реплик (settings.DATABASE_REPLICAS) для списков и отчётов.
+По умолчанию все запросы идут в default; в реплику попадают только чтения внутри use_replica()
+(ReplicaReadMixin для GET view, changelist админки, сборка индекса норм). Detail-endpoint'ы
+с кэшем ответов читают из default: устаревшая копия с реплики попала бы в кэш после инвалидации.
+Read-your-writes: первая запись в запросе прикрепляет его к default до конца запроса, а
+ReplicaPinMiddleware ставит клиенту cookie, и следующие DATABASE_REPLICA_PIN_SECONDS секунд
+его запросы тоже читают из default (реплика успевает догнать запись).
+"""
+
+PIN_COOKIE = 'db_pin'
+
+# alias реплики для чтений текущего контекста (None — default)
+_read_alias = ContextVar('replica_read_alias', default=None)
+# состояние текущего запроса {"pinned": bool, "wrote": bool}; меняется на месте, поэтому запись
+# из вложенного контекста (sync_to_async, async_to_sync) видна middleware
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def pin_to_primary():
+    """
+    Прикрепляет текущий запрос к default: дальнейшие чтения идут в основную БД.
+    """
+    state = _request_state.get()
+    if state is not None:
+        state["pinned"] = state["wrote"] = True
+
+
+def is_pinned():
+    state = _request_state.get()
+    return state is not None and state["pinned"]
+
+
+@contextmanager
+def use_replica():
+    """
+    Чтения внутри блока (или декорированной функции) идут в реплику, если она настроена
+    и запрос не прикреплён к default.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    token = _read_alias.set(random.choice(replicas) if replicas else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _test_mirror(alias):
+    # TEST MIRROR действует только под тест-раннером: он делает реплику зеркалом (NAME той же базы),
+    # и тогда читаем через соединение зеркала, иначе не видно данных незакоммиченной транзакции
+    # TestCase. Вне тестов NAME реплики свой — настройка MIRROR роутингом не учитывается.
+    settings_dict = connections[alias].settings_dict
+    mirror = settings_dict['TEST']['MIRROR']
+    if mirror and settings_dict['NAME'] == connections[mirror].settings_dict['NAME']:
+        return mirror
+    return None
+
+
+class ReplicaRouter:
+    """
+    Роутер: запись — всегда default (и прикрепление контекста к нему), чтение — реплика
+    только внутри use_replica() и без прикрепления.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or is_pinned():
+            return 'default'
+        return _test_mirror(alias) or alias
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # реплику мигрирует репликация СУБД; локальная SQLite-реплика мигрируется явно (--database)
+        return None
+
+
+class ReplicaPinMiddleware:
+    """
+    Прикрепляет к default запросы клиента с cookie db_pin и ставит cookie после записи.
+    Синхронный и асинхронный: под ASGI async-view вызываются без перехода в поток
+    (ContextVar состояния запроса работает в обоих режимах).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = {"pinned": PIN_COOKIE in request.COOKIES, "wrote": False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._set_pin(state, response)
+
+    async def __acall__(self, request):
+        state = {"pinned": PIN_COOKIE in request.COOKIES, "wrote": False}
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._set_pin(state, response)
+
+    def _set_pin(self, state, response):
+        if state["wrote"] and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Миксин для APIView/generic view: безопасные методы (GET, HEAD, OPTIONS) читают с реплики.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            with use_replica():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
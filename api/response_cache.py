@@ -0,0 +1,165 @@
+import threading
+from typing import Any, Dict, Optional
+
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .cache_backends import bounded_timeout
+
+"""
+Условные GET и кэш сериализованных ответов для detail-endpoint'ов.
+Валидаторы берутся из updated_at объекта: ETag W/"<namespace>-<pk>-<updated_at, мкс>" и
+Last-Modified. Запись кэша (ключ — namespace и pk) хранит валидаторы и готовые данные ответа,
+поэтому повторный запрос с If-None-Match/If-Modified-Since получает 304, а обычный — ответ
+из кэша, оба без запросов к БД. Записи удаляются сигналами post_save/post_delete моделей
+(сразу и после коммита транзакции) и истекают через RESPONSE_CACHE_TIMEOUT.
+Кэш — Django-кэш settings.RESPONSE_CACHE_ALIAS (пусто — без кэша, только условные GET). Сигнал
+доходит до всех воркеров только через общий кэш (CACHE_URL); на кэше процесса (LocMem) другие
+воркеры отдают старую версию до истечения TTL, поэтому он ограничен LOCAL_CACHE_MAX_TIMEOUT;
+счётчики hits/misses/not_modified/invalidations — по процессу, как у кэша планов.
+"""
+
+
+def validators(namespace: str, pk: Any, updated_at) -> Dict[str, Any]:
+    ts = updated_at.timestamp()
+    return {"etag": f'W/"{namespace}-{pk}-{int(ts * 1_000_000)}"', "last_modified": int(ts)}
+
+
+def conditional_response(request, entry: Dict[str, Any]):
+    """
+    304 (или 412) для условного запроса, если entry не изменилась, иначе None.
+    """
+    return get_conditional_response(request, etag=entry["etag"], last_modified=entry["last_modified"])
+
+
+def add_validators(response, entry: Dict[str, Any]):
+    response['ETag'] = entry["etag"]
+    response['Last-Modified'] = http_date(entry["last_modified"])
+    return response
+
+
+class ResponseCache:
+    """
+    Кэш ответов detail-endpoint'ов поверх Django-кэша. Потокобезопасен; счётчики в stats().
+    backend — объект Django-кэша или None (кэширование выключено).
+    """
+
+    def __init__(self, backend=None, timeout: int = 300, prefix: str = 'resp'):
+        self.backend = backend
+        self.timeout = timeout
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _key(self, namespace: str, pk: Any) -> str:
+        return f"{self.prefix}:{namespace}:{pk}"
+
+    def _count(self, namespace: str, counter: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(
+                namespace, {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0})
+            counters[counter] += 1
+
+    def get(self, namespace: str, pk: Any) -> Optional[Dict[str, Any]]:
+        entry = self.backend.get(self._key(namespace, pk)) if self.backend is not None else None
+        self._count(namespace, "hits" if entry is not None else "misses")
+        return entry
+
+    def set(self, namespace: str, pk: Any, entry: Dict[str, Any]) -> None:
+        if self.backend is not None:
+            self.backend.set(self._key(namespace, pk), entry, bounded_timeout(self.backend, self.timeout))
+
+    async def aget(self, namespace: str, pk: Any) -> Optional[Dict[str, Any]]:
+        entry = await self.backend.aget(self._key(namespace, pk)) if self.backend is not None else None
+        self._count(namespace, "hits" if entry is not None else "misses")
+        return entry
+
+    async def aset(self, namespace: str, pk: Any, entry: Dict[str, Any]) -> None:
+        if self.backend is not None:
+            await self.backend.aset(self._key(namespace, pk), entry, bounded_timeout(self.backend, self.timeout))
+
+    def not_modified(self, namespace: str) -> None:
+        self._count(namespace, "not_modified")
+
+    def invalidate(self, namespace: str, pk: Any) -> None:
+        """
+        Удаляет запись сразу и ещё раз после коммита текущей транзакции: иначе параллельный
+        запрос мог бы между ними закэшировать ещё не изменённую версию.
+        """
+        self._count(namespace, "invalidations")
+        if self.backend is None:
+            return
+        key = self._key(namespace, pk)
+        self.backend.delete(key)
+        transaction.on_commit(lambda: self.backend.delete(key))
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for namespace, counters in sorted(self._counters.items()):
+                lookups = counters["hits"] + counters["misses"]
+                result[namespace] = dict(counters, hit_rate=counters["hits"] / lookups if lookups else 0.0)
+            return {"enabled": self.backend is not None, "timeout": bounded_timeout(self.backend, self.timeout),
+                    "namespaces": result}
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Кэш ответов процесса, сконфигурированный из settings (создаётся лениво).
+    """
+    global _response_cache
+    if _response_cache is None:
+        from django.conf import settings
+        from django.core.cache import caches
+
+        with _response_cache_lock:
+            if _response_cache is None:
+                alias = getattr(settings, 'RESPONSE_CACHE_ALIAS', None)
+                _response_cache = ResponseCache(
+                    backend=caches[alias] if alias else None,
+                    timeout=getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300),
+                )
+    return _response_cache
+
+
+def invalidate(namespace: str, pk: Any) -> None:
+    get_response_cache().invalidate(namespace, pk)
+
+
+class CachedRetrieveMixin:
+    """
+    Миксин для RetrieveAPIView/RetrieveUpdateDestroyAPIView: GET отвечает из кэша ответов и
+    поддерживает If-None-Match/If-Modified-Since. Модель должна иметь updated_at; namespace
+    задаётся cache_namespace, а инвалидация — сигналами модели (invalidate(cache_namespace, pk)).
+    Попадание в кэш не вызывает get_object(), поэтому миксин подходит только для view
+    без объектных прав (has_object_permission) и без фильтрации get_queryset() по запросу.
+    """
+    cache_namespace: str = ''
+
+    def retrieve(self, request, *args, **kwargs):
+        cache = get_response_cache()
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        entry = cache.get(self.cache_namespace, pk)
+        instance = None
+        if entry is None:
+            instance = self.get_object()
+            entry = validators(self.cache_namespace, instance.pk, instance.updated_at)
+        conditional = conditional_response(request, entry)
+        if conditional is not None:
+            cache.not_modified(self.cache_namespace)
+            return add_validators(conditional, entry)
+        if instance is not None:
+            # ReturnDict держит ссылку на сериализатор — в кэш кладём обычный dict
+            entry["data"] = dict(self.get_serializer(instance).data)
+            cache.set(self.cache_namespace, pk, entry)
+        return add_validators(Response(entry["data"]), entry)
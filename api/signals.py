@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import get_token_cache
+
+
+@receiver(post_delete, sender=Token, dispatch_uid='api_invalidate_deleted_token')
+def invalidate_token(sender, instance, **kwargs):
+    # LogoutView, смена токена, каскад при удалении пользователя
+    get_token_cache().invalidate(instance.key)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL, dispatch_uid='api_invalidate_user_token')
+def invalidate_user_token(sender, instance, created=False, update_fields=None, **kwargs):
+    # деактивация, смена пароля или прав; вход (update_last_login) закэшированного пользователя не меняет
+    if created or (update_fields is not None and set(update_fields) == {'last_login'}):
+        return
+    get_token_cache().invalidate_user(instance.pk)
@@ -0,0 +1,89 @@
+import calendar
+import datetime
+
+from django.contrib.admin.utils import get_fields_from_path
+from django.db import models
+from django.template import Library
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+"""
+date_hierarchy для больших таблиц. Штатный тег админки строит ссылки через
+SELECT DISTINCT date_trunc(...) по всему (отфильтрованному) списку — это полный проход таблицы.
+Здесь список годов берётся из MIN/MAX поля (два обращения к краям индекса), а месяцы и дни —
+из календаря без запросов; ссылка может вести на пустой период. Сам переход по ссылке
+фильтрует диапазоном field >= from AND field < to (ChangeList), что тоже идёт по индексу.
+"""
+
+register = Library()
+
+
+def _local(value):
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.localtime(value)
+    return value
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def scalable_date_hierarchy(cl):
+    if not cl.date_hierarchy:
+        return {"show": False}
+    field_name = cl.date_hierarchy
+    get_fields_from_path(cl.model, field_name)  # проверка пути, как в штатном теге
+    year_field = f"{field_name}__year"
+    month_field = f"{field_name}__month"
+    day_field = f"{field_name}__day"
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f"{field_name}__"])
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            "show": True,
+            "back": {
+                "link": link({year_field: year_lookup, month_field: month_lookup}),
+                "title": capfirst(formats.date_format(day, "YEAR_MONTH_FORMAT")),
+            },
+            "choices": [{"title": capfirst(formats.date_format(day, "MONTH_DAY_FORMAT"))}],
+        }
+    if year_lookup and month_lookup:
+        year, month = int(year_lookup), int(month_lookup)
+        days = (datetime.date(year, month, d) for d in range(1, calendar.monthrange(year, month)[1] + 1))
+        return {
+            "show": True,
+            "back": {"link": link({year_field: year_lookup}), "title": str(year_lookup)},
+            "choices": [
+                {"link": link({year_field: year_lookup, month_field: month_lookup, day_field: day.day}),
+                 "title": capfirst(formats.date_format(day, "MONTH_DAY_FORMAT"))}
+                for day in days
+            ],
+        }
+    if year_lookup:
+        year = int(year_lookup)
+        return {
+            "show": True,
+            "back": {"link": link({}), "title": _("All dates")},
+            "choices": [
+                {"link": link({year_field: year_lookup, month_field: month}),
+                 "title": capfirst(formats.date_format(datetime.date(year, month, 1), "YEAR_MONTH_FORMAT"))}
+                for month in range(1, 13)
+            ],
+        }
+
+    bounds = cl.queryset.aggregate(first=models.Min(field_name), last=models.Max(field_name))
+    if not (bounds["first"] and bounds["last"]):
+        return {"show": True, "back": None, "choices": []}
+    first, last = _local(bounds["first"]), _local(bounds["last"])
+    return {
+        "show": True,
+        "back": None,
+        "choices": [
+            {"link": link({year_field: str(year)}), "title": str(year)}
+            for year in range(first.year, last.year + 1)
+        ],
+    }
@@ -0,0 +1,27 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+"""
+Бюджеты SQL-запросов для endpoint'ов.
+Тест объявляет допустимое число запросов на запрос к endpoint'у и проверяет его на маленьком
+и большом объёме данных (N=1 и N=1000): число запросов не должно зависеть от N, иначе это N+1.
+"""
+
+
+class QueryBudgetMixin:
+    """
+    Миксин для TestCase. Использование:
+
+        for n in (1, 1000):
+            self.seed(n)
+            self.assertQueryBudget(1, 'get', '/api/assessments/')
+    """
+
+    def assertQueryBudget(self, budget, method, url, status_code=200, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertEqual(response.status_code, status_code, f"{method.upper()} {url}")
+        if len(ctx.captured_queries) > budget:
+            queries = "\n".join(f"{i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, 1))
+            self.fail(f"{method.upper()} {url}: {len(ctx.captured_queries)} queries > budget {budget}\n{queries}")
+        return response
@@ -0,0 +1,779 @@
+import csv
+import gzip
+import io
+import json
+import os
+import runpy
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import User as AuthUser
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.utils import ConnectionHandler
+from django.http import JsonResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient, APIRequestFactory
+
+from assessments.models import Assessment, PsychologicalTest, UserResponse
+from config.databases import database_from_url
+from planner.ai.planner import generate_learning_plan
+from planner.executor import BoundedExecutor
+from planner.models import LearningPlan
+from planner.storage import store_plan
+from users.models import User, UserProfile
+
+from .admin_tools import EstimatedCountPaginator, estimated_row_count
+from .authentication import get_token_cache
+from .cache_backends import bounded_timeout
+from .export import EXPORTS
+from .models import ThrottleCounter
+from .replicas import PIN_COOKIE, ReplicaPinMiddleware, ReplicaRouter, use_replica
+from .response_cache import get_response_cache
+from .testing import QueryBudgetMixin
+from .throttling import (
+    CacheRateStore,
+    CustomAnonRateThrottle,
+    DatabaseRateStore,
+    PlannerRateThrottle,
+)
+
+# endpoint -> допустимое число запросов, одинаковое для N=1 и N=1000
+BUDGETS = {
+    '/api/assessments/': 1,
+    '/assessments/': 1,
+    '/api/assessments/{pk}/': 1,
+    '/assessments/{pk}/': 1,
+    '/api/users/': 1,
+}
+
+
+class EndpointQueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.test = PsychologicalTest.objects.create(title='Big Five', description='')
+        self.seeded = 0
+
+    def seed(self, n):
+        """
+        Догружает данные до n оценок (у каждой свой auth.User и UserResponse) и n users.User.
+        """
+        auth_users = AuthUser.objects.bulk_create(
+            [AuthUser(username=f'budget{i}') for i in range(self.seeded, n)])
+        responses = UserResponse.objects.bulk_create(
+            [UserResponse(user=u, test=self.test, answers={'q1': 3}) for u in auth_users])
+        Assessment.objects.bulk_create(
+            [Assessment(title=f'Assessment {i}', user=r.user, response=r) for i, r in enumerate(responses)])
+        User.objects.bulk_create([User(email=f'budget{i}@example.com') for i in range(self.seeded, n)])
+        self.seeded = n
+
+    def test_budgets_do_not_grow_with_data(self):
+        for n in (1, 1000):
+            self.seed(n)
+            pk = Assessment.objects.order_by('-id').values_list('id', flat=True).first()
+            for url, budget in BUDGETS.items():
+                with self.subTest(n=n, url=url):
+                    self.assertQueryBudget(budget, 'get', url.format(pk=pk))
+
+    def test_assessment_list_is_paginated(self):
+        self.seed(120)
+        response = self.client.get('/api/assessments/', {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertEqual(response.data['results'][0]['user']['id'], Assessment.objects.latest('created_at').user_id)
+        rest = self.client.get(response.data['next'])
+        self.assertEqual(len(rest.data['results']), 20)
+        self.assertIsNone(rest.data['next'])
+
+
+# changelist админки -> допустимое число запросов (сессия, пользователь, COUNT, страница и т.д.)
+ADMIN_BUDGETS = {
+    '/admin/assessments/assessment/': 5,
+    '/admin/assessments/userresponse/': 6,
+    '/admin/users/user/': 5,
+    '/admin/users/userprofile/': 4,
+}
+
+
+class AdminChangelistTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.admin = AuthUser.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.admin)
+        self.test = PsychologicalTest.objects.create(title='Big Five', description='')
+        self.seeded = 0
+
+    seed = EndpointQueryBudgetTest.seed
+
+    def test_budgets_do_not_grow_with_data(self):
+        for n in (1, 300):
+            self.seed(n)
+            for url, budget in ADMIN_BUDGETS.items():
+                with self.subTest(n=n, url=url):
+                    self.assertQueryBudget(budget, 'get', url)
+
+    def test_search_is_prefix_match(self):
+        self.seed(30)
+        response = self.client.get('/admin/users/user/', {'q': 'budget1'})
+        self.assertEqual(response.context['cl'].result_count, 11)  # budget1, budget10..budget19
+        response = self.client.get('/admin/users/user/', {'q': 'udget1'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+        pk = Assessment.objects.values_list('id', flat=True).first()
+        response = self.client.get('/admin/assessments/assessment/', {'q': str(pk)})
+        self.assertEqual([a.pk for a in response.context['cl'].result_list], [pk])
+
+    def test_autocomplete_uses_prefix_search(self):
+        self.seed(30)
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'assessments', 'model_name': 'assessment', 'field_name': 'user', 'term': 'budget2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 11)
+
+    def test_date_hierarchy_does_not_scan_distinct_dates(self):
+        self.seed(5)
+        year = Assessment.objects.first().created_at.year
+        for params in ({}, {'created_at__year': year}, {'created_at__year': year, 'created_at__month': 1}):
+            with self.subTest(params=params), CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/admin/assessments/assessment/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse([q for q in ctx.captured_queries if 'DISTINCT' in q['sql']])
+        self.assertContains(response, 'created_at__day=31')  # дни месяца берутся из календаря
+
+    def test_estimated_count_only_for_unfiltered_large_tables(self):
+        self.seed(3)
+        qs = Assessment.objects.order_by('-id')
+        with mock.patch('api.admin_tools.estimated_row_count', return_value=5_000_000):
+            with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=100_000):
+                self.assertEqual(EstimatedCountPaginator(qs, 10).count, 5_000_000)
+                self.assertEqual(EstimatedCountPaginator(qs.filter(title__startswith='A'), 10).count, 3)
+            with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=10_000_000):
+                self.assertEqual(EstimatedCountPaginator(qs, 10).count, 3)
+        # SQLite статистики не даёт — точный COUNT(*)
+        self.assertIsNone(estimated_row_count(Assessment))
+        self.assertEqual(EstimatedCountPaginator(qs, 10).count, 3)
+
+
+class ResponseCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_response_cache().reset_stats()
+        self.client = APIClient()
+        auth_user = AuthUser.objects.create(username='cached')
+        test = PsychologicalTest.objects.create(title='Big Five', description='')
+        response = UserResponse.objects.create(user=auth_user, test=test, answers={}, score=3)
+        self.assessment = Assessment.objects.create(title='Cached', user=auth_user, response=response)
+        self.user = User.objects.create(email='cached@example.com')
+
+    def test_detail_served_from_cache_and_revalidated(self):
+        url = f'/api/assessments/{self.assessment.pk}/'
+        first = self.client.get(url)
+        etag = first['ETag']
+        self.assertTrue(etag.startswith('W/"assessment-'))
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.json(), first.json())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        self.assessment.title = 'Changed'
+        self.assessment.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['title'], 'Changed')
+        self.assertNotEqual(changed['ETag'], etag)
+
+        stats = get_response_cache().stats()['namespaces']['assessment']
+        self.assertEqual((stats['hits'], stats['misses'], stats['not_modified']), (3, 2, 2))
+        self.assertEqual(stats['invalidations'], 1)
+
+    @override_settings(LOCAL_CACHE_MAX_TIMEOUT=2)
+    def test_process_local_cache_bounds_ttl(self):
+        # сигнал снимает запись только в своём процессе: на LocMem чужой воркер устаревает не дольше TTL
+        self.client.get(f'/api/assessments/{self.assessment.pk}/')
+        key = next(k for k in cache._cache if ':resp:assessment:' in k)
+        self.assertLessEqual(cache._expire_info[key] - time.time(), 2)
+        self.assertEqual(get_response_cache().stats()['timeout'], 2)
+        self.assertEqual(bounded_timeout(DummyCache('shared', {}), 300), 300)
+
+    def test_user_change_invalidates_nested_assessment(self):
+        url = f'/api/assessments/{self.assessment.pk}/'
+        etag = self.client.get(url)['ETag']
+        auth_user = self.assessment.user
+        auth_user.email = 'renamed@example.com'
+        auth_user.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['user']['email'], 'renamed@example.com')
+        self.assertNotEqual(changed['ETag'], etag)
+        # вход (save(update_fields=['last_login'])) оценки не трогает
+        auth_user.last_login = auth_user.date_joined
+        auth_user.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=changed['ETag']).status_code, 304)
+
+    def test_conditional_get_without_cache(self):
+        with override_settings(RESPONSE_CACHE_ALIAS=None):
+            with mock.patch('api.response_cache._response_cache', None):
+                url = f'/api/users/{self.user.pk}/'
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_user_and_profile_changes_invalidate(self):
+        url = f'/api/users/{self.user.pk}/'
+        self.client.get(url)
+        UserProfile.objects.create(user=self.user, gender='F')
+        self.client.get(url)
+        self.client.patch(url, {'first_name': 'Ann'}, format='json')
+        self.assertEqual(self.client.get(url).json()['first_name'], 'Ann')
+        stats = get_response_cache().stats()['namespaces']['user']
+        self.assertEqual((stats['hits'], stats['misses']), (0, 3))
+
+    def test_learning_plan_page(self):
+        obj = LearningPlan.from_generated({}, generate_learning_plan(
+            {'assessment': {'scales': {'neuroticism': 4, 'motivation': 2}}}), user_id=self.user.pk)
+        store_plan(obj)
+        url = f'/planner/plans/{obj.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, first.content)
+
+        cache.clear()
+        # промах кэша: условный запрос проверяется одним SELECT updated_at, без загрузки задач
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        objective = obj.objectives.first()
+        objective.is_completed = True
+        objective.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/planner/plans/999999/').status_code, 404)
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/cache/stats/').status_code, 403)
+        self.client.force_authenticate(AuthUser.objects.create_superuser('root', 'root@example.com', 'pass'))
+        self.client.get(f'/api/assessments/{self.assessment.pk}/')
+        body = self.client.get('/api/cache/stats/').json()
+        self.assertTrue(body['enabled'])
+        self.assertEqual(body['namespaces']['assessment']['misses'], 1)
+
+
+class AsyncViewsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        auth_user = AuthUser.objects.create(username='async')
+        test = PsychologicalTest.objects.create(title='Big Five', description='')
+        for i in range(5):
+            response = UserResponse.objects.create(user=auth_user, test=test, answers={}, score=i)
+            Assessment.objects.create(title=f'A{i}', user=auth_user, response=response)
+        self.assessment = Assessment.objects.latest('id')
+
+    async def test_assessment_list_matches_sync_and_paginates(self):
+        sync_body = (await self.async_client.get('/api/assessments/')).json()
+        body = (await self.async_client.get('/api/async/assessments/')).json()
+        self.assertEqual(body['results'], sync_body['results'])
+        self.assertIsNone(body['next'])
+
+        first = (await self.async_client.get('/api/async/assessments/', {'page_size': 2})).json()
+        seen = [row['id'] for row in first['results']]
+        second = (await self.async_client.get(first['next'])).json()
+        seen += [row['id'] for row in second['results']]
+        self.assertEqual(seen, [row['id'] for row in sync_body['results']][:4])
+        bad = await self.async_client.get('/api/async/assessments/', {'cursor': 'bogus'})
+        self.assertEqual(bad.status_code, 404)
+
+    async def test_assessment_detail_cached_and_conditional(self):
+        url = f'/api/async/assessments/{self.assessment.pk}/'
+        first = await self.async_client.get(url)
+        self.assertEqual(first.json(), (await self.async_client.get(f'/api/assessments/{self.assessment.pk}/')).json())
+        not_modified = await self.async_client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        missing = await self.async_client.get('/api/async/assessments/999999/')
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(missing.json(), {'detail': 'Not found.'})
+
+    async def test_planner_post_and_list(self):
+        payload = {"user_data": {"assessment": {"scales": {"motivation": 1, "communication": 4}}}}
+        created = await self.async_client.post('/api/async/planner/', payload, content_type='application/json')
+        self.assertEqual(created.status_code, 201)
+        body = created.json()
+        sync_body = (await self.async_client.post('/api/planner/', payload, content_type='application/json')).json()
+        # план тот же, отличаются только сгенерированные идентификаторы
+        self.assertEqual(body['plan']['focus'], sync_body['plan']['focus'])
+        self.assertEqual([t['skill_key'] for t in body['plan']['tasks']],
+                         [t['skill_key'] for t in sync_body['plan']['tasks']])
+
+        listing = (await self.async_client.get('/api/async/planner/', {'limit': 1})).json()
+        self.assertEqual(listing['plans'][0]['id'], sync_body['plan_id'])
+        self.assertIsNotNone(listing['next_cursor'])
+        invalid = await self.async_client.post('/api/async/planner/', {"user_data": 42},
+                                               content_type='application/json')
+        self.assertEqual(invalid.status_code, 400)
+
+    async def test_planner_rejects_when_executor_saturated(self):
+        saturated = BoundedExecutor(max_workers=1, max_pending=0)
+        with mock.patch('api.async_views.get_plan_executor', return_value=saturated):
+            response = await self.async_client.post(
+                '/api/async/planner/', {"user_data": [1, 2]}, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(saturated.stats()['rejected'], 1)
+
+
+class ReplicaSettingsTest(SimpleTestCase):
+    """
+    Роутинг по настоящим config/settings.py с DATABASE_REPLICA_URL (а не по alias из теста).
+    """
+
+    def test_configured_replica_is_read_outside_tests(self):
+        env = {'DATABASE_URL': 'sqlite:////tmp/primary.sqlite3', 'DATABASE_REPLICA_URL': 'sqlite:////tmp/replica.sqlite3'}
+        with mock.patch.dict(os.environ, env):
+            configured = runpy.run_path(os.path.join(settings.BASE_DIR, 'config', 'settings.py'))
+        handler = ConnectionHandler(configured['DATABASES'])
+        router = ReplicaRouter()
+        with mock.patch('api.replicas.connections', handler), \
+                override_settings(DATABASE_REPLICAS=configured['DATABASE_REPLICAS']), use_replica():
+            self.assertEqual(router.db_for_read(User), 'replica')
+            # тест-раннер делает реплику зеркалом default — тогда чтение идёт через default
+            handler['replica'].creation.set_as_test_mirror(handler['default'].settings_dict)
+            self.assertEqual(router.db_for_read(User), 'default')
+
+
+class DatabaseUrlTest(SimpleTestCase):
+
+    def test_parse(self):
+        config = database_from_url('postgres://app:p%40ss@db:5432/psych?sslmode=require', 60, True)
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['USER'], config['PASSWORD'], config['HOST'], config['PORT'], config['NAME']),
+                         ('app', 'p@ss', 'db', '5432', 'psych'))
+        self.assertEqual(config['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (60, True))
+        self.assertEqual(database_from_url('sqlite:////tmp/primary.sqlite3')['NAME'], '/tmp/primary.sqlite3')
+        self.assertEqual(database_from_url('sqlite:///db.sqlite3')['NAME'], 'db.sqlite3')
+        with self.assertRaises(ValueError):
+            database_from_url('oracle://db/psych')
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    Две SQLite-базы: default и реплика во временном файле (alias replica_test, в отличие от
+    реплики из DATABASE_REPLICA_URL не зеркало). Реплика пуста — как сильно отставшая копия,
+    поэтому по содержимому ответа видно, из какой базы он прочитан.
+    """
+    # '__all__', а не {'default', 'replica_test'}: временный alias появляется только в setUpClass
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls._replica_dir = tempfile.mkdtemp(prefix='replica-')
+        url = f"sqlite:///{cls._replica_dir}/replica.sqlite3"
+        configured = connections.configure_settings(
+            {'default': dict(connections.settings['default']), 'replica_test': database_from_url(url)})
+        connections.settings['replica_test'] = configured['replica_test']
+        call_command('migrate', database='replica_test', verbosity=0)
+        cls._replicas = override_settings(DATABASE_REPLICAS=['replica_test'])
+        cls._replicas.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._replicas.disable()
+        connections['replica_test'].close()
+        del connections['replica_test']
+        del connections.settings['replica_test']
+        shutil.rmtree(cls._replica_dir, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        auth_user = AuthUser.objects.create(username='primary')
+        test = PsychologicalTest.objects.create(title='Big Five', description='')
+        response = UserResponse.objects.create(user=auth_user, test=test, answers={}, score=3)
+        self.assessment = Assessment.objects.create(title='Fresh', user=auth_user, response=response)
+
+    def test_lists_read_replica_until_own_write(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/assessments/').json()['results'], [])
+        # detail-endpoint с кэшем ответов всегда читает из default
+        self.assertEqual(client.get(f'/api/assessments/{self.assessment.pk}/').status_code, 200)
+
+        created = client.post('/api/users/', {'email': 'writer@example.com'}, format='json')
+        self.assertEqual(created.status_code, 201)
+        self.assertIn(PIN_COOKIE, created.cookies)
+        # свой POST: следующие чтения этого клиента идут в default и видят запись
+        self.assertEqual([row['id'] for row in client.get('/api/assessments/').json()['results']],
+                         [self.assessment.pk])
+        self.assertEqual(APIClient().get('/api/assessments/').json()['results'], [])
+
+    async def test_async_list_reads_replica(self):
+        body = (await self.async_client.get('/api/async/assessments/')).json()
+        self.assertEqual(body['results'], [])
+
+    def test_write_pins_rest_of_request(self):
+        router = ReplicaRouter()
+        seen = []
+
+        def view(request):
+            with use_replica():
+                seen.append(router.db_for_read(User))
+                User.objects.create(email=f'pinned-{request.method.lower()}@example.com')
+                seen.append(router.db_for_read(User))
+            return JsonResponse({})
+
+        response = ReplicaPinMiddleware(view)(RequestFactory().post('/'))
+        self.assertEqual(seen, ['replica_test', 'default'])
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.DATABASE_REPLICA_PIN_SECONDS)
+
+        seen.clear()
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        ReplicaPinMiddleware(view)(request)
+        self.assertEqual(seen, ['default', 'default'])
+
+    async def test_async_requests_pass_through_without_thread_hop(self):
+        router = ReplicaRouter()
+        seen = []
+
+        def write():
+            with use_replica():
+                seen.append(router.db_for_read(User))
+                User.objects.create(email='pinned-async@example.com')
+                seen.append(router.db_for_read(User))
+
+        async def view(request):
+            await sync_to_async(write)()
+            return JsonResponse({})
+
+        middleware = ReplicaPinMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().post('/'))
+        self.assertEqual(seen, ['replica_test', 'default'])
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.DATABASE_REPLICA_PIN_SECONDS)
+
+    def test_without_replicas_everything_reads_default(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            client = APIClient()
+            self.assertEqual(len(client.get('/api/assessments/').json()['results']), 1)
+            created = client.post('/api/users/', {'email': 'single@example.com'}, format='json')
+            self.assertNotIn(PIN_COOKIE, created.cookies)
+
+
+THROTTLE_RATES = {'user': '10/hour', 'anon': '5/hour', 'planner': '4/min', 'auth': '2/min'}
+
+
+@override_settings(API_THROTTLE_RATES=THROTTLE_RATES)
+class ThrottleTest(TestCase):
+
+    def request(self, method='post', user=None, addr='10.0.0.1'):
+        request = getattr(APIRequestFactory(), method)('/', REMOTE_ADDR=addr)
+        request.user = user or AnonymousUser()
+        return request
+
+    def hits(self, throttle, at, n=1):
+        throttle.timer = lambda: at
+        return [throttle.allow_request(self.request(), None) for _ in range(n)]
+
+    def test_sliding_window(self):
+        throttle = PlannerRateThrottle()
+        start = 60 * 1000
+        self.assertEqual(self.hits(throttle, start, 5), [True] * 4 + [False])
+        # половина следующего окна: 5 * 0.5 (предыдущее, с отклонённым) + текущие
+        self.assertEqual(self.hits(throttle, start + 90, 2), [True, False])
+        self.assertAlmostEqual(throttle.wait(), 18)
+        self.assertEqual(self.hits(throttle, start + 108), [True])
+        # через два окна предыдущее не учитывается
+        self.assertEqual(self.hits(throttle, start + 240, 4), [True] * 4)
+        self.assertEqual(ThrottleCounter.objects.count(), 1)
+
+    def test_scopes_and_idents(self):
+        throttle = PlannerRateThrottle()
+        throttle.timer = lambda: 60.0
+        self.assertTrue(all(throttle.allow_request(self.request('get'), None) for _ in range(10)))
+        for addr in ('10.0.0.1', '10.0.0.2'):
+            self.assertEqual([throttle.allow_request(self.request(addr=addr), None) for _ in range(5)],
+                             [True] * 4 + [False])
+        user = AuthUser.objects.create(username='throttled')
+        self.assertTrue(CustomAnonRateThrottle().allow_request(self.request(user=user), None))
+        self.assertEqual(set(ThrottleCounter.objects.values_list('key', flat=True)),
+                         {'planner:10.0.0.1', 'planner:10.0.0.2'})
+
+    def test_stores_are_shared_between_workers(self):
+        shared = LocMemCache('throttle-test', {})
+        for workers in ((CacheRateStore(shared), CacheRateStore(shared)),
+                        (DatabaseRateStore(), DatabaseRateStore())):
+            counts = [workers[i % 2].hit('planner:shared', 7, 60) for i in range(5)]
+            self.assertEqual(counts, [(1, 0), (2, 0), (3, 0), (4, 0), (5, 0)])
+            self.assertEqual(workers[0].hit('planner:shared', 8, 60), (1, 5))
+        # память на ключ фиксирована: два окна в кэше, одна строка в БД
+        self.assertEqual(len(shared._cache), 2)
+        self.assertEqual(ThrottleCounter.objects.count(), 1)
+
+    def test_database_store_without_upsert(self):
+        store = DatabaseRateStore()
+        self.assertEqual([store._update_or_create('k', 3, 300) for _ in range(3)], [(1, 0), (2, 0), (3, 0)])
+        self.assertEqual(store._update_or_create('k', 4, 360), (1, 3))
+        self.assertEqual(store._update_or_create('k', 6, 480), (1, 0))
+
+    def test_database_store_falls_back_without_returning(self):
+        store = DatabaseRateStore()
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False), \
+                mock.patch.object(store, '_upsert') as upsert:
+            self.assertEqual([store.hit('k', 3, 60) for _ in range(2)], [(1, 0), (2, 0)])
+        upsert.assert_not_called()
+
+    def test_purge_expired_counters(self):
+        ThrottleCounter.objects.create(key='old', window_index=1, count=3, expires_at=180)
+        ThrottleCounter.objects.create(key='new', window_index=1, count=3, expires_at=10 ** 12)
+        call_command('purge_throttle_counters', stdout=mock.Mock())
+        self.assertEqual(list(ThrottleCounter.objects.values_list('key', flat=True)), ['new'])
+
+    def test_planner_and_auth_endpoints(self):
+        client = APIClient()
+        payload = {"user_data": {"assessment": {"scales": {"motivation": 1}}}}
+        codes = [client.post('/planner/', payload, format='json').status_code for _ in range(5)]
+        self.assertEqual(codes, [201] * 4 + [429])
+        throttled = client.post('/planner/batch/', {"items": [payload]}, format='json')
+        self.assertEqual(throttled.status_code, 429)
+        self.assertTrue(int(throttled['Retry-After']) > 0)
+        self.assertEqual(client.get('/planner/').status_code, 200)
+
+        codes = [client.post('/users/login/', {'email': 'x@example.com', 'password': 'wrong'},
+                             format='json').status_code for _ in range(3)]
+        self.assertEqual(codes, [401, 401, 429])
+        self.assertEqual(client.post('/users/register/', {}, format='json').status_code, 429)
+
+    async def test_async_planner_is_throttled(self):
+        payload = {"user_data": [1, 2]}
+        codes = []
+        for _ in range(5):
+            response = await self.async_client.post('/api/async/planner/', payload, content_type='application/json')
+            codes.append(response.status_code)
+        self.assertEqual(codes, [201] * 4 + [429])
+        self.assertIn('Retry-After', response)
+
+
+class TokenCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_token_cache().reset_stats()
+        self.user = AuthUser.objects.create_user(username='token@example.com', email='token@example.com',
+                                                 password='secret-pass')
+        login = APIClient().post('/users/login/', {'email': 'token@example.com', 'password': 'secret-pass'},
+                                 format='json')
+        self.key = login.json()['token']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.key}")
+
+    def test_token_resolved_from_cache(self):
+        self.assertEqual(self.client.get('/users/profile/').json()['email'], 'token@example.com')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/users/profile/').status_code, 200)
+        stats = get_token_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_logout_revokes_token_immediately(self):
+        self.assertEqual(self.client.get('/users/profile/').status_code, 200)
+        self.assertEqual(self.client.post('/users/logout/').status_code, 200)
+        response = self.client.get('/users/profile/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['detail'], 'Invalid token.')
+        self.assertEqual(get_token_cache().stats()['invalidations'], 1)
+
+    def test_deactivation_revokes_token_immediately(self):
+        self.assertEqual(self.client.get('/users/profile/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/users/profile/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['detail'], 'User inactive or deleted.')
+
+    def test_cache_holds_no_password_and_local_ttl_is_bounded(self):
+        self.assertEqual(self.client.get('/users/profile/').status_code, 200)
+        token_cache = get_token_cache()
+        key = next(k for k in cache._cache if ':authtoken:token:' in k)
+        self.assertNotIn(self.user.password, repr(cache.get(key.split(':', 2)[2])))
+        self.assertLessEqual(cache._expire_info[key] - time.time(), settings.LOCAL_CACHE_MAX_TIMEOUT)
+        self.assertEqual(token_cache.stats()['timeout'], settings.LOCAL_CACHE_MAX_TIMEOUT)
+
+        # пользователь из кэша без пароля: его save() пароль не затирает
+        cached = token_cache.get(self.key).user
+        cached.first_name = 'Cached'
+        cached.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Cached')
+        self.assertTrue(self.user.check_password('secret-pass'))
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/auth/token-cache/stats/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        stats = self.client.get('/api/auth/token-cache/stats/').json()
+        self.assertTrue(stats['enabled'])
+        self.assertEqual(stats['invalidations'], 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher',
+                                     'django.contrib.auth.hashers.PBKDF2PasswordHasher'])
+class AsyncAuthTest(TestCase):
+
+    async def _post(self, path, body):
+        return await self.async_client.post(path, body, content_type='application/json')
+
+    async def test_register_login_and_use_token(self):
+        body = {"email": "Async@Example.com", "password": "Str0ng-pass-1", "first_name": "Ann"}
+        created = await self._post('/api/async/register/', body)
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(created.json()['email'], 'async@example.com')
+        self.assertEqual((await self._post('/api/async/register/', body)).status_code, 400)
+
+        login = await self._post('/api/async/login/', {"email": "async@example.com", "password": "Str0ng-pass-1"})
+        self.assertEqual(login.status_code, 200)
+        profile = await self.async_client.get('/users/profile/',
+                                              headers={'Authorization': f"Token {login.json()['token']}"})
+        self.assertEqual(profile.json()['first_name'], 'Ann')
+
+        wrong = await self._post('/api/async/login/', {"email": "async@example.com", "password": "nope"})
+        self.assertEqual(wrong.status_code, 401)
+        unknown = await self._post('/api/async/login/', {"email": "ghost@example.com", "password": "nope"})
+        self.assertEqual(unknown.status_code, 401)
+
+    async def test_register_rejects_weak_password(self):
+        response = await self._post('/api/async/register/', {"email": "weak@example.com", "password": "123"})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['details'])
+        self.assertFalse(await AuthUser.objects.filter(username='weak@example.com').aexists())
+
+    async def test_outdated_hash_is_upgraded_on_login(self):
+        from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+        await AuthUser.objects.acreate(username='old@example.com',
+                                       password=PBKDF2PasswordHasher().encode('Str0ng-pass', 'salt', iterations=1))
+        response = await self._post('/api/async/login/', {"email": "old@example.com", "password": "Str0ng-pass"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue((await AuthUser.objects.aget(username='old@example.com')).password.startswith('md5$'))
+
+    async def test_saturated_executor_sheds_load(self):
+        executor = BoundedExecutor(1, 0)
+        with mock.patch('api.async_views.get_hash_executor', return_value=executor):
+            response = await self._post('/api/async/login/', {"email": "a@example.com", "password": "x"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(executor.stats()['rejected'], 1)
+
+    @override_settings(API_THROTTLE_RATES=THROTTLE_RATES)
+    async def test_login_is_throttled_per_ip(self):
+        body = {"email": "a@example.com", "password": "x"}
+        codes = [(await self._post('/api/async/login/', body)).status_code for _ in range(3)]
+        self.assertEqual(codes, [401, 401, 429])
+
+
+@override_settings(EXPORT_WATERMARK_LAG=0, EXPORT_CHUNK_SIZE=2)
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.admin = AuthUser.objects.create_superuser('export', 'export@example.com', 'pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        test = PsychologicalTest.objects.create(title='Big Five', description='')
+        for i in range(5):
+            user = User.objects.create(email=f'export{i}@example.com', profile={'scales': {'motivation': i}})
+            UserProfile.objects.create(user=user, gender='F')
+            response = UserResponse.objects.create(user=self.admin, test=test, answers={'q': i}, score=i)
+            Assessment.objects.create(title=f'Оценка {i}', user=self.admin, response=response, score='1.50')
+
+    def _rows(self, response):
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_ndjson_streams_in_chunks_ordered_by_updated_at(self):
+        response = self.client.get('/api/export/users/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual([row['email'] for row in rows], [f'export{i}@example.com' for i in range(5)])
+        self.assertEqual(rows[4]['profile'], {'scales': {'motivation': 4}})
+        self.assertEqual(parse_datetime(rows[0]['updated_at']), User.objects.get(email='export0@example.com').updated_at)
+
+    def test_incremental_export_since_watermark(self):
+        first = self.client.get('/api/export/profiles/')
+        self.assertEqual(len(self._rows(first)), 5)
+        profile = UserProfile.objects.order_by('id')[2]
+        profile.gender = 'O'
+        profile.save()
+        second = self.client.get('/api/export/profiles/', {'since': first['X-Export-Until']})
+        self.assertEqual(self._rows(second), [
+            {'id': profile.id, 'user_id': profile.user_id, 'date_of_birth': None, 'gender': 'O',
+             'preferences': {}, 'updated_at': profile.updated_at.isoformat()}])
+        third = self.client.get('/api/export/profiles/', {'since': second['X-Export-Until']})
+        self.assertEqual(self._rows(third), [])
+
+    def test_csv_with_gzip(self):
+        response = self.client.get('/api/export/assessments/', {'output': 'csv'}, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="assessments.csv"')
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(b''.join(response.streaming_content)).decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual((rows[0]['title'], rows[0]['score'], rows[0]['evaluator_id']), ('Оценка 0', '1.50', ''))
+
+        empty = self.client.get('/api/export/assessments/', {'output': 'csv', 'since': '2999-01-01T00:00:00'})
+        self.assertEqual(b''.join(empty.streaming_content).decode().strip(), ','.join(EXPORTS['assessments'].fields))
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.get('/api/export/plans/').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/users/', {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/export/users/', {'output': 'xml'}).status_code, 400)
+        self.client.force_authenticate(AuthUser.objects.create_user('plain'))
+        self.assertEqual(self.client.get('/api/export/users/').status_code, 403)
+
+    def test_command_writes_gzip_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'responses.ndjson.gz')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        stderr = io.StringIO()
+        call_command('export_data', 'responses', output=path, stderr=stderr)
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            rows = [json.loads(line) for line in fh]
+        self.assertEqual([row['answers'] for row in rows], [{'q': i} for i in range(5)])
+        self.assertIn('Done: 5 responses rows', stderr.getvalue())
+        since = stderr.getvalue().rsplit('--since ', 1)[1].strip()
+        call_command('export_data', 'responses', output=path, since=since, stderr=io.StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            self.assertEqual(fh.read(), '')
+
+
+@override_settings(EXPORT_WATERMARK_LAG=0)
+class AsyncExportTest(TestCase):
+
+    async def test_streams_async_iterator_under_asgi(self):
+        admin = await AuthUser.objects.acreate(username='export', is_staff=True)
+        await User.objects.acreate(email='async-export@example.com')
+        await sync_to_async(self.async_client.force_login)(admin)
+        response = await self.async_client.get('/api/export/users/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(body)['email'], 'async-export@example.com')
@@ -1,7 +1,212 @@
-from rest_framework.throttling import UserRateThrottle
+import threading
+from typing import Optional, Tuple
 
-class CustomUserRateThrottle(UserRateThrottle):
-    rate = '10/hour'  # Ограничение на 10 запросов в час для каждого пользователя
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Case, F, Value, When
+from rest_framework.throttling import SimpleRateThrottle
 
-class CustomAnonRateThrottle(UserRateThrottle):
-    rate = '5/hour'  # Ограничение на 5 запросов в час для анонимных пользователей
\ No newline at end of file
+from .models import ThrottleCounter
+
+"""
+Throttle со скользящим окном (sliding window counter), общий для всех воркеров.
+На ключ (scope + пользователь или IP) хранятся только два счётчика: запросы в текущем
+фиксированном окне и в предыдущем. Оценка числа запросов за последние duration секунд —
+previous * (1 - доля прошедшего окна) + current; память O(1) на ключ вместо списка
+временных меток DRF (SimpleRateThrottle хранит каждую отметку, O(запросов)).
+Счётчик увеличивается атомарно до проверки, поэтому воркеры не обгоняют друг друга;
+отклонённые запросы тоже учитываются — клиент, который долбит endpoint, остаётся за лимитом.
+Хранилище (API_THROTTLE_STORE):
+- 'db' — таблица ThrottleCounter, один upsert ... RETURNING на запрос (PostgreSQL, SQLite 3.35+),
+  на остальных СУБД — UPDATE + SELECT. Согласовано между воркерами без дополнительных сервисов;
+- 'cache' — Django-кэш API_THROTTLE_CACHE_ALIAS (атомарный incr). Согласовано только на общем
+  кэше (Redis, Memcached); LocMemCache — свой в каждом процессе.
+Лимиты — settings.API_THROTTLE_RATES по scope ('10/min', '1000/day'; None — без лимита).
+"""
+
+
+class CacheRateStore:
+    """
+    Счётчики в Django-кэше: ключи <prefix>:<key>:<номер окна>, живут два окна.
+    """
+
+    def __init__(self, backend, prefix='throttle'):
+        self.backend = backend
+        self.prefix = prefix
+
+    def hit(self, key: str, window: int, duration: int) -> Tuple[int, int]:
+        current = f"{self.prefix}:{key}:{window}"
+        self.backend.add(current, 0, 2 * duration)
+        try:
+            count = self.backend.incr(current)
+        except ValueError:
+            # ключ истёк между add и incr
+            self.backend.set(current, 1, 2 * duration)
+            count = 1
+        return count, self.backend.get(f"{self.prefix}:{key}:{window - 1}", 0)
+
+
+class DatabaseRateStore:
+    """
+    Счётчики в таблице ThrottleCounter базы alias (мимо роутера реплик: запись не прикрепляет
+    запрос к default). Устаревшие строки удаляет purge_throttle_counters.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def hit(self, key: str, window: int, duration: int) -> Tuple[int, int]:
+        expires_at = (window + 2) * duration
+        connection = connections[self.alias]
+        # upsert с RETURNING: PostgreSQL и SQLite 3.35+ (на более старой SQLite — запасной путь)
+        if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+            return self._upsert(connection, key, window, expires_at)
+        return self._update_or_create(key, window, expires_at)
+
+    def _upsert(self, connection, key, window, expires_at):
+        qn = connection.ops.quote_name
+        table = qn(ThrottleCounter._meta.db_table)
+        key_col, window_col, count_col, previous_col, expires_col = (
+            qn(f.column) for f in (ThrottleCounter._meta.get_field(name) for name in
+                                   ('key', 'window_index', 'count', 'previous', 'expires_at')))
+        # в SET справа — значения строки до обновления, EXCLUDED — вставляемые
+        sql = (
+            f"INSERT INTO {table} ({key_col}, {window_col}, {count_col}, {previous_col}, {expires_col}) "
+            f"VALUES (%s, %s, 1, 0, %s) "
+            f"ON CONFLICT ({key_col}) DO UPDATE SET "
+            f"{previous_col} = CASE WHEN {table}.{window_col} = EXCLUDED.{window_col} THEN {table}.{previous_col} "
+            f"WHEN {table}.{window_col} = EXCLUDED.{window_col} - 1 THEN {table}.{count_col} ELSE 0 END, "
+            f"{count_col} = CASE WHEN {table}.{window_col} = EXCLUDED.{window_col} "
+            f"THEN {table}.{count_col} + 1 ELSE 1 END, "
+            f"{window_col} = EXCLUDED.{window_col}, {expires_col} = EXCLUDED.{expires_col} "
+            f"RETURNING {count_col}, {previous_col}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [key, window, expires_at])
+            count, previous = cursor.fetchone()
+        return count, previous
+
+    def _update_or_create(self, key, window, expires_at):
+        counters = ThrottleCounter.objects.using(self.alias).filter(key=key)
+        updated = counters.update(
+            previous=Case(When(window_index=window, then=F('previous')),
+                          When(window_index=window - 1, then=F('count')), default=Value(0)),
+            count=Case(When(window_index=window, then=F('count') + 1), default=Value(1)),
+            window_index=window, expires_at=expires_at,
+        )
+        if not updated:
+            try:
+                with transaction.atomic(using=self.alias):
+                    ThrottleCounter.objects.using(self.alias).create(
+                        key=key, window_index=window, count=1, previous=0, expires_at=expires_at)
+                return 1, 0
+            except IntegrityError:
+                # строку параллельно создал другой воркер
+                return self._update_or_create(key, window, expires_at)
+        return counters.values_list('count', 'previous').get()
+
+    def purge(self, now: float) -> int:
+        deleted, _ = ThrottleCounter.objects.using(self.alias).filter(expires_at__lt=now).delete()
+        return deleted
+
+
+_rate_store = None
+_rate_store_lock = threading.Lock()
+
+
+def get_rate_store():
+    """
+    Хранилище счётчиков процесса, сконфигурированное из settings (создаётся лениво).
+    """
+    global _rate_store
+    if _rate_store is None:
+        with _rate_store_lock:
+            if _rate_store is None:
+                kind = settings.API_THROTTLE_STORE
+                if kind == 'db':
+                    _rate_store = DatabaseRateStore(settings.API_THROTTLE_DB_ALIAS)
+                elif kind == 'cache':
+                    from django.core.cache import caches
+
+                    _rate_store = CacheRateStore(caches[settings.API_THROTTLE_CACHE_ALIAS])
+                else:
+                    raise ImproperlyConfigured(f"Unknown API_THROTTLE_STORE: {kind!r}")
+    return _rate_store
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    База throttle со скользящим окном. Ключ — scope и pk пользователя (анонимные — IP).
+    """
+    # только эти методы ограничиваются (None — все)
+    methods: Optional[Tuple[str, ...]] = None
+
+    def get_rate(self):
+        rates = settings.API_THROTTLE_RATES
+        if self.scope not in rates:
+            raise ImproperlyConfigured(f"No rate set in API_THROTTLE_RATES for scope {self.scope!r}")
+        return rates[self.scope] or None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user-{request.user.pk}"
+        else:
+            ident = self.get_ident(request)
+        return f"{self.scope}:{ident}"
+
+    def allow_request(self, request, view):
+        if self.rate is None or (self.methods is not None and request.method not in self.methods):
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+        self.count, self.previous = get_rate_store().hit(key, window, self.duration)
+        return self.estimate() <= self.num_requests
+
+    def estimate(self):
+        return self.previous * (1 - self.elapsed / self.duration) + self.count
+
+    def wait(self):
+        """
+        Секунды до момента, когда следующий запрос уложится в лимит (для Retry-After).
+        """
+        if self.count >= self.num_requests:
+            # в текущем окне места нет — до его конца и доли следующего, где оно станет предыдущим
+            return self.duration - self.elapsed + self.duration * (1 - (self.num_requests - 1) / self.count)
+        if not self.previous:
+            return None
+        # previous * (1 - t / duration) + count + 1 <= num_requests
+        needed = self.duration * (1 - (self.num_requests - self.count - 1) / self.previous)
+        return max(needed - self.elapsed, 0)
+
+
+class CustomUserRateThrottle(SlidingWindowRateThrottle):
+    scope = 'user'
+
+
+class CustomAnonRateThrottle(SlidingWindowRateThrottle):
+    # только анонимные запросы (по IP), как AnonRateThrottle
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f"{self.scope}:{self.get_ident(request)}"
+
+
+class PlannerRateThrottle(SlidingWindowRateThrottle):
+    # генерация планов (POST); списки и статусы заданий не ограничиваются
+    scope = 'planner'
+    methods = ('POST',)
+
+
+class AuthRateThrottle(SlidingWindowRateThrottle):
+    # вход и регистрация: всегда по IP — перебор паролей идёт без аутентификации
+    scope = 'auth'
+
+    def get_cache_key(self, request, view):
+        return f"{self.scope}:{self.get_ident(request)}"
@@ -1,12 +1,34 @@
 from django.urls import path
-from assessments.views import AssessmentDetail,AssessmentList
-from users.views import UserList,UserDetail
-from planner.views import  PlannerView
+from assessments.views import AssessmentDetail,AssessmentList,TestScoreStatsView,TestPercentileView,ResponsePercentileView
+from users.views import UserList,UserDetail,UserSegmentView
+from planner.views import  PlannerView, PlannerBatchView
+from .async_views import (AsyncAssessmentDetail, AsyncAssessmentList, AsyncLoginView, AsyncPlannerView,
+                          AsyncRegisterView)
+from .views import ExportView, ResponseCacheStatsView, TokenCacheStatsView
 
 urlpatterns = [
     path('assessments/', AssessmentList.as_view(), name='assessment-list'),
     path('assessments/<int:pk>/', AssessmentDetail.as_view(), name='assessment-detail'),
+    path('tests/<int:pk>/stats/', TestScoreStatsView.as_view(), name='test-score-stats'),
+    path('tests/<int:pk>/percentile/', TestPercentileView.as_view(), name='test-percentile'),
+    path('responses/<int:pk>/percentile/', ResponsePercentileView.as_view(), name='response-percentile'),
     path('users/', UserList.as_view(), name='user-list'),
     path('users/<int:pk>/', UserDetail.as_view(), name='user-detail'),
+    # GET - пользователи по атрибутам профиля (?learning_style=visual&neuroticism__gte=3.5)
+    path('users/segment/', UserSegmentView.as_view(), name='user-segment'),
     path('planner/', PlannerView.as_view(), name='planner'),
+    path('planner/batch/', PlannerBatchView.as_view(), name='planner-batch'),
+    # GET - счётчики кэша ответов detail-endpoint'ов (только для админов)
+    path('cache/stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
+    # GET - счётчики кэша токенов аутентификации (только для админов)
+    path('auth/token-cache/stats/', TokenCacheStatsView.as_view(), name='token-cache-stats'),
+    # GET - потоковая выгрузка NDJSON/CSV (?output=csv, ?since=ISO; только для админов)
+    path('export/<str:name>/', ExportView.as_view(), name='export'),
+    # async-варианты для ASGI: async ORM, генерация планов в ограниченном пуле (503 при перегрузке)
+    path('async/planner/', AsyncPlannerView.as_view(), name='async-planner'),
+    path('async/assessments/', AsyncAssessmentList.as_view(), name='async-assessment-list'),
+    path('async/assessments/<int:pk>/', AsyncAssessmentDetail.as_view(), name='async-assessment-detail'),
+    # вход и регистрация: хэширование паролей в отдельном пуле (429 по IP, 503 при перегрузке)
+    path('async/login/', AsyncLoginView.as_view(), name='async-login'),
+    path('async/register/', AsyncRegisterView.as_view(), name='async-register'),
 ]
\ No newline at end of file
@@ -1,36 +1,111 @@
 # api/views.py
+import re
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from rest_framework import generics
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 
 from assessments.models import Assessment
+from assessments.pagination import AssessmentCursorPagination
 from users.models import User
 from assessments.serializers import AssessmentSerializer
 from users.serializers import UserSerializer
+from .authentication import get_token_cache
+from .export import EXPORTS, Export, async_chunks, gzip_chunks, parse_since
+from .replicas import ReplicaReadMixin
+from .response_cache import CachedRetrieveMixin, get_response_cache
 
 # --------------------------
 # Assessments
 # --------------------------
-class AssessmentList(generics.ListCreateAPIView):
-    queryset = Assessment.objects.all()
+class AssessmentList(ReplicaReadMixin, generics.ListCreateAPIView):
+    queryset = Assessment.objects.with_related()
     serializer_class = AssessmentSerializer
+    pagination_class = AssessmentCursorPagination
 
-class AssessmentDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Assessment.objects.all()
+class AssessmentDetail(CachedRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
+    cache_namespace = 'assessment'
+    queryset = Assessment.objects.with_related()
     serializer_class = AssessmentSerializer
 
 # --------------------------
 # Users
 # --------------------------
-class UserList(generics.ListCreateAPIView):
+class UserList(ReplicaReadMixin, generics.ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
-class UserDetail(generics.RetrieveUpdateDestroyAPIView):
+class UserDetail(CachedRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
+    cache_namespace = 'user'
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
+# --------------------------
+# Кэш ответов
+# --------------------------
+class ResponseCacheStatsView(APIView):
+    """
+    GET: счётчики кэша ответов detail-endpoint'ов текущего процесса (hits/misses/304/инвалидации
+    и hit_rate по namespace). Только для админов.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_response_cache().stats(), status=status.HTTP_200_OK)
+
+class TokenCacheStatsView(APIView):
+    """
+    GET: счётчики кэша токенов текущего процесса (hits/misses/инвалидации, hit_rate).
+    Только для админов.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_token_cache().stats(), status=status.HTTP_200_OK)
+
+# --------------------------
+# Выгрузка
+# --------------------------
+_ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+class ExportView(ReplicaReadMixin, APIView):
+    """
+    GET: потоковая выгрузка таблицы (api.export.EXPORTS: users, profiles, responses, assessments)
+    в NDJSON (по умолчанию) или CSV (?output=csv); ?since=<ISO 8601> — только изменённые после
+    since. X-Export-Until — since следующей инкрементальной выгрузки. Сжатие gzip — если клиент
+    принимает (Accept-Encoding). Только для админов.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, name):
+        if name not in EXPORTS:
+            raise NotFound(f"Unknown export; available: {', '.join(EXPORTS)}.")
+        try:
+            export = Export(name, fmt=request.query_params.get('output', 'ndjson'),
+                            since=parse_since(request.query_params.get('since')))
+        except ValueError as exc:
+            raise ValidationError({"detail": str(exc)})
+
+        content = export.chunks()
+        compress = bool(_ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        if compress:
+            content = gzip_chunks(content)
+        if isinstance(request._request, ASGIRequest):
+            content = async_chunks(content)
+        response = StreamingHttpResponse(content, content_type=export.content_type)
+        response['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+        response['X-Export-Until'] = export.until.isoformat()
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
 # --------------------------
 # Planner
 # --------------------------
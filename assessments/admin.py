@@ -1,19 +1,39 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as AuthUserAdmin
+from django.contrib.auth.models import User
+
+from api.admin_tools import ScalableModelAdmin
 from .models import PsychologicalTest, UserResponse,Assessment
 
-class PsychologicalTestAdmin(admin.ModelAdmin):
+class PsychologicalTestAdmin(ScalableModelAdmin):
     list_display = ('title', 'created_at', 'updated_at')
     search_fields = ('title',)
 
-class UserResponseAdmin(admin.ModelAdmin):
+class UserResponseAdmin(ScalableModelAdmin):
     list_display = ('user', 'test', 'score', 'created_at')
     list_filter = ('test',)
+    list_select_related = ('user', 'test')
+    search_fields = ('user__username',)
+    autocomplete_fields = ('user', 'test')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
 
-class AssessmentAdmin(admin.ModelAdmin):
+class AssessmentAdmin(ScalableModelAdmin):
     list_display = ('id', 'title', 'user', 'created_at', 'updated_at')
     search_fields = ('title',)
     list_filter = ('created_at',)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user', 'response', 'evaluator')
+    date_hierarchy = 'created_at'
+
+
+class ScalableAuthUserAdmin(ScalableModelAdmin, AuthUserAdmin):
+    # поиск для автодополнения user/evaluator: префикс username (уникальный, с индексом)
+    search_fields = ('username',)
+
 
 admin.site.register(PsychologicalTest, PsychologicalTestAdmin)
 admin.site.register(UserResponse, UserResponseAdmin)
-admin.site.register(Assessment, AssessmentAdmin)
\ No newline at end of file
+admin.site.register(Assessment, AssessmentAdmin)
+admin.site.unregister(User)
+admin.site.register(User, ScalableAuthUserAdmin)
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class AssessmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'assessments'
\ No newline at end of file
+    name = 'assessments'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from assessments.norms import build_norm_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает индекс норм (отсортированные score по тесту и когортам в ASSESSMENT_NORMS_DIR), "
+        "по которому считаются перцентили. Обычно запускается периодически задачей rebuild_norm_index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='tests',
+                            help="id теста (можно несколько раз); по умолчанию — все тесты.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Строк на чанк чтения.")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be >= 1.")
+        report = build_norm_index(options['tests'], chunk_size=options['chunk_size'])
+        for test_id, info in sorted(report['tests'].items()):
+            self.stdout.write(f"test {test_id}: {info['indexed']} responses, {info['cohorts']} cohorts")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {len(report['tests'])} tests in {report['build_seconds']:.1f}s."
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assessments.stats import rebuild_score_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Полностью пересчитывает материализованную статистику UserResponse.score (TestScoreStats) "
+        "потоковым проходом по ответам. Нужна после массовых bulk_create/update()/delete() в обход "
+        "сигналов и после изменения ASSESSMENT_SCORE_RANGE/ASSESSMENT_SCORE_BINS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='tests',
+                            help="id теста (можно несколько раз); по умолчанию — все тесты.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Строк на чанк чтения.")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be >= 1.")
+        started = time.monotonic()
+        counts = rebuild_score_stats(options['tests'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {len(counts)} tests, {sum(counts.values())} responses in {time.monotonic() - started:.1f}s."
+        ))
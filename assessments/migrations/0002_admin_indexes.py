@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['-created_at', '-id'], name='assess_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['title'], name='assess_title_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='psychologicaltest',
+            index=models.Index(fields=['title'], name='assess_test_title_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='userresponse',
+            index=models.Index(fields=['-created_at', '-id'], name='assess_resp_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2 on 2026-10-18 16:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+class _Accumulator:
+    """
+    Копия ScoreAccumulator.add/to_fields (assessments.stats) на момент миграции: миграция
+    не зависит от будущих изменений модуля.
+    """
+
+    def __init__(self, lo, hi, bins):
+        self.lo, self.hi = float(lo), float(hi)
+        self.histogram = [0] * int(bins)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x):
+        x = float(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        # значения вне [lo, hi] попадают в крайние корзины
+        idx = int((x - self.lo) / (self.hi - self.lo) * len(self.histogram))
+        self.histogram[min(max(idx, 0), len(self.histogram) - 1)] += 1
+
+    def to_fields(self):
+        return {
+            "count": self.count, "mean": self.mean, "m2": self.m2,
+            "min_score": self.min, "max_score": self.max,
+            "range_lo": self.lo, "range_hi": self.hi, "histogram": self.histogram,
+        }
+
+
+def fill_stats(apps, schema_editor):
+    """
+    Строит TestScoreStats по существующим ответам (как rebuild_score_stats) одним потоковым проходом.
+    """
+    lo, hi = settings.ASSESSMENT_SCORE_RANGE
+    bins = settings.ASSESSMENT_SCORE_BINS
+    UserResponse = apps.get_model('assessments', 'UserResponse')
+    TestScoreStats = apps.get_model('assessments', 'TestScoreStats')
+    totals = {}
+    rows = UserResponse.objects.order_by().values_list('test_id', 'score').iterator(chunk_size=BATCH_SIZE)
+    for test_id, score in rows:
+        acc = totals.get(test_id)
+        if acc is None:
+            acc = totals[test_id] = _Accumulator(lo, hi, bins)
+        acc.add(score)
+    TestScoreStats.objects.bulk_create(
+        [TestScoreStats(test_id=test_id, **acc.to_fields()) for test_id, acc in totals.items()],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0002_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestScoreStats',
+            fields=[
+                ('test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_stats', serialize=False, to='assessments.psychologicaltest')),
+                ('count', models.BigIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('min_score', models.FloatField(blank=True, null=True)),
+                ('max_score', models.FloatField(blank=True, null=True)),
+                ('range_lo', models.FloatField(default=0)),
+                ('range_hi', models.FloatField(default=100)),
+                ('histogram', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userresponse',
+            index=models.Index(fields=['test', 'score'], name='assess_resp_test_score_idx'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
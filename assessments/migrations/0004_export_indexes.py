@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0003_score_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userresponse',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['updated_at', 'id'], name='assess_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userresponse',
+            index=models.Index(fields=['updated_at', 'id'], name='assess_resp_updated_id_idx'),
+        ),
+    ]
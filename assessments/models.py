@@ -11,6 +11,12 @@ class PsychologicalTest(models.Model):
     def __str__(self):
         return self.title
 
+    class Meta:
+        indexes = [
+            # поиск по префиксу title (LIKE 'x%'); opclasses учитываются только PostgreSQL
+            models.Index(fields=['title'], name='assess_test_title_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
 
 class UserResponse(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -18,10 +24,59 @@ class UserResponse(models.Model):
     answers = models.JSONField()
     score = models.FloatField(default=0)  # ✅ добавлено
     created_at = models.DateTimeField(auto_now_add=True)  # ✅ добавлено
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Response by {self.user.username} for {self.test.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # значения из БД — чтобы сигнал статистики знал, какой score заменяется при сохранении;
+        # при отложенных test_id/score снимка нет (его дочитывает pre_save/pre_delete)
+        if 'test_id' in field_names and 'score' in field_names:
+            instance._stats_snapshot = (instance.__dict__['test_id'], instance.__dict__['score'])
+        return instance
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='assess_resp_created_id_idx'),
+            # min/max score теста (assessments.stats.refresh_bounds)
+            models.Index(fields=['test', 'score'], name='assess_resp_test_score_idx'),
+            # инкрементальная выгрузка (api.export)
+            models.Index(fields=['updated_at', 'id'], name='assess_resp_updated_id_idx'),
+        ]
+
+
+class TestScoreStats(models.Model):
+    """
+    Материализованная статистика UserResponse.score по тесту (см. assessments.stats):
+    count, mean, m2 (Уэлфорд), min/max и гистограмма на [range_lo, range_hi] для перцентилей.
+    """
+    test = models.OneToOneField(PsychologicalTest, primary_key=True, on_delete=models.CASCADE,
+                                related_name='score_stats')
+    count = models.BigIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)
+    min_score = models.FloatField(null=True, blank=True)
+    max_score = models.FloatField(null=True, blank=True)
+    range_lo = models.FloatField(default=0)
+    range_hi = models.FloatField(default=100)
+    histogram = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Score stats for test {self.test_id}"
+
+
+class AssessmentQuerySet(models.QuerySet):
+    def with_related(self):
+        """
+        Подгружает JOIN'ом всё, что читают AssessmentSerializer (user) и __str__ (response.user, response.test),
+        чтобы список из N оценок обходился одним запросом, а не 1 + N.
+        """
+        return self.select_related('user', 'response__user', 'response__test')
+
 
 class Assessment(models.Model):
     # ✅ исправлено — убрал вложенность и добавил недостающие поля
@@ -35,6 +90,8 @@ class Assessment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AssessmentQuerySet.as_manager()
+
     def __str__(self):
         return f"Assessment for {self.response.user.username} - {self.response.test.title}"
 
@@ -42,3 +99,9 @@ class Assessment(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Assessment"
         verbose_name_plural = "Assessments"
+        indexes = [
+            # порядок списков и date_hierarchy (created_at DESC, id DESC), поиск по префиксу title
+            models.Index(fields=['-created_at', '-id'], name='assess_created_id_idx'),
+            models.Index(fields=['title'], name='assess_title_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['updated_at', 'id'], name='assess_updated_id_idx'),
+        ]
@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import time
+from array import array
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.replicas import use_replica
+from users.models import UserProfile
+
+from .models import PsychologicalTest, TestScoreStats, UserResponse
+
+"""
+Индекс норм: перцентиль score среди всех прошедших тест и внутри демографических когорт
+(UserProfile.gender, возрастная группа по date_of_birth).
+На тест — каталог ASSESSMENT_NORMS_DIR/test_<id>/ с двумя файлами:
+- data-<build>.npy — отсортированные float32 score всех групп подряд (один плоский массив),
+  открывается через np.load(mmap_mode='r'), в память процесса не копируется;
+- manifest.json — срезы групп в массиве, время сборки, длительность и объём.
+Перцентиль — два бинарных поиска (np.searchsorted) по срезу группы: O(log n), без запросов к БД.
+Индекс периодически пересобирается целиком (build_norm_index / задача rebuild_norm_index);
+manifest подменяется атомарно (os.replace), читатели подхватывают новую версию по mtime.
+Свежесть: возраст сборки и число ответов, пришедших после неё (по TestScoreStats.count).
+UserResponse ссылается на auth.User, а UserProfile — на users.User; они сопоставляются по email.
+"""
+
+logger = logging.getLogger(__name__)
+
+POPULATION = 'all'
+AGE_BANDS = ((18, '<18'), (25, '18-24'), (35, '25-34'), (45, '35-44'), (55, '45-54'), (65, '55-64'), (None, '65+'))
+DTYPE = np.float32
+
+_MANIFEST = 'manifest.json'
+
+
+# --------------------------
+# Когорты
+# --------------------------
+def age_on(date_of_birth, today):
+    if date_of_birth is None:
+        return None
+    return today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
+
+
+def age_band(age):
+    for upper, label in AGE_BANDS:
+        if upper is None or age < upper:
+            return label
+
+
+def cohort_keys(gender=None, age=None):
+    """
+    Ключи когорт для пола и возраста: gender:F, age:25-34 и их пересечение. Без данных — пусто.
+    """
+    keys = []
+    band = age_band(age) if age is not None else None
+    if gender:
+        keys.append(f"gender:{gender}")
+    if band:
+        keys.append(f"age:{band}")
+    if gender and band:
+        keys.append(f"gender:{gender}|age:{band}")
+    return tuple(keys)
+
+
+def cohort_keys_for_email(email, today=None):
+    """
+    Когорты владельца email по его UserProfile (один запрос).
+    """
+    if not email:
+        return ()
+    profile = (UserProfile.objects.filter(user__email__iexact=email)
+               .values_list('gender', 'date_of_birth').first())
+    if profile is None:
+        return ()
+    gender, dob = profile
+    return cohort_keys(gender, age_on(dob, today or timezone.localdate()))
+
+
+# --------------------------
+# Сборка
+# --------------------------
+def _test_dir(test_id):
+    return os.path.join(settings.ASSESSMENT_NORMS_DIR, f"test_{test_id}")
+
+
+def _write_index(test_id, groups, built_at, build_seconds):
+    """
+    Записывает массив и manifest теста. groups: {ключ группы: array('d') score}.
+    Группы меньше ASSESSMENT_NORMS_MIN_COHORT (кроме всей популяции) не сохраняются.
+    """
+    directory = _test_dir(test_id)
+    os.makedirs(directory, exist_ok=True)
+    min_size = settings.ASSESSMENT_NORMS_MIN_COHORT
+    parts, slices, offset = [], {}, 0
+    for key in sorted(groups):
+        values = groups[key]
+        if key != POPULATION and len(values) < min_size:
+            continue
+        part = np.sort(np.frombuffer(values, dtype=np.float64).astype(DTYPE))
+        parts.append(part)
+        slices[key] = [offset, offset + len(part)]
+        offset += len(part)
+    slices.setdefault(POPULATION, [offset, offset])
+    data = np.concatenate(parts) if parts else np.empty(0, dtype=DTYPE)
+
+    data_name = f"data-{int(built_at.timestamp() * 1000)}.npy"
+    tmp = os.path.join(directory, f".{data_name}.tmp")
+    with open(tmp, 'wb') as fh:
+        np.save(fh, data)
+    os.replace(tmp, os.path.join(directory, data_name))
+    manifest = {
+        "test": test_id,
+        "data": data_name,
+        "dtype": np.dtype(DTYPE).name,
+        "built_at": built_at.isoformat(),
+        "build_seconds": round(build_seconds, 3),
+        "cohorts": slices,
+    }
+    path = os.path.join(directory, _MANIFEST)
+    previous = _read_manifest(path)
+    tmp = os.path.join(directory, f".{_MANIFEST}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, path)
+    # массив предыдущей сборки живёт ещё одно поколение: читатель, успевший прочитать старый manifest,
+    # откроет его без FileNotFoundError. Более старые удаляем (уже открытые memmap работают, POSIX)
+    keep = {data_name, previous["data"] if previous else None}
+    for name in os.listdir(directory):
+        if name.startswith('data-') and name not in keep:
+            os.remove(os.path.join(directory, name))
+    return manifest
+
+
+def _read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+@use_replica()
+def build_norm_index(test_ids=None, chunk_size=5000):
+    """
+    Полная пересборка индекса (всех тестов или test_ids) одним потоковым проходом по UserResponse
+    (чтение с реплики, если она настроена).
+    Score копятся в array('d') по группам (8 байт на значение и группу). Возвращает отчёт
+    {"tests": {test_id: {"indexed": n, "cohorts": k}}, "build_seconds": ...}.
+    """
+    started = time.monotonic()
+    built_at = timezone.now()
+    today = timezone.localdate()
+
+    tests = PsychologicalTest.objects.all()
+    responses = UserResponse.objects.all()
+    if test_ids is not None:
+        tests = tests.filter(pk__in=test_ids)
+        responses = responses.filter(test_id__in=test_ids)
+
+    cohorts_by_email = {}
+    profiles = UserProfile.objects.values_list('user__email', 'gender', 'date_of_birth')
+    for email, gender, dob in profiles.iterator(chunk_size=chunk_size):
+        keys = cohort_keys(gender, age_on(dob, today))
+        if keys:
+            cohorts_by_email[email.lower()] = keys
+
+    groups = {test_id: {POPULATION: array('d')} for test_id in tests.values_list('pk', flat=True)}
+    rows = responses.order_by().values_list('test_id', 'score', 'user__email').iterator(chunk_size=chunk_size)
+    for test_id, score, email in rows:
+        test_groups = groups.setdefault(test_id, {POPULATION: array('d')})
+        test_groups[POPULATION].append(score)
+        for key in cohorts_by_email.get(email.lower(), ()) if email else ():
+            values = test_groups.get(key)
+            if values is None:
+                values = test_groups[key] = array('d')
+            values.append(score)
+
+    build_seconds = time.monotonic() - started
+    report = {}
+    for test_id, test_groups in groups.items():
+        manifest = _write_index(test_id, test_groups, built_at, build_seconds)
+        report[test_id] = {"indexed": len(test_groups[POPULATION]), "cohorts": len(manifest["cohorts"]) - 1}
+    build_seconds = time.monotonic() - started
+    logger.info("Built norm index for %d tests in %.2fs", len(report), build_seconds)
+    return {"tests": report, "build_seconds": round(build_seconds, 3)}
+
+
+# --------------------------
+# Чтение
+# --------------------------
+class NormIndex:
+    """
+    Загруженный (memory-mapped) индекс одного теста.
+    """
+
+    def __init__(self, manifest, data):
+        self.manifest = manifest
+        self.data = data
+        self.cohorts = manifest["cohorts"]
+        self.built_at = parse_datetime(manifest["built_at"])
+        # срезы групп — обычные ndarray-представления над отображённым файлом (без копирования):
+        # срез np.memmap на каждый запрос стоит дороже самих бинарных поисков
+        flat = np.asarray(data)
+        self._groups = {key: flat[start:end] for key, (start, end) in self.cohorts.items() if end > start}
+        self._scalar = flat.dtype.type
+
+    @property
+    def indexed(self):
+        start, end = self.cohorts[POPULATION]
+        return end - start
+
+    def percentile(self, score, cohort=POPULATION):
+        """
+        (перцентиль 0..100, размер группы) для score или None, если группы нет в индексе.
+        Перцентиль — доля значений ниже score плюс половина равных (mid-rank).
+        """
+        values = self._groups.get(cohort)
+        if values is None:
+            return None
+        x = self._scalar(score)
+        below = int(values.searchsorted(x, 'left'))
+        upto = int(values.searchsorted(x, 'right'))
+        n = len(values)
+        return (below + (upto - below) / 2) / n * 100, n
+
+    def freshness(self, current_count=None):
+        """
+        Возраст сборки, её длительность и число ответов сверх проиндексированных
+        (current_count — текущее число ответов теста, например TestScoreStats.count).
+        """
+        age = (timezone.now() - self.built_at).total_seconds()
+        pending = max(current_count - self.indexed, 0) if current_count is not None else None
+        return {
+            "built_at": self.manifest["built_at"],
+            "age_seconds": round(age, 3),
+            "build_seconds": self.manifest["build_seconds"],
+            "indexed": self.indexed,
+            "pending": pending,
+            "stale": age > settings.ASSESSMENT_NORMS_MAX_AGE,
+        }
+
+
+_loaded = {}
+
+
+def load_norm_index(test_id):
+    """
+    NormIndex теста или None, если индекс ещё не собран. Кэшируется в процессе до смены manifest.
+    """
+    path = os.path.join(_test_dir(test_id), _MANIFEST)
+    for attempt in range(2):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            _loaded.pop(test_id, None)
+            return None
+        cached = _loaded.get(test_id)
+        if cached is not None and cached[0] == (path, mtime):
+            return cached[1]
+        manifest = _read_manifest(path)
+        if manifest is None:
+            _loaded.pop(test_id, None)
+            return None
+        try:
+            data = np.load(os.path.join(_test_dir(test_id), manifest["data"]), mmap_mode='r')
+        except FileNotFoundError:
+            # manifest прочитан до пересборки, а массив уже удалён двумя сборками позже — читаем заново
+            if attempt:
+                raise
+            continue
+        index = NormIndex(manifest, data)
+        _loaded[test_id] = ((path, mtime), index)
+        return index
+
+
+def percentile_report(test_id, score, cohorts=()):
+    """
+    Перцентиль score по популяции теста и по каждой из cohorts, плюс свежесть индекса.
+    None, если индекс теста не собран.
+    """
+    index = load_norm_index(test_id)
+    if index is None:
+        return None
+    population = index.percentile(score)
+    cohort_results = []
+    for key in cohorts:
+        result = index.percentile(score, key)
+        if result is not None:
+            cohort_results.append({"cohort": key, "percentile": result[0], "n": result[1]})
+    current = TestScoreStats.objects.filter(test_id=test_id).values_list('count', flat=True).first()
+    return {
+        "test": test_id,
+        "score": score,
+        "population": {"percentile": population[0], "n": population[1]} if population else None,
+        "cohorts": cohort_results,
+        "index": index.freshness(current or 0),
+    }
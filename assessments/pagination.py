@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AssessmentCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация списков оценок: без COUNT(*) и OFFSET, страница — один запрос
+    независимо от её номера и размера таблицы.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api.response_cache import invalidate
+
+from .models import Assessment, UserResponse
+from .stats import apply_score_change, rebuild_score_stats
+
+
+@receiver([pre_save, pre_delete], sender=UserResponse, dispatch_uid='assessments_stats_snapshot')
+def load_stats_snapshot(sender, instance, raw=False, **kwargs):
+    # объект загружен с отложенными test_id/score: прежние значения дочитываются из БД (один запрос)
+    if raw or instance._state.adding or hasattr(instance, '_stats_snapshot'):
+        return
+    previous = UserResponse.objects.filter(pk=instance.pk).values_list('test_id', 'score').first()
+    if previous is not None:
+        instance._stats_snapshot = previous
+
+
+@receiver(post_save, sender=UserResponse, dispatch_uid='assessments_stats_on_save')
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Инкрементально обновляет TestScoreStats: новый score добавляется, заменённый — вычитается.
+    """
+    if raw:
+        return
+    current = (instance.test_id, instance.score)
+    previous = getattr(instance, '_stats_snapshot', None)
+    instance._stats_snapshot = current
+    if created:
+        apply_score_change(instance.test_id, add=instance.score)
+    elif previous is None:
+        # объект собран не из БД (save() с явным pk) — прежний score неизвестен, пересчитываем тест
+        rebuild_score_stats([instance.test_id])
+    elif previous == current:
+        return
+    elif previous[0] == instance.test_id:
+        apply_score_change(instance.test_id, add=instance.score, remove=previous[1])
+    else:
+        apply_score_change(previous[0], remove=previous[1])
+        apply_score_change(instance.test_id, add=instance.score)
+
+
+@receiver(post_delete, sender=UserResponse, dispatch_uid='assessments_stats_on_delete')
+def update_stats_on_delete(sender, instance, **kwargs):
+    snapshot = getattr(instance, '_stats_snapshot', None)
+    test_id, score = snapshot if snapshot is not None else (instance.test_id, instance.score)
+    apply_score_change(test_id, remove=score)
+
+
+@receiver([post_save, post_delete], sender=Assessment, dispatch_uid='assessments_invalidate_response')
+def invalidate_assessment(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate('assessment', instance.pk)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='assessments_invalidate_user_assessments')
+def invalidate_user_assessments(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    AssessmentSerializer вкладывает user: после изменения пользователя ответы его оценок
+    устарели. updated_at сдвигается, чтобы сменились и валидаторы (ETag/Last-Modified), иначе
+    условный запрос получал бы 304. Удаление пользователя удаляет оценки каскадом.
+    """
+    if created or (update_fields is not None and set(update_fields) == {'last_login'}):
+        return
+    pks = list(Assessment.objects.filter(user_id=instance.pk).values_list('pk', flat=True))
+    if not pks:
+        return
+    Assessment.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+    for pk in pks:
+        invalidate('assessment', pk)
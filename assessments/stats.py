@@ -0,0 +1,233 @@
+import logging
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import PsychologicalTest, TestScoreStats, UserResponse
+
+"""
+Материализованная статистика UserResponse.score по тестам (TestScoreStats).
+На тест хранится сливаемый аккумулятор: count, mean и M2 (сумма квадратов отклонений, Уэлфорд),
+min/max и гистограмма с фиксированными корзинами на [lo, hi] для перцентилей.
+Сохранение/удаление ответа меняет одну строку (add/remove под select_for_update), полный
+пересчёт — команда rebuild_score_stats (аккумуляторы по чанкам сливаются через merge).
+Чтение — одна строка по PK, перцентили считаются по гистограмме за O(числа корзин).
+bulk_create/update()/delete() через queryset сигналов не шлют — после них нужен rebuild.
+"""
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class ScoreAccumulator:
+    """
+    Счётчик count/mean/M2/min/max + гистограмма. Поддерживает add, remove и merge (Chan et al.).
+    """
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max', 'lo', 'hi', 'histogram')
+
+    def __init__(self, lo=None, hi=None, bins=None):
+        self.lo = float(settings.ASSESSMENT_SCORE_RANGE[0] if lo is None else lo)
+        self.hi = float(settings.ASSESSMENT_SCORE_RANGE[1] if hi is None else hi)
+        self.histogram = [0] * int(settings.ASSESSMENT_SCORE_BINS if bins is None else bins)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def _bin(self, x):
+        # значения вне [lo, hi] попадают в крайние корзины (min/max при этом точные)
+        idx = int((x - self.lo) / (self.hi - self.lo) * len(self.histogram))
+        return min(max(idx, 0), len(self.histogram) - 1)
+
+    def add(self, x):
+        x = float(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        self.histogram[self._bin(x)] += 1
+
+    def remove(self, x):
+        """
+        Обратный шаг Уэлфорда. Возвращает True, если удалён текущий min/max —
+        тогда границы нужно уточнить по данным (см. refresh_bounds).
+        """
+        x = float(x)
+        if self.count <= 1:
+            self.__init__(self.lo, self.hi, len(self.histogram))
+            return False
+        mean = (self.count * self.mean - x) / (self.count - 1)
+        self.m2 = max(self.m2 - (x - mean) * (x - self.mean), 0.0)
+        self.mean = mean
+        self.count -= 1
+        idx = self._bin(x)
+        self.histogram[idx] = max(self.histogram[idx] - 1, 0)
+        return x <= self.min or x >= self.max
+
+    def merge(self, other):
+        if (other.lo, other.hi, len(other.histogram)) != (self.lo, self.hi, len(self.histogram)):
+            raise ValueError("Cannot merge accumulators with different histogram ranges")
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            self.histogram = list(other.histogram)
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        return self
+
+    @property
+    def variance(self):
+        # выборочная дисперсия (n - 1), как StdDev/Variance(sample=True) в СУБД
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stddev(self):
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    def percentile(self, q):
+        """
+        q-й перцентиль (0..100) по гистограмме: линейная интерполяция внутри корзины,
+        результат ограничен [min, max]. Точность — ширина корзины.
+        """
+        if not self.count:
+            return None
+        target = q / 100 * self.count
+        width = (self.hi - self.lo) / len(self.histogram)
+        seen = 0
+        for idx, n in enumerate(self.histogram):
+            if n and seen + n >= target:
+                value = self.lo + width * (idx + (target - seen) / n)
+                return min(max(value, self.min), self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.mean if self.count else None,
+            "variance": self.variance,
+            "stddev": self.stddev,
+            "min": self.min,
+            "max": self.max,
+            "percentiles": {f"p{q}": self.percentile(q) for q in PERCENTILES},
+        }
+
+    # --------------------------
+    # Строка TestScoreStats <-> аккумулятор
+    # --------------------------
+    @classmethod
+    def from_row(cls, row):
+        acc = cls(row.range_lo, row.range_hi, len(row.histogram) or None)
+        if row.histogram:
+            acc.histogram = list(row.histogram)
+        acc.count, acc.mean, acc.m2 = row.count, row.mean, row.m2
+        acc.min, acc.max = row.min_score, row.max_score
+        return acc
+
+    def to_fields(self):
+        return {
+            "count": self.count, "mean": self.mean, "m2": self.m2,
+            "min_score": self.min, "max_score": self.max,
+            "range_lo": self.lo, "range_hi": self.hi, "histogram": self.histogram,
+        }
+
+
+def _locked_row(test_id, create=True):
+    row = TestScoreStats.objects.select_for_update().filter(test_id=test_id).first()
+    if row is None and create:
+        TestScoreStats.objects.get_or_create(test_id=test_id, defaults=ScoreAccumulator().to_fields())
+        row = TestScoreStats.objects.select_for_update().get(test_id=test_id)
+    return row
+
+
+def _save(row, acc):
+    for field, value in acc.to_fields().items():
+        setattr(row, field, value)
+    row.save()
+
+
+def refresh_bounds(test_id, acc):
+    """
+    Точные min/max после удаления крайнего значения — по индексу (test, score).
+    """
+    bounds = UserResponse.objects.filter(test_id=test_id).aggregate(low=Min('score'), high=Max('score'))
+    acc.min, acc.max = (bounds['low'], bounds['high']) if acc.count else (None, None)
+
+
+def apply_score_change(test_id, add=None, remove=None):
+    """
+    Учитывает в статистике теста добавление и/или удаление одного значения score.
+    """
+    with transaction.atomic():
+        # без строки вычитать не из чего (например, тест удаляется каскадом вместе со статистикой)
+        row = _locked_row(test_id, create=add is not None)
+        if row is None:
+            return
+        acc = ScoreAccumulator.from_row(row)
+        stale_bounds = False
+        if remove is not None:
+            stale_bounds = acc.remove(remove)
+        if add is not None:
+            acc.add(add)
+        if stale_bounds:
+            refresh_bounds(test_id, acc)
+        _save(row, acc)
+
+
+def rebuild_score_stats(test_ids=None, chunk_size=5000):
+    """
+    Полный пересчёт статистики (всех тестов или test_ids) потоковым проходом по UserResponse.
+    Чанк агрегируется в свои аккумуляторы и сливается в общие (merge). Возвращает {test_id: count}.
+    """
+    tests = PsychologicalTest.objects.all()
+    responses = UserResponse.objects.all()
+    if test_ids is not None:
+        tests = tests.filter(pk__in=test_ids)
+        responses = responses.filter(test_id__in=test_ids)
+
+    totals = {test_id: ScoreAccumulator() for test_id in tests.values_list('pk', flat=True)}
+    chunk = {}
+    rows = responses.order_by().values_list('test_id', 'score').iterator(chunk_size=chunk_size)
+    for i, (test_id, score) in enumerate(rows, 1):
+        acc = chunk.get(test_id)
+        if acc is None:
+            acc = chunk[test_id] = ScoreAccumulator()
+        acc.add(score)
+        if i % chunk_size == 0:
+            for key, part in chunk.items():
+                totals.setdefault(key, ScoreAccumulator()).merge(part)
+            chunk = {}
+    for key, part in chunk.items():
+        totals.setdefault(key, ScoreAccumulator()).merge(part)
+
+    with transaction.atomic():
+        TestScoreStats.objects.filter(test_id__in=list(totals)).delete()
+        TestScoreStats.objects.bulk_create(
+            [TestScoreStats(test_id=test_id, **acc.to_fields()) for test_id, acc in totals.items()],
+            batch_size=1000)
+    logger.info("Rebuilt score stats for %d tests", len(totals))
+    return {test_id: acc.count for test_id, acc in totals.items()}
+
+
+def score_stats(test_id):
+    """
+    ScoreAccumulator теста из материализованной строки (один запрос по PK) или None.
+    """
+    row = TestScoreStats.objects.filter(test_id=test_id).first()
+    return ScoreAccumulator.from_row(row) if row is not None else None
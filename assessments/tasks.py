@@ -0,0 +1,11 @@
+from celery import shared_task
+
+from .norms import build_norm_index
+
+
+@shared_task
+def rebuild_norm_index(test_ids=None):
+    """
+    Периодическая пересборка индекса норм (расписание — CELERY_BEAT_SCHEDULE).
+    """
+    return build_norm_index(test_ids)
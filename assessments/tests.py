@@ -1,5 +1,23 @@
-from django.test import TestCase
-from .models import Assessment, UserResponse
+import os
+import random
+import statistics
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+import numpy
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users.models import User as AppUser, UserProfile
+from . import norms
+from .models import Assessment, PsychologicalTest, UserResponse
+from .norms import build_norm_index, cohort_keys, load_norm_index, percentile_report
+from .stats import ScoreAccumulator, score_stats
 
 class AssessmentModelTest(TestCase):
     def setUp(self):
@@ -27,4 +45,198 @@ class UserResponseModelTest(TestCase):
     def test_user_response_creation(self):
         self.assertEqual(self.user_response.assessment, self.assessment)
         self.assertEqual(self.user_response.user_id, 1)
-        self.assertEqual(self.user_response.response_data, {"question_1": "answer_1"})
\ No newline at end of file
+        self.assertEqual(self.user_response.response_data, {"question_1": "answer_1"})
+
+class ScoreStatsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='taker')
+        self.test = PsychologicalTest.objects.create(title='Big Five', description='')
+        self.rng = random.Random(7)
+
+    def respond(self, score, test=None):
+        return UserResponse.objects.create(user=self.user, test=test or self.test, answers={}, score=score)
+
+    def assertMatches(self, test, scores):
+        stats = score_stats(test.pk)
+        self.assertEqual(stats.count, len(scores))
+        if not scores:
+            return
+        self.assertAlmostEqual(stats.mean, statistics.fmean(scores), places=9)
+        if len(scores) > 1:
+            self.assertAlmostEqual(stats.variance, statistics.variance(scores), places=6)
+        self.assertEqual((stats.min, stats.max), (min(scores), max(scores)))
+
+    def test_accumulator_merge_equals_single_pass(self):
+        values = [self.rng.uniform(0, 100) for _ in range(1000)]
+        whole, left, right = ScoreAccumulator(), ScoreAccumulator(), ScoreAccumulator()
+        for v in values:
+            whole.add(v)
+        for v in values[:300]:
+            left.add(v)
+        for v in values[300:]:
+            right.add(v)
+        left.merge(right)
+        self.assertEqual(left.count, whole.count)
+        self.assertAlmostEqual(left.mean, whole.mean, places=9)
+        self.assertAlmostEqual(left.variance, statistics.variance(values), places=6)
+        self.assertEqual(left.histogram, whole.histogram)
+        width = 100 / len(whole.histogram)
+        ordered = sorted(values)
+        for q in (10, 50, 90):
+            self.assertAlmostEqual(whole.percentile(q), ordered[int(q / 100 * len(values))], delta=2 * width)
+
+    def test_incremental_updates_on_save_and_delete(self):
+        scores = [self.rng.uniform(0, 100) for _ in range(20)]
+        responses = [self.respond(s) for s in scores]
+        self.assertMatches(self.test, scores)
+
+        changed = UserResponse.objects.get(pk=responses[3].pk)
+        changed.score = 55.5
+        changed.save()
+        scores[3] = 55.5
+        self.assertMatches(self.test, scores)
+
+        # удаление текущих min и max — границы уточняются по данным
+        for idx in sorted({scores.index(min(scores)), scores.index(max(scores))}, reverse=True):
+            UserResponse.objects.get(pk=responses[idx].pk).delete()
+            del scores[idx], responses[idx]
+        self.assertMatches(self.test, scores)
+
+    def test_moving_response_to_another_test(self):
+        other = PsychologicalTest.objects.create(title='MBTI', description='')
+        response = self.respond(10)
+        self.respond(20)
+        response = UserResponse.objects.get(pk=response.pk)
+        response.test = other
+        response.save()
+        self.assertMatches(self.test, [20])
+        self.assertMatches(other, [10])
+
+    def test_deferred_fields_do_not_double_count(self):
+        other = PsychologicalTest.objects.create(title='MBTI', description='')
+        response = self.respond(10)
+        UserResponse.objects.only('id').get(pk=response.pk).save()
+        self.assertMatches(self.test, [10])
+
+        moved = UserResponse.objects.only('id', 'answers').get(pk=response.pk)
+        moved.test, moved.score = other, 30
+        moved.save()
+        self.assertMatches(self.test, [])
+        self.assertMatches(other, [30])
+
+        UserResponse.objects.only('id').get(pk=response.pk).delete()
+        self.assertMatches(other, [])
+
+    def test_rebuild_command_covers_bulk_writes(self):
+        self.respond(40)
+        UserResponse.objects.bulk_create(
+            [UserResponse(user=self.user, test=self.test, answers={}, score=s) for s in (10, 70)])
+        self.assertEqual(score_stats(self.test.pk).count, 1)
+        out = StringIO()
+        call_command('rebuild_score_stats', '--chunk-size', '2', stdout=out)
+        self.assertIn('Done: 1 tests, 3 responses', out.getvalue())
+        self.assertMatches(self.test, [40, 10, 70])
+
+    def test_read_api_is_single_query(self):
+        for _ in range(50):
+            self.respond(self.rng.uniform(0, 100))
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/tests/{self.test.pk}/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 50)
+        self.assertEqual(set(response.json()['percentiles']), {'p10', 'p25', 'p50', 'p75', 'p90'})
+
+        empty = PsychologicalTest.objects.create(title='Empty', description='')
+        self.assertEqual(self.client.get(f'/assessments/tests/{empty.pk}/stats/').json()['count'], 0)
+        self.assertEqual(self.client.get('/api/tests/999999/stats/').status_code, 404)
+
+
+class NormIndexTest(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(ASSESSMENT_NORMS_DIR=tmp.name, ASSESSMENT_NORMS_MIN_COHORT=3)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.test = PsychologicalTest.objects.create(title='Big Five', description='')
+        self.rng = random.Random(11)
+        self.scores = {'F': [], 'M': []}
+        today = timezone.localdate()
+        for gender, years in (('F', 30), ('M', 50)):
+            for i in range(40):
+                email = f'{gender.lower()}{i}@example.com'
+                auth_user = User.objects.create(username=email, email=email)
+                profile_user = AppUser.objects.create(email=email)
+                UserProfile.objects.create(user=profile_user, gender=gender,
+                                           date_of_birth=today.replace(year=today.year - years - 1))
+                score = round(self.rng.uniform(0, 100), 1)
+                self.scores[gender].append(score)
+                self.response = UserResponse.objects.create(user=auth_user, test=self.test, answers={}, score=score)
+
+    @staticmethod
+    def expected(values, score):
+        below = sum(v < score for v in values)
+        equal = sum(v == score for v in values)
+        return (below + equal / 2) / len(values) * 100
+
+    def test_percentiles_match_counting(self):
+        call_command('build_norm_index', stdout=StringIO())
+        everyone = self.scores['F'] + self.scores['M']
+        for score in (0, 12.3, self.scores['F'][5], 50, 99.9, 150):
+            report = percentile_report(self.test.pk, score, cohort_keys('F', 30))
+            self.assertAlmostEqual(report['population']['percentile'], self.expected(everyone, score), places=6)
+            self.assertEqual(report['population']['n'], 80)
+            by_key = {c['cohort']: c for c in report['cohorts']}
+            self.assertEqual(set(by_key), {'gender:F', 'age:25-34', 'gender:F|age:25-34'})
+            self.assertAlmostEqual(by_key['gender:F|age:25-34']['percentile'],
+                                   self.expected(self.scores['F'], score), places=6)
+
+    def test_response_percentile_endpoint_reports_staleness(self):
+        self.assertEqual(self.client.get(f'/api/responses/{self.response.pk}/percentile/').status_code, 404)
+        call_command('build_norm_index', stdout=StringIO())
+        UserResponse.objects.create(user=self.response.user, test=self.test, answers={}, score=1)
+
+        body = self.client.get(f'/api/responses/{self.response.pk}/percentile/').json()
+        self.assertEqual(body['population']['n'], 80)
+        self.assertEqual([c['cohort'] for c in body['cohorts']], ['gender:M', 'age:45-54', 'gender:M|age:45-54'])
+        self.assertEqual(body['index']['indexed'], 80)
+        self.assertEqual(body['index']['pending'], 1)
+        self.assertFalse(body['index']['stale'])
+        self.assertGreaterEqual(body['index']['build_seconds'], 0)
+
+        with override_settings(ASSESSMENT_NORMS_MAX_AGE=-1):
+            body = self.client.get(f'/assessments/tests/{self.test.pk}/percentile/', {'score': 50}).json()
+        self.assertTrue(body['index']['stale'])
+        self.assertEqual(body['cohorts'], [])
+        self.assertEqual(self.client.get(f'/api/tests/{self.test.pk}/percentile/', {'score': 'x'}).status_code, 400)
+        for score in ('nan', 'inf', '-Infinity'):
+            self.assertEqual(self.client.get(f'/api/tests/{self.test.pk}/percentile/', {'score': score}).status_code, 400)
+
+    def test_rebuild_replaces_index_atomically(self):
+        build_norm_index()
+        first = load_norm_index(self.test.pk)
+        UserResponse.objects.create(user=self.response.user, test=self.test, answers={}, score=1)
+        build_norm_index([self.test.pk])
+        second = load_norm_index(self.test.pk)
+        self.assertEqual((first.indexed, second.indexed), (80, 81))
+        self.assertIsInstance(second.data, numpy.memmap)
+        # уже открытый индекс продолжает отвечать после замены файлов
+        self.assertEqual(first.percentile(200), (100.0, 80))
+
+    def test_reader_with_outdated_manifest_rereads_it(self):
+        build_norm_index()
+        directory = os.path.join(settings.ASSESSMENT_NORMS_DIR, f'test_{self.test.pk}')
+        stale = norms._read_manifest(os.path.join(directory, 'manifest.json'))
+        for _ in range(2):
+            time.sleep(0.002)
+            build_norm_index([self.test.pk])
+            # массив предыдущей сборки остаётся на диске ещё одно поколение
+            self.assertEqual(len([n for n in os.listdir(directory) if n.startswith('data-')]), 2)
+        self.assertFalse(os.path.exists(os.path.join(directory, stale['data'])))
+
+        current = norms._read_manifest(os.path.join(directory, 'manifest.json'))
+        with mock.patch.object(norms, '_read_manifest', side_effect=[stale, current]):
+            index = load_norm_index(self.test.pk)
+        self.assertEqual(index.manifest['data'], current['data'])
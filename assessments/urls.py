@@ -8,6 +8,9 @@ def _as_view(name):
 urlpatterns = [
     path('', _as_view('AssessmentList'), name='assessment-list'),
     path('<int:pk>/', _as_view('AssessmentDetail'), name='assessment-detail'),
+    path('tests/<int:pk>/stats/', _as_view('TestScoreStatsView'), name='test-score-stats'),
+    path('tests/<int:pk>/percentile/', _as_view('TestPercentileView'), name='test-percentile'),
+    path('responses/<int:pk>/percentile/', _as_view('ResponsePercentileView'), name='response-percentile'),
 
     # маршруты для запуска/отправки теста и получения результатов.
     # Поддерживает как function-based (take_assessment) так и class-based (TakeAssessment) views.
@@ -1,23 +1,85 @@
+import math
+
 from django.shortcuts import render
-from rest_framework import viewsets,generics
-from .models import Assessment, UserResponse
+from rest_framework import viewsets,generics,status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from api.replicas import ReplicaReadMixin
+from api.response_cache import CachedRetrieveMixin
+from .models import Assessment, PsychologicalTest, UserResponse
+from .norms import cohort_keys, cohort_keys_for_email, percentile_report
+from .pagination import AssessmentCursorPagination
 from .serializers import AssessmentSerializer, UserResponseSerializer
+from .stats import ScoreAccumulator, score_stats
 
-class AssessmentList(generics.ListCreateAPIView):
-    queryset = Assessment.objects.all()
+class AssessmentList(ReplicaReadMixin, generics.ListCreateAPIView):
+    queryset = Assessment.objects.with_related()
     serializer_class = AssessmentSerializer
-class AssessmentDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Assessment.objects.all()
+    pagination_class = AssessmentCursorPagination
+class AssessmentDetail(CachedRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
+    cache_namespace = 'assessment'
+    queryset = Assessment.objects.with_related()
     serializer_class = AssessmentSerializer
 
 class AssessmentViewSet(viewsets.ModelViewSet):
-    queryset = Assessment.objects.all()
+    queryset = Assessment.objects.with_related()
     serializer_class = AssessmentSerializer
+    pagination_class = AssessmentCursorPagination
 
 class UserResponseViewSet(viewsets.ModelViewSet):
-    queryset = UserResponse.objects.all()
+    queryset = UserResponse.objects.select_related('user', 'test')
     serializer_class = UserResponseSerializer
 
+class TestScoreStatsView(ReplicaReadMixin, APIView):
+    """
+    GET — count, mean, variance, stddev, min/max и перцентили score по тесту.
+    Читается одна материализованная строка TestScoreStats, агрегатов по UserResponse нет.
+    """
+
+    def get(self, request, pk):
+        stats = score_stats(pk)
+        if stats is None:
+            if not PsychologicalTest.objects.filter(pk=pk).exists():
+                return Response({"error": "Test not found"}, status=status.HTTP_404_NOT_FOUND)
+            stats = ScoreAccumulator()
+        return Response({"test": pk, **stats.summary()})
+
+class TestPercentileView(ReplicaReadMixin, APIView):
+    """
+    GET ?score=<x>[&gender=F&age=30] — перцентиль score среди прошедших тест и в когортах
+    по полу/возрасту. Считается по индексу норм (assessments.norms), без COUNT по ответам.
+    """
+
+    def get(self, request, pk):
+        try:
+            score = float(request.query_params['score'])
+            age = request.query_params.get('age')
+            age = int(age) if age not in (None, '') else None
+            # nan/inf float() принимает, но JSON-рендерер на них падает
+            if not math.isfinite(score):
+                raise ValueError(score)
+        except (KeyError, ValueError):
+            return Response({"error": "'score' must be a finite number and 'age' an integer."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        report = percentile_report(pk, score, cohort_keys(request.query_params.get('gender'), age))
+        if report is None:
+            return Response({"error": "Norm index is not built for this test"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(report)
+
+class ResponsePercentileView(ReplicaReadMixin, APIView):
+    """
+    GET — перцентиль score ответа среди прошедших тот же тест и в когортах его владельца.
+    """
+
+    def get(self, request, pk):
+        response = UserResponse.objects.select_related('user').filter(pk=pk).first()
+        if response is None:
+            return Response({"error": "Response not found"}, status=status.HTTP_404_NOT_FOUND)
+        report = percentile_report(response.test_id, response.score, cohort_keys_for_email(response.user.email))
+        if report is None:
+            return Response({"error": "Norm index is not built for this test"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"response": response.pk, **report})
+
 def assessment_detail(request, pk):
     assessment = Assessment.objects.get(pk=pk)
     return render(request, 'assessments/detail.html', {'assessment': assessment})
\ No newline at end of file
@@ -0,0 +1 @@
+# Бенчмарки горячих путей planner и API (запуск: python -m benchmarks.run).
@@ -0,0 +1,248 @@
+"""
+Нагрузочный тест ASGI-приложения: синхронные endpoint'ы против async-вариантов (api/async_views.py).
+
+Запуск (из корня проекта):
+    python -m benchmarks.load                              # concurrency 64, 5 сек на сценарий
+    python -m benchmarks.load --concurrency 200 --duration 10 --db-latency-ms 5
+    python -m benchmarks.load --plan-share 0.5 --output load.json
+    python -m benchmarks.load --login-storm --login-clients 32 --reader-clients 8
+
+Запросы подаются прямо в config.asgi.application (без сетевого сервера), то есть меряется один
+воркер uvicorn/daphne. --concurrency клиентов шлют запросы без пауз; смесь — доля POST планов
+(--plan-share, CPU-работа) и GET деталей оценок. Для каждого сценария: обслужено запросов в
+секунду (2xx/304), p50/p99 латентности, число 503 (backpressure пула планов) и пик потоков.
+--db-latency-ms добавляет задержку каждому SQL-запросу (имитация сетевой БД).
+Синхронный view под ASGI занимает отдельный поток на весь запрос, включая генерацию плана, и
+очередь не ограничена; async-view занимают поток только на время SQL, генерацию отдают в
+ограниченный пул, а сверх PLANNER_EXECUTOR_MAX_PENDING отвечают 503 сразу.
+Тела POST различаются (--plan-bodies штук по кругу), чтобы кэш планов не превращал их в попадания.
+
+--login-storm: --login-clients клиентов непрерывно входят (PBKDF2), а --reader-clients читают детали
+оценок; сценарии idle (без входов), sync-login (/users/login/) и async-login (/api/async/login/).
+Меряется латентность читателей: синхронный вход хэширует в отдельном потоке на каждый запрос, и
+все потоки делят CPU с остальными запросами; async-вход хэширует в пуле AUTH_HASH_EXECUTOR_WORKERS,
+а сверх AUTH_HASH_EXECUTOR_MAX_PENDING сразу отвечает 503.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import setup_test_environment
+
+from benchmarks.run import (  # django.setup() выполняется там
+    SEED,
+    scales_payload,
+    seed_database,
+)
+
+SCENARIOS = {
+    'sync': {'plan': '/planner/', 'detail': '/api/assessments/{pk}/'},
+    'async': {'plan': '/api/async/planner/', 'detail': '/api/async/assessments/{pk}/'},
+}
+STORM_SCENARIOS = {'idle': None, 'sync-login': '/users/login/', 'async-login': '/api/async/login/'}
+STORM_READER = '/api/assessments/{pk}/'
+STORM_USER = {'email': 'storm@example.com', 'password': 'Storm-pass-123'}
+
+
+def install_db_latency(seconds):
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def on_connect(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(on_connect, weak=False)
+    if connection.connection is not None:
+        connection.execute_wrappers.append(delay)
+
+
+async def call(application, method, path, body=b''):
+    """
+    Один запрос к ASGI-приложению. Возвращает HTTP-статус.
+    """
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    result = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()  # клиент не отключается
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+
+    await application(scope, receive, send)
+    return result['status']
+
+
+async def run_scenario(application, urls, pks, plan_bodies, concurrency, duration, plan_share, seed):
+    rng = random.Random(seed)
+    latencies, statuses = [], {}
+    peak_threads = threading.active_count()
+    plan_index = itertools.count()
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal peak_threads
+        while time.monotonic() < deadline:
+            if rng.random() < plan_share:
+                method, path, body = 'POST', urls['plan'], plan_bodies[next(plan_index) % len(plan_bodies)]
+            else:
+                method, path, body = 'GET', urls['detail'].format(pk=rng.choice(pks)), b''
+            started = time.perf_counter()
+            code = await call(application, method, path, body)
+            latencies.append(time.perf_counter() - started)
+            statuses[code] = statuses.get(code, 0) + 1
+            peak_threads = max(peak_threads, threading.active_count())
+
+    started = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    served = sum(n for code, n in statuses.items() if 200 <= code < 300 or code == 304)
+    latencies.sort()
+    return {
+        'served_per_sec': round(served / elapsed, 1),
+        'requests': len(latencies),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3) if latencies else None,
+        'rejected_503': statuses.get(503, 0),
+        'statuses': {str(code): n for code, n in sorted(statuses.items())},
+        'peak_threads': peak_threads,
+    }
+
+
+def _latency_stats(latencies):
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3) if latencies else None,
+    }
+
+
+async def run_storm(application, login_path, pks, login_clients, reader_clients, duration, seed):
+    """
+    Читатели (GET деталей) на фоне шторма входов. Возвращает латентность читателей и статусы входов.
+    """
+    rng = random.Random(seed)
+    reads, logins = [], {}
+    body = json.dumps(STORM_USER).encode()
+    deadline = time.monotonic() + duration
+
+    async def reader():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            await call(application, 'GET', STORM_READER.format(pk=rng.choice(pks)))
+            reads.append(time.perf_counter() - started)
+
+    async def login():
+        while time.monotonic() < deadline:
+            code = await call(application, 'POST', login_path, body)
+            logins[code] = logins.get(code, 0) + 1
+            if code == 503:
+                await asyncio.sleep(0.05)  # клиент уважает Retry-After (укороченный)
+
+    clients = [reader() for _ in range(reader_clients)]
+    if login_path:
+        clients += [login() for _ in range(login_clients)]
+    started = time.monotonic()
+    await asyncio.gather(*clients)
+    elapsed = time.monotonic() - started
+    return {
+        'reads_per_sec': round(len(reads) / elapsed, 1),
+        **_latency_stats(reads),
+        'logins_per_sec': round(logins.get(200, 0) / elapsed, 1),
+        'login_statuses': {str(code): n for code, n in sorted(logins.items())},
+        'peak_threads': threading.active_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест sync и async endpoint'ов через ASGI.")
+    parser.add_argument('--concurrency', type=int, default=64, help="Число одновременных клиентов.")
+    parser.add_argument('--duration', type=float, default=5.0, help="Длительность сценария, сек.")
+    parser.add_argument('--plan-share', type=float, default=0.2, help="Доля POST планов в смеси запросов.")
+    parser.add_argument('--plan-bodies', type=int, default=5000, help="Число различных тел POST планов.")
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help="Задержка на каждый SQL-запрос, мс.")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                        help="Сценарий (можно несколько), по умолчанию все.")
+    parser.add_argument('--login-storm', action='store_true',
+                        help="Сценарии шторма входов (idle, sync-login, async-login) вместо смеси планов.")
+    parser.add_argument('--login-clients', type=int, default=32, help="Клиентов, выполняющих вход.")
+    parser.add_argument('--reader-clients', type=int, default=8, help="Клиентов, читающих детали оценок.")
+    parser.add_argument('--output', help="Куда записать результаты (JSON).")
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    settings.DEBUG = False
+    settings.API_THROTTLE_RATES = dict.fromkeys(settings.API_THROTTLE_RATES)
+    # in-memory SQLite (shared cache) не выдерживает параллельной записи из потоков запросов —
+    # тестовая база во временном файле
+    workdir = tempfile.mkdtemp(prefix='bench-load-')
+    connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'load.sqlite3')
+    connection.settings_dict.setdefault('OPTIONS', {})['timeout'] = 30
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        rng = random.Random(SEED)
+        seed_database(rng)
+        from assessments.models import Assessment
+        from config.asgi import application
+
+        pks = list(Assessment.objects.values_list('pk', flat=True)[:100])
+        plan_bodies = [json.dumps({'user_data': scales_payload(rng, 50)}).encode() for _ in range(args.plan_bodies)]
+        if args.db_latency_ms:
+            install_db_latency(args.db_latency_ms / 1000)
+
+        results = {}
+        if args.login_storm:
+            from django.contrib.auth import get_user_model
+
+            get_user_model().objects.create_user(username=STORM_USER['email'], email=STORM_USER['email'],
+                                                 password=STORM_USER['password'])
+            for name, login_path in STORM_SCENARIOS.items():
+                r = results[name] = asyncio.run(run_storm(
+                    application, login_path, pks, args.login_clients, args.reader_clients, args.duration, SEED))
+                print(f"{name:11s} reads {r['reads_per_sec']:>8} req/s  p50 {r['p50_ms']:>9.3f} ms  "
+                      f"p99 {r['p99_ms']:>9.3f} ms  logins {r['logins_per_sec']:>6}/s  {r['login_statuses']}")
+        for name in [] if args.login_storm else args.scenario or sorted(SCENARIOS, reverse=True):
+            r = results[name] = asyncio.run(run_scenario(
+                application, SCENARIOS[name], pks, plan_bodies,
+                args.concurrency, args.duration, args.plan_share, SEED))
+            print(f"{name:6s} served {r['served_per_sec']:>9} req/s  p50 {r['p50_ms']:>9.3f} ms  "
+                  f"p99 {r['p99_ms']:>9.3f} ms  503 {r['rejected_503']:>6}  threads {r['peak_threads']}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump({'concurrency': args.concurrency, 'duration': args.duration, 'login_storm': args.login_storm,
+                       'plan_share': args.plan_share, 'db_latency_ms': args.db_latency_ms,
+                       'results': results}, fh, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
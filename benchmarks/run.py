@@ -0,0 +1,395 @@
+"""
+Воспроизводимый набор бенчмарков для planner и API.
+
+Запуск (из корня проекта):
+    python -m benchmarks.run                          # все бенчмарки, сравнение с benchmarks/baseline.json
+    python -m benchmarks.run --output results.json    # сохранить результаты
+    python -m benchmarks.run --filter planner.generate --quick
+    python -m benchmarks.run --update-baseline        # перезаписать baseline текущими результатами
+
+Используется отдельная тестовая SQLite-база (как в manage.py test), рабочая БД не затрагивается.
+Для каждого бенчмарка считаются ops/sec, p50/p99/mean латентность (мс) и число SQL-запросов
+на одну операцию. Регрессия: падение ops/sec больше --tolerance (по умолчанию 30%) или
+рост числа запросов; при регрессии процесс завершается с кодом 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SEED = 20240101
+
+
+# --------------------------
+# Данные
+# --------------------------
+SKILLS = ['time_management', 'conscientiousness', 'neuroticism', 'motivation', 'communication']
+
+
+def scales_payload(rng, size):
+    keys = SKILLS + [f'scale_{i}' for i in range(max(0, size - len(SKILLS)))]
+    return {'assessment': {'scales': {k: round(rng.uniform(1, 5), 2) for k in keys[:size]}}}
+
+
+def items_payload(rng, size):
+    return {'assessment': {'items': [{'skill': rng.choice(SKILLS), 'answer': rng.randint(1, 5)}
+                                     for _ in range(size)]}}
+
+
+def bank_payload(rng, size, n_skills=300):
+    # адаптивный тест: тысячи вопросов по сотням навыков
+    return {'assessment': {'items': [{'skill': f'skill_{rng.randrange(n_skills)}', 'answer': rng.randint(1, 5)}
+                                     for _ in range(size)]}}
+
+
+def numeric_payload(rng, size):
+    return [rng.randint(1, 5) for _ in range(size)]
+
+
+def profile_payload(rng, size):
+    return {'profile': {'learning_style': rng.choice(['visual', 'kinesthetic', 'balanced'])}}
+
+
+SHAPES = {
+    'scales': (scales_payload, (5, 50, 500)),
+    'items': (items_payload, (10, 100, 1000)),
+    'bank': (bank_payload, (10000,)),
+    'numeric': (numeric_payload, (5, 50, 500)),
+    'profile': (profile_payload, (1,)),
+}
+
+
+def seed_database(rng, n_assessments=200, n_plans=500):
+    from django.contrib.auth.models import User as AuthUser
+
+    from assessments.models import Assessment, PsychologicalTest, UserResponse
+    from planner.ai.planner import generate_learning_plans
+    from planner.models import LearningPlan
+    from planner.storage import store_plans
+    from users.models import User
+
+    auth_users = AuthUser.objects.bulk_create(
+        [AuthUser(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(50)])
+    api_users = User.objects.bulk_create([User(email=f'bench{i}@example.com') for i in range(50)])
+    tests = PsychologicalTest.objects.bulk_create(
+        [PsychologicalTest(title=f'Test {i}', description='benchmark') for i in range(5)])
+    responses = UserResponse.objects.bulk_create([
+        UserResponse(user=auth_users[i % len(auth_users)], test=tests[i % len(tests)],
+                     answers={'q1': rng.randint(1, 5)}, score=rng.uniform(0, 100))
+        for i in range(n_assessments)])
+    Assessment.objects.bulk_create([
+        Assessment(title=f'Assessment {i}', user=response.user, response=response, result='ok')
+        for i, response in enumerate(responses)])
+
+    payloads = [scales_payload(rng, 5) for _ in range(n_plans)]
+    store_plans([
+        LearningPlan.from_generated(payload, plan, user_id=api_users[i % len(api_users)].id)
+        for i, (payload, plan) in enumerate(zip(payloads, generate_learning_plans(payloads)))])
+
+
+# --------------------------
+# Бенчмарки
+# --------------------------
+def planner_benchmarks(rng):
+    from planner.ai.cache import PlanCache
+    from planner.ai.parser import parse_payload
+    from planner.ai.planner import generate_learning_plan, generate_learning_plans, generate_parsed_plan
+
+    benches = []
+    for shape, (factory, sizes) in SHAPES.items():
+        for size in sizes:
+            payload = factory(rng, size)
+            benches.append((f'planner.generate_learning_plan[{shape}-{size}]',
+                            lambda payload=payload: generate_learning_plan(payload)))
+    batch = [scales_payload(rng, 5) for _ in range(1000)]
+    benches.append(('planner.generate_learning_plans[scales-5x1000]', lambda: generate_learning_plans(batch)))
+    wide = [scales_payload(rng, 300) for _ in range(200)]
+    benches.append(('planner.generate_learning_plans[scales-300x200]', lambda: generate_learning_plans(wide)))
+    # hit кэша планов против генерации по тому же разобранному payload'у (как в PlannerView.post)
+    for size in (5, 300):
+        parsed = parse_payload(scales_payload(rng, size))
+        plan_cache = PlanCache(maxsize=8)
+        plan_cache.get_parsed_plan(parsed)
+        benches.append((f'planner.plan_cache.hit[scales-{size}]',
+                        lambda parsed=parsed, plan_cache=plan_cache: plan_cache.get_parsed_plan(parsed)))
+        benches.append((f'planner.generate_parsed_plan[scales-{size}]',
+                        lambda parsed=parsed: generate_parsed_plan(parsed.profile, parsed.scores)))
+    return benches
+
+
+def norms_benchmarks(rng):
+    from assessments.models import PsychologicalTest
+    from assessments.norms import build_norm_index, load_norm_index
+
+    test_id = PsychologicalTest.objects.order_by('pk').values_list('pk', flat=True).first()
+    build_norm_index()
+    index = load_norm_index(test_id)
+    scores = [rng.uniform(0, 100) for _ in range(1000)]
+
+    def lookups():
+        for score in scores:
+            index.percentile(score)
+    return [('assessments.norms.percentile[x1000]', lookups)]
+
+
+def api_benchmarks(rng):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+
+    def request(method, url, expected, **kwargs):
+        def run():
+            response = getattr(client, method)(url, **kwargs)
+            if response.status_code != expected:
+                raise RuntimeError(f"{method.upper()} {url} -> {response.status_code}")
+        return run
+
+    from planner.models import LearningPlan
+    from planner.pagination import encode_cursor
+
+    deep = LearningPlan.objects.order_by('-created_at', '-id').values('id', 'created_at')[400]
+    deep_cursor = encode_cursor(deep['created_at'], deep['id'])
+
+    post_body = scales_payload(rng, 5)
+    return [
+        ('api.planner.get[limit=10]', request('get', '/planner/?limit=10', 200)),
+        ('api.planner.get[limit=100]', request('get', '/planner/?limit=100', 200)),
+        ('api.planner.get[limit=10,cursor=400]', request('get', f'/planner/?limit=10&cursor={deep_cursor}', 200)),
+        ('api.planner.post', request('post', '/planner/', 201, data={'user_data': post_body}, format='json')),
+        ('api.assessments.list', request('get', '/api/assessments/', 200)),
+        ('api.assessments.list[app]', request('get', '/assessments/', 200)),
+        ('api.assessments.detail', request('get', '/api/assessments/1/', 200)),
+        ('api.tests.percentile', request('get', '/api/tests/1/percentile/?score=50&gender=F&age=30', 200)),
+    ]
+
+
+def throttle_benchmarks(rng):
+    from django.core.cache import caches
+
+    from api.throttling import CacheRateStore, DatabaseRateStore
+
+    # один ключ с растущим счётчиком: стоимость проверки не зависит от числа запросов
+    stores = {'db': DatabaseRateStore(), 'cache': CacheRateStore(caches['default'])}
+    return [(f'api.throttle.hit[{name}]', lambda store=store: store.hit('bench:127.0.0.1', 1, 60))
+            for name, store in stores.items()]
+
+
+def onboarding_benchmarks(rng):
+    import itertools
+
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+
+    from users.models import User
+    from users.onboarding import import_chunk
+
+    # быстрый хэшер: меряется работа с БД (хэширование PBKDF2 одинаково в обоих путях
+    # и в import_users параллелится процессами)
+    fast_hashers = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    ids = itertools.count()
+    AuthUser = get_user_model()
+
+    def records(n):
+        return [(i, {"email": f"onboard{next(ids)}@example.com", "password": "Str0ng-pass"}) for i in range(n)]
+
+    def per_row():
+        # путь RegisterView: проверка существования, create_user и users.User на каждую запись
+        with fast_hashers:
+            for _, r in records(100):
+                User.objects.filter(email=r["email"]).exists()
+                AuthUser.objects.create_user(username=r["email"], email=r["email"], password=r["password"])
+                User.objects.create(email=r["email"])
+
+    def bulk():
+        with fast_hashers:
+            import_chunk(records(100))
+
+    return [('users.onboard.per_row[100]', per_row), ('users.onboard.import_chunk[100]', bulk)]
+
+
+def profile_benchmarks(rng, n_users=20000):
+    from django.test import override_settings
+
+    from users.models import User
+    from users.profile_index import filter_users, parse_filters, rebuild
+
+    styles = ['visual', 'auditory', 'kinesthetic', 'balanced']
+    User.objects.bulk_create([
+        User(email=f'segment{i}@example.com',
+             profile={'learning_style': rng.choice(styles),
+                      'scales': {'neuroticism': round(rng.uniform(1, 5), 2), 'motivation': round(rng.uniform(1, 5), 2)}})
+        for i in range(n_users)], batch_size=2000)
+    rebuild()
+    # dense — ~1/32 пользователей (первые 100 находятся быстро), sparse — ~1/800
+    filters = {'dense': parse_filters({'learning_style': 'visual', 'neuroticism__gte': '4.5'}),
+               'sparse': parse_filters({'learning_style': 'visual', 'neuroticism__gte': '4.97'})}
+
+    def python_scan():
+        # прежний способ: все профили в Python
+        return [u for u in User.objects.all()
+                if u.profile.get('learning_style') == 'visual'
+                and (u.profile.get('scales') or {}).get('neuroticism', 0) >= 4.97][:100]
+
+    def segment(strategy, conditions):
+        def run():
+            with override_settings(USER_PROFILE_INDEX=strategy):
+                return list(filter_users(User.objects.all(), conditions).order_by('-created_at', '-id')[:100])
+        return run
+
+    # expression на SQLite — проход JSON_EXTRACT по пользователям до 100 совпадений
+    # (индексы по выражениям создаются только на PostgreSQL)
+    size = f'{n_users // 1000}k'
+    return [(f'users.segment.python_scan[{size}]', python_scan)] + [
+        (f'users.segment[{strategy}-{density}-{size}]', segment(strategy, conditions))
+        for density, conditions in filters.items() for strategy in ('table', 'expression')]
+
+
+def export_benchmarks(rng):
+    from django.http import JsonResponse
+
+    from api.export import Export, gzip_chunks
+    from users.models import User
+    from users.serializers import UserSerializer
+
+    # после profile_benchmarks — ~20k пользователей
+    size = f'{User.objects.count() // 1000}k'
+
+    def json_response():
+        # прежний способ (как UserProfileViewSet.list): весь список в памяти одним ответом
+        return JsonResponse(UserSerializer(User.objects.all(), many=True).data, safe=False).content
+
+    def export(fmt, compress=False):
+        def run():
+            chunks = Export('users', fmt=fmt).chunks()
+            for _ in gzip_chunks(chunks) if compress else chunks:
+                pass
+        return run
+
+    return [
+        (f'export.users.json_response[{size}]', json_response),
+        (f'export.users[ndjson-{size}]', export('ndjson')),
+        (f'export.users[csv-{size}]', export('csv')),
+        (f'export.users[ndjson-gzip-{size}]', export('ndjson', compress=True)),
+    ]
+
+
+def measure(fn, min_time, min_iters=5, max_iters=100000, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_iters and (len(samples) < min_iters or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    with CaptureQueriesContext(connection) as ctx:
+        fn()
+
+    samples.sort()
+    total = sum(samples)
+    return {
+        'iterations': len(samples),
+        'ops_per_sec': round(len(samples) / total, 2) if total else None,
+        'mean_ms': round(statistics.fmean(samples) * 1000, 4),
+        'p50_ms': round(samples[len(samples) // 2] * 1000, 4),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 4),
+        'queries': len(ctx.captured_queries),
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous.get('ops_per_sec') and current['ops_per_sec'] < previous['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: ops/sec {current['ops_per_sec']} < baseline {previous['ops_per_sec']}")
+        if current['queries'] > previous.get('queries', current['queries']):
+            regressions.append(f"{name}: queries {current['queries']} > baseline {previous['queries']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки planner и API.")
+    parser.add_argument('--output', help="Куда записать результаты (JSON).")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Файл baseline для сравнения.")
+    parser.add_argument('--update-baseline', action='store_true', help="Перезаписать baseline результатами.")
+    parser.add_argument('--filter', default='', help="Запускать только бенчмарки, имя которых содержит строку.")
+    parser.add_argument('--min-time', type=float, default=1.0, help="Минимальное время на бенчмарк, сек.")
+    parser.add_argument('--quick', action='store_true', help="Короткий прогон (--min-time 0.1).")
+    parser.add_argument('--tolerance', type=float, default=0.3, help="Допустимое падение ops/sec (доля).")
+    args = parser.parse_args(argv)
+    min_time = 0.1 if args.quick else args.min_time
+
+    setup_test_environment()
+    settings.DEBUG = False
+    # лимиты запросов выключены: бенчмарки API меряют сами endpoint'ы (throttle — отдельно)
+    settings.API_THROTTLE_RATES = dict.fromkeys(settings.API_THROTTLE_RATES)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    settings.ASSESSMENT_NORMS_DIR = tempfile.mkdtemp(prefix='bench-norms-')
+    try:
+        rng = random.Random(SEED)
+        seed_database(rng)
+        results = {}
+        benches = (planner_benchmarks(rng) + norms_benchmarks(rng) + api_benchmarks(rng) + throttle_benchmarks(rng)
+                   + onboarding_benchmarks(rng) + profile_benchmarks(rng) + export_benchmarks(rng))
+        for name, fn in benches:
+            if args.filter not in name:
+                continue
+            results[name] = measure(fn, min_time)
+            r = results[name]
+            print(f"{name:55s} {r['ops_per_sec']:>12} ops/s  p50 {r['p50_ms']:>9.3f} ms  "
+                  f"p99 {r['p99_ms']:>9.3f} ms  queries {r['queries']}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(settings.ASSESSMENT_NORMS_DIR, ignore_errors=True)
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'database': connection.vendor,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as fh:
+        baseline = json.load(fh).get('results', {})
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1,4 @@
-# Этот файл намеренно оставлен пустым.
\ No newline at end of file
+# Celery-приложение загружается вместе с Django, чтобы @shared_task использовали его.
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
\ No newline at end of file
@@ -7,6 +7,8 @@ Generated by 'django-admin startproject' using Django 4.0.
 import os
 from pathlib import Path
 
+from config.databases import database_from_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +44,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.replicas.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -65,12 +68,38 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
+# DATABASE_URL — основная БД (по умолчанию SQLite db.sqlite3), DATABASE_REPLICA_URL — реплика(и)
+# для чтения списков и отчётов (через запятую; пусто — все запросы идут в default).
+# CONN_MAX_AGE (сек.) по умолчанию 0: под ASGI каждый запрос идёт в своём потоке, и постоянные
+# соединения копились бы по одному на поток, не переиспользуясь. >0 — только для WSGI-воркеров;
+# такие соединения проверяются перед повторным использованием.
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', 0))
+DATABASE_CONN_HEALTH_CHECKS = os.getenv('DATABASE_CONN_HEALTH_CHECKS', 'True') == 'True'
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_from_url(os.getenv('DATABASE_URL') or f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+                                 DATABASE_CONN_MAX_AGE, DATABASE_CONN_HEALTH_CHECKS),
+}
+DATABASE_REPLICAS = []
+for _i, _url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URL', '').split(','))):
+    _alias = 'replica' if _i == 0 else f'replica_{_i + 1}'
+    DATABASES[_alias] = database_from_url(_url.strip(), DATABASE_CONN_MAX_AGE, DATABASE_CONN_HEALTH_CHECKS)
+    # в тестах реплика — зеркало тестовой default (роутер читает тогда прямо из default)
+    DATABASES[_alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(_alias)
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# Сколько секунд после собственной записи клиент читает из основной БД (read-your-writes)
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DATABASE_REPLICA_PIN_SECONDS', 15))
+
+# Cache
+# CACHE_URL — общий кэш воркеров (redis://host:6379/0, нужен пакет redis); пусто — LocMem процесса.
+# Инвалидация кэшей токенов и ответов по сигналам доходит только до кэша воркера, сделавшего
+# запись, поэтому на кэше процесса их TTL ограничен LOCAL_CACHE_MAX_TIMEOUT секундами.
+CACHE_URL = os.getenv('CACHE_URL', '')
+CACHES = {
+    'default': ({'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL} if CACHE_URL
+                else {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}),
 }
+LOCAL_CACHE_MAX_TIMEOUT = int(os.getenv('LOCAL_CACHE_MAX_TIMEOUT', 5))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -102,6 +131,120 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
 
+# Planner
+# Максимум элементов в одном запросе POST /planner/batch/ и размер чанка bulk_create
+PLANNER_BATCH_MAX_ITEMS = int(os.getenv('PLANNER_BATCH_MAX_ITEMS', 5000))
+PLANNER_BULK_CREATE_BATCH_SIZE = int(os.getenv('PLANNER_BULK_CREATE_BATCH_SIZE', 500))
+# Кэш сгенерированных планов: размер LRU в процессе, alias общего Django-кэша (пусто — без него) и TTL
+PLANNER_PLAN_CACHE_SIZE = int(os.getenv('PLANNER_PLAN_CACHE_SIZE', 1024))
+PLANNER_PLAN_CACHE_ALIAS = os.getenv('PLANNER_PLAN_CACHE_ALIAS') or None
+PLANNER_PLAN_CACHE_TIMEOUT = int(os.getenv('PLANNER_PLAN_CACHE_TIMEOUT', 86400))
+# Размер чанка (подзадачи Celery) при асинхронной генерации пакета планов
+PLANNER_ASYNC_CHUNK_SIZE = int(os.getenv('PLANNER_ASYNC_CHUNK_SIZE', 500))
+# Каталог шаблонов задач (JSON/YAML) и период проверки его версии, сек.
+PLANNER_TASK_TEMPLATES_PATH = os.getenv('PLANNER_TASK_TEMPLATES_PATH') or None
+PLANNER_TASK_TEMPLATES_CHECK_INTERVAL = float(os.getenv('PLANNER_TASK_TEMPLATES_CHECK_INTERVAL', 30))
+# Пул генерации планов для async-view: thread | process, число воркеров и предел задач в пуле
+# (выполняются + ждут; 0 — 4 * воркеры), сверх которого async-view отвечают 503
+PLANNER_EXECUTOR = os.getenv('PLANNER_EXECUTOR', 'thread')
+PLANNER_EXECUTOR_WORKERS = int(os.getenv('PLANNER_EXECUTOR_WORKERS', os.cpu_count() or 1))
+PLANNER_EXECUTOR_MAX_PENDING = int(os.getenv('PLANNER_EXECUTOR_MAX_PENDING', 0))
+# Перепланирование при новом UserResponse: incremental | full | off
+PLANNER_REPLAN_MODE = os.getenv('PLANNER_REPLAN_MODE', 'incremental')
+
+# Assessments: диапазон и число корзин гистограммы UserResponse.score для перцентилей в TestScoreStats
+# (после изменения — manage.py rebuild_score_stats)
+ASSESSMENT_SCORE_RANGE = (float(os.getenv('ASSESSMENT_SCORE_MIN', 0)), float(os.getenv('ASSESSMENT_SCORE_MAX', 100)))
+ASSESSMENT_SCORE_BINS = int(os.getenv('ASSESSMENT_SCORE_BINS', 200))
+# Индекс норм (перцентили по тесту и когортам): каталог файлов, минимальный размер когорты,
+# возраст, после которого индекс считается устаревшим, и период пересборки (Celery beat), сек.
+ASSESSMENT_NORMS_DIR = os.getenv('ASSESSMENT_NORMS_DIR', str(BASE_DIR / 'var' / 'norms'))
+ASSESSMENT_NORMS_MIN_COHORT = int(os.getenv('ASSESSMENT_NORMS_MIN_COHORT', 20))
+ASSESSMENT_NORMS_MAX_AGE = int(os.getenv('ASSESSMENT_NORMS_MAX_AGE', 86400))
+ASSESSMENT_NORMS_REBUILD_INTERVAL = float(os.getenv('ASSESSMENT_NORMS_REBUILD_INTERVAL', 3600))
+
+# Кэш ответов detail-endpoint'ов (AssessmentDetail, UserDetail, view_learning_plan):
+# alias Django-кэша (пусто — без кэша, остаются только ETag/Last-Modified) и TTL, сек.
+# Инвалидация видна всем воркерам только на общем кэше (CACHE_URL); на кэше процесса TTL не больше
+# LOCAL_CACHE_MAX_TIMEOUT
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default') or None
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Throttling (api.throttling): лимиты по scope ('N/sec|min|hour|day', пусто — без лимита) и хранилище
+# счётчиков: db — таблица ThrottleCounter (общая для всех воркеров), cache — Django-кэш
+# API_THROTTLE_CACHE_ALIAS (общий для воркеров только на Redis/Memcached)
+API_THROTTLE_RATES = {
+    'user': os.getenv('API_THROTTLE_USER', '10/hour') or None,
+    'anon': os.getenv('API_THROTTLE_ANON', '5/hour') or None,
+    'planner': os.getenv('API_THROTTLE_PLANNER', '30/min') or None,
+    'auth': os.getenv('API_THROTTLE_AUTH', '10/min') or None,
+}
+API_THROTTLE_STORE = os.getenv('API_THROTTLE_STORE', 'db')
+API_THROTTLE_DB_ALIAS = os.getenv('API_THROTTLE_DB_ALIAS', 'default')
+API_THROTTLE_CACHE_ALIAS = os.getenv('API_THROTTLE_CACHE_ALIAS', 'default')
+
+# Пул хэширования паролей async входа и регистрации (users.hashing): thread | process, число
+# воркеров (меньше ядер — остальным запросам остаётся CPU) и предел задач в пуле (0 — 4 * воркеров)
+AUTH_HASH_EXECUTOR = os.getenv('AUTH_HASH_EXECUTOR', 'thread')
+AUTH_HASH_EXECUTOR_WORKERS = int(os.getenv('AUTH_HASH_EXECUTOR_WORKERS', max(1, (os.cpu_count() or 1) // 2)))
+AUTH_HASH_EXECUTOR_MAX_PENDING = int(os.getenv('AUTH_HASH_EXECUTOR_MAX_PENDING', 0))
+# Понижение приоритета (nice) воркеров хэширования: при нехватке CPU уступают остальным запросам
+AUTH_HASH_EXECUTOR_NICE = int(os.getenv('AUTH_HASH_EXECUTOR_NICE', 10))
+
+# Фильтр пользователей по атрибутам профиля (users.profile_index): auto — индексы по выражениям JSON
+# на PostgreSQL, таблица ProfileAttributeValue на остальных СУБД; expression | table — принудительно
+USER_PROFILE_INDEX = os.getenv('USER_PROFILE_INDEX', 'auto')
+
+# Массовый онбординг (users.onboarding): процессы хэширования паролей (0 — в текущем процессе),
+# записей на транзакцию в import_users, предел записей для POST /users/import/ и batch_size bulk_create
+USERS_IMPORT_WORKERS = int(os.getenv('USERS_IMPORT_WORKERS', os.cpu_count() or 1))
+USERS_IMPORT_CHUNK_SIZE = int(os.getenv('USERS_IMPORT_CHUNK_SIZE', 1000))
+USERS_IMPORT_MAX_ITEMS = int(os.getenv('USERS_IMPORT_MAX_ITEMS', 5000))
+USERS_BULK_CREATE_BATCH_SIZE = int(os.getenv('USERS_BULK_CREATE_BATCH_SIZE', 500))
+
+# Потоковая выгрузка (api.export, export_data): строк на пачку курсора и кодирования и отставание
+# верхней границы инкрементальной выгрузки от текущего времени, сек. (транзакции дольше — могут
+# не попасть ни в одну выгрузку)
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+EXPORT_WATERMARK_LAG = float(os.getenv('EXPORT_WATERMARK_LAG', 5))
+
+# Аутентификация DRF: сессия (первой — анонимным по-прежнему 403), токен с кэшем
+# token -> пользователь (api.authentication), Basic
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+}
+# Кэш токенов: alias Django-кэша (пусто — без кэша, запрос к БД на каждый запрос) и TTL, сек.
+# Logout и изменение пользователя снимают запись сразу во всех воркерах, если кэш общий
+# (CACHE_URL); на кэше процесса TTL не больше LOCAL_CACHE_MAX_TIMEOUT
+TOKEN_AUTH_CACHE_ALIAS = os.getenv('TOKEN_AUTH_CACHE_ALIAS', 'default') or None
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.getenv('TOKEN_AUTH_CACHE_TIMEOUT', 300))
+
+# Admin: с какого числа строк (по статистике СУБД) список показывает оценку вместо COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000))
+
+# Celery: брокер — CELERY_BROKER_URL (например redis://). Без него задачи выполняются сразу в
+# вызывающем процессе (eager): in-memory брокер у каждого процесса свой, и задачи веб-процесса
+# worker никогда бы не получил
+_CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', '')
+CELERY_BROKER_URL = _CELERY_BROKER_URL or 'memory://'
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False' if _CELERY_BROKER_URL else 'True') == 'True'
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True
+# "async": true в POST /planner/ и /planner/batch/ ставит PlanJob в очередь только при настоящем
+# брокере. При eager задача выполнилась бы внутри того же запроса, и 202 лишь скрывал бы синхронную
+# работу — поэтому без брокера такие запросы обрабатываются синхронно (201/207 с планами)
+PLANNER_ASYNC_ENABLED = os.getenv('PLANNER_ASYNC_ENABLED', 'False' if CELERY_TASK_ALWAYS_EAGER else 'True') == 'True'
+CELERY_BEAT_SCHEDULE = {
+    'rebuild-norm-index': {
+        'task': 'assessments.tasks.rebuild_norm_index',
+        'schedule': ASSESSMENT_NORMS_REBUILD_INTERVAL,
+    },
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # AUTH_USER_MODEL = "users.User"
@@ -0,0 +1,178 @@
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Optional, Union
+
+from .parser import ParseResult, canonical_json
+from .planner import (
+    _analyze_assessment,
+    _build_plan,
+    _extract_profile_and_assessment,
+    _new_id,
+    _rank_weaknesses,
+    _safe_parse,
+    _uuid4_stream,
+)
+
+"""
+Content-addressed кэш планов перед generate_learning_plan.
+Ключ — sha256 от канонического JSON разобранного payload'а (профиль и assessment, ключи
+отсортированы) + max_focus + дата генерации; считается до анализа шкал и ранжирования, поэтому
+hit не анализирует payload, а одинаковые по содержанию payload'ы (в т.ч. с другим порядком ключей
+или пришедшие строкой) дают один и тот же план. Уже разобранный payload (ParseResult из
+parse_payload) передаётся в get_parsed_plan — без повторного декодирования. Два уровня:
+ограниченный LRU в процессе и необязательный общий Django-кэш (settings.PLANNER_PLAN_CACHE_ALIAS).
+План хранится замороженным (pickle); каждый hit получает его независимую копию с новыми UUID
+плана и задач.
+"""
+
+
+def plan_cache_key(user_data: Union[str, dict, list, None], max_focus: int = 3, today: Optional[date] = None) -> str:
+    profile, assessment = _extract_profile_and_assessment(_safe_parse(user_data))
+    return _payload_cache_key(profile, assessment, max_focus, today or date.today())
+
+
+def _payload_cache_key(profile: Any, assessment: Any, max_focus: int, today: date) -> str:
+    digest = hashlib.sha256(canonical_json([profile, assessment])).hexdigest()
+    return f"planner:plan:{today.isoformat()}:{max_focus}:{digest}"
+
+
+def _with_fresh_ids(frozen: bytes, new_id: Callable[[], str] = _new_id) -> Dict[str, Any]:
+    # pickle.loads — глубокая копия на C: hit не делит с кэшем ни одного изменяемого объекта
+    plan = pickle.loads(frozen)
+    plan['plan_id'] = new_id()
+    for task in plan['tasks']:
+        task['id'] = new_id()
+    return plan
+
+
+class PlanCache:
+    """
+    Двухуровневый кэш планов. Потокобезопасен; счётчики доступны через stats().
+    shared — объект Django-кэша (django.core.cache.caches[alias]) или None.
+    """
+
+    def __init__(self, maxsize: int = 1024, shared=None, timeout: int = 86400):
+        self.maxsize = maxsize
+        self.shared = shared
+        self.timeout = timeout
+        self._local: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # UUID для hit'ов берутся блоками из os.urandom: uuid4() на каждый id дороже копии плана
+        self._ids = _uuid4_stream(block=256)
+        self._ids_lock = threading.Lock()
+
+    def get_plan(self, user_data: Union[str, dict, list, None], max_focus: int = 3) -> Dict[str, Any]:
+        profile, assessment = _extract_profile_and_assessment(_safe_parse(user_data))
+        return self._get(profile, assessment, max_focus,
+                         lambda: _analyze_assessment(assessment) if assessment else {})
+
+    def get_parsed_plan(self, parsed: ParseResult, max_focus: int = 3) -> Dict[str, Any]:
+        return self._get(parsed.profile, parsed.assessment, max_focus, lambda: parsed.scores)
+
+    def _get(self, profile: Any, assessment: Any, max_focus: int,
+             scores: Callable[[], Dict[Any, float]]) -> Dict[str, Any]:
+        today = date.today()
+        key = _payload_cache_key(profile, assessment, max_focus, today)
+
+        with self._lock:
+            frozen = self._local.get(key)
+            if frozen is not None:
+                self._local.move_to_end(key)
+                self.hits += 1
+        if frozen is not None:
+            return _with_fresh_ids(frozen, self._new_id)
+
+        frozen = self.shared.get(key) if self.shared is not None else None
+        if frozen is not None:
+            with self._lock:
+                self.shared_hits += 1
+            self._store_local(key, frozen)
+            return _with_fresh_ids(frozen, self._new_id)
+
+        with self._lock:
+            self.misses += 1
+        scores = scores()
+        weaknesses = _rank_weaknesses(scores, top_n=max_focus) if scores else []
+        plan = _build_plan(weaknesses, profile, today)
+        frozen = pickle.dumps(plan, pickle.HIGHEST_PROTOCOL)
+        self._store_local(key, frozen)
+        if self.shared is not None:
+            self.shared.set(key, frozen, self.timeout)
+        return plan
+
+    def _new_id(self) -> str:
+        with self._ids_lock:
+            return next(self._ids)
+
+    def _store_local(self, key: str, frozen: bytes) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._local[key] = frozen
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._local),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "shared_tier": self.shared is not None,
+            }
+
+
+_plan_cache: Optional[PlanCache] = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache:
+    """
+    Кэш процесса, сконфигурированный из settings (создаётся лениво при первом обращении).
+    """
+    global _plan_cache
+    if _plan_cache is None:
+        from django.conf import settings
+        from django.core.cache import caches
+
+        with _plan_cache_lock:
+            if _plan_cache is None:
+                alias = getattr(settings, 'PLANNER_PLAN_CACHE_ALIAS', None)
+                _plan_cache = PlanCache(
+                    maxsize=getattr(settings, 'PLANNER_PLAN_CACHE_SIZE', 1024),
+                    shared=caches[alias] if alias else None,
+                    timeout=getattr(settings, 'PLANNER_PLAN_CACHE_TIMEOUT', 86400),
+                )
+    return _plan_cache
+
+
+def generate_learning_plan_cached(user_data: Union[str, dict, list, None], max_focus: int = 3) -> Dict[str, Any]:
+    """
+    То же, что generate_learning_plan, но через кэш процесса (get_plan_cache).
+    """
+    return get_plan_cache().get_plan(user_data, max_focus=max_focus)
+
+
+def generate_parsed_plan_cached(parsed: ParseResult, max_focus: int = 3) -> Dict[str, Any]:
+    """
+    generate_learning_plan_cached для результата parse_payload (view уже разобрали payload).
+    """
+    return get_plan_cache().get_parsed_plan(parsed, max_focus=max_focus)
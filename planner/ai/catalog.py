@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import yaml
+    _HAS_YAML = True
+except Exception:
+    yaml = None
+    _HAS_YAML = False
+
+"""
+Каталог шаблонов задач для _create_tasks_for_weakness.
+Загружается один раз на процесс из JSON/YAML-файла (settings.PLANNER_TASK_TEMPLATES_PATH,
+по умолчанию task_templates.json рядом с модулем) и индексируется по skill key.
+Файл проверяется не чаще раза в PLANNER_TASK_TEMPLATES_CHECK_INTERVAL секунд; если поменялся
+"version", новый каталог собирается целиком и подменяет старый одной операцией присваивания.
+Фрагменты resources/metrics строятся один раз при загрузке; задача получает их копии
+(TaskTemplate.fragments) — план из PlanCache можно менять, не портя каталог процесса.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), 'task_templates.json')
+DEFAULT_CHECK_INTERVAL = 30.0
+
+
+class TaskTemplate(NamedTuple):
+    title: str
+    description: str
+    duration_days: int
+    weekly_effort_hours: int
+    resources: tuple
+    metrics: Dict[str, Any]
+    flat: bool = False  # resources — dict'ы скаляров, metrics — dict скаляров (см. _is_flat)
+
+    def fragments(self) -> Tuple[List[Any], Dict[str, Any]]:
+        """
+        Копии resources (списком, как в плане) и metrics для новой задачи.
+        """
+        if self.flat:
+            return [resource.copy() for resource in self.resources], self.metrics.copy()
+        return _copy_json(self.resources), _copy_json(self.metrics)
+
+
+_CONTAINERS = (dict, list, tuple)
+
+
+def _copy_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _copy_json(v) if isinstance(v, _CONTAINERS) else v for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_copy_json(v) if isinstance(v, _CONTAINERS) else v for v in value]
+    return value
+
+
+def _is_flat(resources: tuple, metrics: Dict[str, Any]) -> bool:
+    # обычная форма фрагментов: их копия — dict.copy() без рекурсии (задача создаётся на каждый навык плана)
+    return (all(isinstance(r, dict) and not any(isinstance(v, _CONTAINERS) for v in r.values()) for r in resources)
+            and not any(isinstance(v, _CONTAINERS) for v in metrics.values()))
+
+
+def _template(**fields) -> TaskTemplate:
+    return TaskTemplate(flat=_is_flat(fields['resources'], fields['metrics']), **fields)
+
+
+class TaskTemplateCatalog:
+    """
+    Неизменяемый индекс skill key -> TaskTemplate с шаблоном по умолчанию для неизвестных навыков.
+    """
+
+    def __init__(self, version: Any, templates: Dict[str, TaskTemplate], default: TaskTemplate,
+                 source: Optional[str] = None, mtime: Optional[float] = None):
+        self.version = version
+        self.default = default
+        self.source = source
+        self.mtime = mtime
+        self._templates = templates
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], source: Optional[str] = None,
+                  mtime: Optional[float] = None) -> "TaskTemplateCatalog":
+        defaults = data.get('defaults') or {}
+        default = _template(
+            title=defaults.get('title', "Улучшение навыка: {key}"),
+            description=defaults.get('description', ""),
+            duration_days=int(defaults.get('duration_days', 14)),
+            weekly_effort_hours=int(defaults.get('weekly_effort_hours', 2)),
+            resources=tuple(defaults.get('resources') or ()),
+            metrics=dict(defaults.get('metrics') or {}),
+        )
+        templates: Dict[str, TaskTemplate] = {}
+        for key, spec in (data.get('skills') or {}).items():
+            spec = spec or {}
+            templates[str(key)] = _template(
+                title=spec.get('title', default.title.format(key=key)),
+                description=spec.get('description', default.description),
+                duration_days=int(spec.get('duration_days', default.duration_days)),
+                weekly_effort_hours=int(spec.get('weekly_effort_hours', default.weekly_effort_hours)),
+                resources=tuple(spec['resources']) if 'resources' in spec else default.resources,
+                metrics=dict(spec['metrics']) if 'metrics' in spec else default.metrics,
+            )
+        return cls(data.get('version'), templates, default, source=source, mtime=mtime)
+
+    @classmethod
+    def load(cls, path: str) -> "TaskTemplateCatalog":
+        mtime = os.stat(path).st_mtime
+        with open(path, encoding='utf-8') as fh:
+            if path.endswith(('.yaml', '.yml')):
+                if not _HAS_YAML:
+                    raise RuntimeError("PyYAML is required to load %s" % path)
+                data = yaml.safe_load(fh)
+            else:
+                data = json.load(fh)
+        return cls.from_dict(data or {}, source=path, mtime=mtime)
+
+    def template_for(self, key: str) -> TaskTemplate:
+        template = self._templates.get(key)
+        if template is None:
+            template = self.default._replace(title=self.default.title.format(key=key))
+        return template
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._templates
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+
+_catalog: Optional[TaskTemplateCatalog] = None
+_checked_at = 0.0
+_reload_lock = threading.Lock()
+
+
+def _settings_value(name: str, default: Any) -> Any:
+    try:
+        from django.conf import settings
+        if settings.configured:
+            value = getattr(settings, name, None)
+            return default if value is None else value
+    except ImportError:
+        pass
+    return default
+
+
+def get_catalog() -> TaskTemplateCatalog:
+    """
+    Текущий каталог процесса. Первая загрузка — при первом обращении, далее файл
+    перечитывается только если изменился его mtime, а подмена происходит при смене version.
+    """
+    global _catalog, _checked_at
+    now = time.monotonic()
+    catalog = _catalog
+    interval = _settings_value('PLANNER_TASK_TEMPLATES_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+    if catalog is not None and now - _checked_at < interval:
+        return catalog
+
+    with _reload_lock:
+        if _catalog is not None and now - _checked_at < interval:
+            return _catalog
+        path = _settings_value('PLANNER_TASK_TEMPLATES_PATH', DEFAULT_TEMPLATES_PATH)
+        _checked_at = now
+        current = _catalog
+        if current is not None and current.source == path:
+            try:
+                if os.stat(path).st_mtime == current.mtime:
+                    return current
+            except OSError:
+                return current
+        try:
+            fresh = TaskTemplateCatalog.load(path)
+        except Exception:
+            if current is None:
+                raise
+            # битый файл не должен ронять генерацию — продолжаем со старым каталогом
+            logger.exception("Failed to reload task templates from %s", path)
+            return current
+        if current is None or current.source != path or fresh.version != current.version:
+            _catalog = fresh
+        else:
+            current.mtime = fresh.mtime
+        return _catalog
+
+
+def reset_catalog() -> None:
+    """
+    Сбрасывает каталог процесса (следующий get_catalog() загрузит его заново).
+    """
+    global _catalog, _checked_at
+    with _reload_lock:
+        _catalog = None
+        _checked_at = 0.0
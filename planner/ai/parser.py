@@ -0,0 +1,216 @@
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    import orjson
+    _HAS_ORJSON = True
+except Exception:
+    orjson = None
+    _HAS_ORJSON = False
+
+"""
+Быстрый разбор payload'ов планировщика.
+Форма payload'а определяется один раз на каждую сигнатуру ключей (кортеж ключей dict'а) —
+для неё компилируется и кэшируется экстрактор, который обращается только к реально
+присутствующим ключам вместо цепочек .get(). JSON-строки декодируются orjson, если он
+установлен. Семантика для корректных payload'ов совпадает с прежней (_analyze_assessment),
+а проблемы возвращаются структурированно: errors — payload непригоден, warnings —
+отдельные значения пропущены.
+"""
+
+PROFILE_KEYS = ('profile', 'user_profile', 'profile_data')
+ASSESSMENT_KEYS = ('assessment', 'results', 'scales', 'answers')
+SCALES_KEYS = ('scales', 'results', 'scores')
+ITEMS_KEYS = ('items', 'answers', 'data')
+NUMBER_TYPES = (int, float)
+
+MAX_CACHED_SHAPES = 4096
+MAX_WARNINGS = 20
+
+
+class ParseResult(NamedTuple):
+    data: Any                      # декодированный payload
+    profile: Any
+    assessment: Any
+    scores: Dict[Any, float]
+    errors: List[Dict[str, str]]
+    warnings: List[Dict[str, str]]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _issue(code: str, path: str, message: str) -> Dict[str, str]:
+    return {"code": code, "path": path, "message": message}
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    json.loads с orjson, если он доступен. orjson строже (NaN/Infinity, огромные int) —
+    в таких случаях повторяем стандартным json, чтобы множество принимаемых payload'ов не менялось.
+    """
+    if _HAS_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def canonical_json(value: Any) -> bytes:
+    """
+    Канонический JSON (ключи отсортированы, без пробелов) для ключей кэша; orjson, если доступен —
+    в несколько раз быстрее json.dumps(sort_keys=True). Неподдерживаемое orjson — стандартным json.
+    """
+    if _HAS_ORJSON:
+        try:
+            return orjson.dumps(value, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+# --------------------------
+# Кэш экстракторов по сигнатуре ключей
+# --------------------------
+_shape_cache: Dict[Tuple[str, tuple], Callable] = {}
+
+
+def _first_truthy(keys: Tuple[str, ...]) -> Callable[[dict], Any]:
+    """
+    Экстрактор, эквивалентный d.get(k1) or d.get(k2) or ... для ключей, присутствующих в сигнатуре.
+    """
+    if not keys:
+        return lambda d: None
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda d: d[key] or None
+
+    def extract(d):
+        for key in keys:
+            value = d[key]
+            if value:
+                return value
+        return None
+    return extract
+
+
+def _extractor(kind: str, d: dict, candidates: Tuple[str, ...]) -> Callable[[dict], Any]:
+    signature = (kind, tuple(d))
+    extract = _shape_cache.get(signature)
+    if extract is None:
+        extract = _first_truthy(tuple(k for k in candidates if k in d))
+        if len(_shape_cache) < MAX_CACHED_SHAPES:
+            _shape_cache[signature] = extract
+    return extract
+
+
+# --------------------------
+# Разбор
+# --------------------------
+def decode(user_data: Union[str, dict, list, None], errors: Optional[list] = None) -> Any:
+    """
+    Аналог _safe_parse: dict/list возвращаются как есть, строки декодируются (невалидный JSON
+    остаётся строкой, а в errors добавляется invalid_json).
+    """
+    if user_data is None or isinstance(user_data, (dict, list)):
+        return user_data
+    if isinstance(user_data, (str, bytes)):
+        try:
+            return loads(user_data)
+        except (ValueError, TypeError) as e:
+            if errors is not None:
+                errors.append(_issue('invalid_json', '$', str(e)))
+            return user_data
+    if errors is not None:
+        errors.append(_issue('unsupported_type', '$', f"Unsupported payload type: {type(user_data).__name__}"))
+    return None
+
+
+def extract_profile_and_assessment(parsed: Any) -> Tuple[Any, Any]:
+    if isinstance(parsed, dict):
+        return (_extractor('profile', parsed, PROFILE_KEYS)(parsed),
+                _extractor('assessment', parsed, ASSESSMENT_KEYS)(parsed))
+    return None, parsed
+
+
+def analyze_assessment(assessment: Any, warnings: Optional[list] = None, path: str = '$') -> Dict[Any, float]:
+    """
+    Шкалы/навыки -> score, как _analyze_assessment. Пропущенные значения попадают в warnings.
+    """
+    scores: Dict[Any, float] = {}
+    if not assessment:
+        return scores
+
+    if isinstance(assessment, dict):
+        scales = _extractor('scales', assessment, SCALES_KEYS)(assessment)
+        if isinstance(scales, dict):
+            for k, v in scales.items():
+                try:
+                    scores[str(k)] = float(v)
+                except (TypeError, ValueError, OverflowError):
+                    _warn(warnings, 'not_a_number', f"{path}.scales.{k}", f"Value {v!r} is not a number")
+            return scores
+
+        items = _extractor('items', assessment, ITEMS_KEYS)(assessment)
+        if isinstance(items, list):
+            # потоковая агрегация: на навык хранится только [сумма, число ответов], а не список ответов
+            agg: Dict[Any, list] = {}
+            get_acc = agg.get
+            for idx, it in enumerate(items):
+                if not isinstance(it, dict):
+                    _warn(warnings, 'invalid_item', f"{path}.items[{idx}]", "Item is not an object")
+                    continue
+                # элементы маленькие и их много — сигнатура дороже двух цепочек .get()
+                key = it.get('skill') or it.get('question') or it.get('key')
+                val = it.get('answer') or it.get('score')
+                if key and isinstance(val, NUMBER_TYPES):
+                    try:
+                        acc = get_acc(key)
+                        if acc is None:
+                            agg[key] = [0.0 + val, 1]  # 0.0 + val — как float(val) и sum() (знак -0.0)
+                        else:
+                            acc[0] += val
+                            acc[1] += 1
+                    except (TypeError, OverflowError):
+                        _warn(warnings, 'invalid_item', f"{path}.items[{idx}]", f"Invalid skill key {key!r} or value")
+                else:
+                    _warn(warnings, 'invalid_item', f"{path}.items[{idx}]", "Item has no skill key or numeric answer")
+            for k, (total, count) in agg.items():
+                # нормируем в 0..5 (если исходно 1..5) - оставляем mean
+                scores[k] = total / count
+            if scores:
+                return scores
+
+    # Если assessment — list простых чисел: вернём индексные слабости
+    if isinstance(assessment, list) and assessment and all(isinstance(x, (int, float)) for x in assessment):
+        for idx, v in enumerate(assessment):
+            scores[f'item_{idx}'] = float(v)
+    return scores
+
+
+def _warn(warnings: Optional[list], code: str, path: str, message: str) -> None:
+    if warnings is not None and len(warnings) < MAX_WARNINGS:
+        warnings.append(_issue(code, path, message))
+
+
+def parse_payload(user_data: Union[str, dict, list, None]) -> ParseResult:
+    """
+    Полный разбор payload'а: декодирование, профиль, assessment, scores и список проблем.
+    errors не пусты, если payload нельзя использовать: невалидный JSON, неизвестная форма
+    или assessment без единого числового значения.
+    """
+    errors: List[Dict[str, str]] = []
+    warnings: List[Dict[str, str]] = []
+    parsed = decode(user_data, errors)
+    profile, assessment = extract_profile_and_assessment(parsed)
+    scores = analyze_assessment(assessment, warnings) if assessment else {}
+
+    if not errors:
+        if isinstance(parsed, dict) and not any(k in parsed for k in PROFILE_KEYS + ASSESSMENT_KEYS):
+            errors.append(_issue('unrecognized_shape', '$',
+                                 "Expected one of: " + ", ".join(PROFILE_KEYS + ASSESSMENT_KEYS)))
+        elif assessment and not scores:
+            errors.append(_issue('no_scores', '$', "Assessment contains no numeric scores"))
+    return ParseResult(parsed, profile, assessment, scores, errors, warnings)
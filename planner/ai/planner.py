@@ -1,7 +1,15 @@
-import json
+import heapq
+import os
 import uuid
-from datetime import timedelta, date
-from typing import Any, Dict, List, Tuple, Union
+from datetime import date, timedelta
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+from .catalog import get_catalog
+from .parser import analyze_assessment, extract_profile_and_assessment, loads
 
 """
 Простой rule-based генератор learning plan.
@@ -16,59 +24,38 @@ def _safe_parse(data: Union[str, dict, list, None]) -> Union[dict, list, None]:
         return data
     if isinstance(data, str):
         try:
-            return json.loads(data)
+            return loads(data)
         except Exception:
             # оставляем как строку, обернём ниже
             return data
     return None
 
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
+def _uuid4_stream(block: int = 4096) -> Iterator[str]:
+    """
+    Бесконечный поток строковых UUID4 (тот же формат, что str(uuid.uuid4())).
+    Случайные байты берутся блоками из os.urandom, что заметно дешевле uuid4() на каждый id.
+    """
+    while True:
+        raw = np.frombuffer(os.urandom(16 * block), dtype=np.uint8).reshape(block, 16).copy()
+        raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # версия 4
+        raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # вариант RFC 4122
+        hexed = raw.tobytes().hex()
+        for i in range(0, 32 * block, 32):
+            h = hexed[i:i + 32]
+            yield f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:32]}"
+
 def _analyze_assessment(assessment: Any) -> Dict[str, float]:
     """
     Ожидает структуру assessment, например:
     - {'scales': {'conscientiousness': 3.2, 'neuroticism': 4.1, ...}}
     - или список вопросов с numeric answers: [{'skill':'time_management','answer':2}, ...]
     Возвращает словарь шкал/навыков с "score" (чем меньше — слабее).
+    Разбор выполняет planner.ai.parser (экстракторы, закэшированные по форме payload'а).
     """
-    scores: Dict[str, float] = {}
-    if not assessment:
-        return scores
-
-    # Вариант: scales
-    if isinstance(assessment, dict):
-        scales = assessment.get('scales') or assessment.get('results') or assessment.get('scores')
-        if isinstance(scales, dict):
-            for k, v in scales.items():
-                try:
-                    scores[str(k)] = float(v)
-                except Exception:
-                    continue
-            return scores
-
-        # Вариант: items list
-        items = assessment.get('items') or assessment.get('answers') or assessment.get('data')
-        if isinstance(items, list):
-            # агрегируем по skill/key
-            agg: Dict[str, List[float]] = {}
-            for it in items:
-                if isinstance(it, dict):
-                    key = it.get('skill') or it.get('question') or it.get('key')
-                    val = it.get('answer') or it.get('score')
-                    if key and isinstance(val, (int, float)):
-                        agg.setdefault(key, []).append(float(val))
-            for k, vals in agg.items():
-                # нормируем в 0..5 (если исходно 1..5) - оставляем mean
-                scores[k] = sum(vals) / len(vals) if vals else 0.0
-            if scores:
-                return scores
-
-    # Если assessment — list простых чисел: вернём индексные слабости
-    if isinstance(assessment, list) and assessment and all(isinstance(x, (int, float)) for x in assessment):
-        for idx, v in enumerate(assessment):
-            scores[f'item_{idx}'] = float(v)
-        return scores
-
-    # Ничего не разобрали
-    return scores
+    return analyze_assessment(assessment)
 
 def _rank_weaknesses(scores: Dict[str, float], top_n: int = 3) -> List[Tuple[str, float]]:
     """
@@ -77,87 +64,68 @@ def _rank_weaknesses(scores: Dict[str, float], top_n: int = 3) -> List[Tuple[str
     """
     if not scores:
         return []
-    # Если шкалы в разных диапазонах — нормализуем к 0..1 по min/max
-    vals = list(scores.values())
+    # Если шкалы в разных диапазонах — нормализуем к 0..1 по min/max.
+    # nsmallest == sorted(...)[:top_n] (включая порядок ничьих), но без полной сортировки
+    if top_n < 0:
+        return _rank_weaknesses_sorted(scores, top_n)
+    vals = scores.values()
     try:
         vmin, vmax = min(vals), max(vals)
         if vmax > vmin:
-            norm = {k: (v - vmin) / (vmax - vmin) for k, v in scores.items()}
-            # слабее -> ближе к 0, используем norm value
-            ranked = sorted(norm.items(), key=lambda x: x[1])
-            # возвращаем оригинальные значения для контекста
-            return [(k, scores[k]) for k, _ in ranked[:top_n]]
+            span = vmax - vmin
+            # слабее -> ближе к 0, ранжируем по norm value, возвращаем оригинальные значения
+            return heapq.nsmallest(top_n, scores.items(), key=lambda x: (x[1] - vmin) / span)
     except Exception:
         pass
     # fallback: просто сортируем по raw value
-    ranked = sorted(scores.items(), key=lambda x: x[1])
-    return ranked[:top_n]
+    return heapq.nsmallest(top_n, scores.items(), key=itemgetter(1))
 
-def _create_tasks_for_weakness(weak: Tuple[str, float], start_date: date, idx: int) -> Dict[str, Any]:
+def _rank_weaknesses_sorted(scores: Dict[str, float], top_n: int) -> List[Tuple[str, float]]:
+    # полная сортировка: нужна для отрицательных top_n (срез [:top_n] отбрасывает хвост)
+    vals = list(scores.values())
+    vmin, vmax = min(vals), max(vals)
+    if vmax > vmin:
+        return sorted(scores.items(), key=lambda x: (x[1] - vmin) / (vmax - vmin))[:top_n]
+    return sorted(scores.items(), key=itemgetter(1))[:top_n]
+
+def _create_tasks_for_weakness(weak: Tuple[str, float], start_date: date, idx: int, task_id: str = None) -> Dict[str, Any]:
     key, score = weak
-    # простая mapping шаблонов
-    templates = {
-        'time_management': ("Управление временем", "Еженедельные практики планирования и техника Pomodoro."),
-        'conscientiousness': ("Дисциплина и регулярность", "Малые ежедневные привычки и трекер прогресса."),
-        'neuroticism': ("Стресс-менеджмент", "Дыхательные техники, медиативные практики, работа с перфекционизмом."),
-        'motivation': ("Мотивация", "Определение целей по методу SMART, маленькие выигрыши."),
-        'communication': ("Коммуникация", "Ролевые упражнения, активное слушание и обратная связь."),
-    }
-    title, desc = templates.get(key, (f"Улучшение навыка: {key}", "Практические упражнения, ресурсы и контроль прогресса."))
+    # шаблон берётся из каталога (task_templates.json); resources/metrics — копии его фрагментов
+    template = get_catalog().template_for(key)
+    resources, metrics = template.fragments()
 
     task = {
-        "id": str(uuid.uuid4()),
-        "title": title,
+        "id": task_id or _new_id(),
+        "title": template.title,
         "skill_key": key,
-        "description": desc,
+        "description": template.description,
         "baseline_score": score,
         "priority": max(1, 5 - int(round(score))) if isinstance(score, (int, float)) else 3,
         "start_date": (start_date + timedelta(days=idx*7)).isoformat(),
-        "duration_days": 14,
-        "weekly_effort_hours": 2,
-        "resources": [
-            {"type": "article", "title": "Вводный материал", "url": "https://example.com/readme"},
-            {"type": "exercise", "title": "Практическое задание", "notes": "Делать 3 раза в неделю"}
-        ],
-        "metrics": {
-            "measure": "self_report",
-            "frequency_days": 7
-        }
+        "duration_days": template.duration_days,
+        "weekly_effort_hours": template.weekly_effort_hours,
+        "resources": resources,
+        "metrics": metrics,
     }
     return task
 
-def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: int = 3) -> Dict[str, Any]:
+def _extract_profile_and_assessment(parsed: Union[dict, list, str, None]) -> Tuple[Any, Any]:
     """
-    Основная функция. Возвращает dict с планом:
-    {
-      "plan_id": str,
-      "created_at": "YYYY-MM-DD",
-      "summary": "...",
-      "focus": [{"key":..., "score":...}, ...],
-      "tasks": [ {...}, ... ],
-      "notes": "..."
-    }
+    Извлекает профиль и assessment из разобранного user_data.
     """
-    parsed = _safe_parse(user_data)
-    today = date.today()
-
-    # Попытка извлечь профиль и assessment
-    profile = None
-    assessment = None
-    if isinstance(parsed, dict):
-        profile = parsed.get('profile') or parsed.get('user_profile') or parsed.get('profile_data')
-        assessment = parsed.get('assessment') or parsed.get('results') or parsed.get('scales') or parsed.get('answers')
-    else:
-        # если передали просто assessment как list/str
-        assessment = parsed
-
-    scores = _analyze_assessment(assessment) if assessment else {}
-    weaknesses = _rank_weaknesses(scores, top_n=max_focus) if scores else []
+    return extract_profile_and_assessment(parsed)
 
+def _build_plan(weaknesses: List[Tuple[str, float]], profile: Any, today: date,
+                new_id: Callable[[], str] = None) -> Dict[str, Any]:
+    """
+    Собирает итоговый dict плана по уже отранжированным слабостям (или по профилю, если их нет).
+    new_id — генератор строковых UUID (по умолчанию uuid4 на каждый вызов).
+    """
+    new_id = new_id or _new_id
     tasks: List[Dict[str, Any]] = []
     if weaknesses:
         for idx, weak in enumerate(weaknesses):
-            tasks.append(_create_tasks_for_weakness(weak, today, idx))
+            tasks.append(_create_tasks_for_weakness(weak, today, idx, task_id=new_id()))
         summary = f"Фокус на {', '.join([w[0] for w in weaknesses])} (определено по результатам оценки)."
     else:
         # Общий план для профиля или дефолтный вводный план
@@ -168,7 +136,7 @@ def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: i
             # простая ветвь по стилю обучения
             if pref == 'visual':
                 tasks.append({
-                    "id": str(uuid.uuid4()),
+                    "id": new_id(),
                     "title": "Визуальные материалы и конспекты",
                     "description": "Смотреть видео и делать схемы. 3 часа в неделю.",
                     "start_date": today.isoformat(),
@@ -178,7 +146,7 @@ def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: i
                 })
             elif pref == 'kinesthetic':
                 tasks.append({
-                    "id": str(uuid.uuid4()),
+                    "id": new_id(),
                     "title": "Практические проекты",
                     "description": "Проектные задания с итеративной обратной связью.",
                     "start_date": today.isoformat(),
@@ -188,7 +156,7 @@ def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: i
                 })
             else:
                 tasks.append({
-                    "id": str(uuid.uuid4()),
+                    "id": new_id(),
                     "title": "Базовый план развития",
                     "description": "Смешанная программа: чтение, практика, рефлексия.",
                     "start_date": today.isoformat(),
@@ -200,7 +168,7 @@ def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: i
         else:
             # дефолтный входной план
             tasks.append({
-                "id": str(uuid.uuid4()),
+                "id": new_id(),
                 "title": "Оценка и планирование",
                 "description": "Короткая диагностика и постановка целей (1 неделя).",
                 "start_date": today.isoformat(),
@@ -209,7 +177,7 @@ def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: i
                 "resources": [{"type":"survey","notes":"Завершить дополнительные тесты"}]
             })
             tasks.append({
-                "id": str(uuid.uuid4()),
+                "id": new_id(),
                 "title": "Базовый учебный цикл",
                 "description": "4-недельный цикл с заданиями и рефлексией.",
                 "start_date": (today + timedelta(days=7)).isoformat(),
@@ -220,7 +188,7 @@ def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: i
             summary = "Дефолтный стартовый план."
 
     plan = {
-        "plan_id": str(uuid.uuid4()),
+        "plan_id": new_id(),
         "created_at": today.isoformat(),
         "summary": summary,
         "focus": [{"key": k, "score": s} for k, s in weaknesses],
@@ -229,6 +197,162 @@ def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: i
     }
     return plan
 
+def generate_learning_plan(user_data: Union[str, dict, list, None], max_focus: int = 3) -> Dict[str, Any]:
+    """
+    Основная функция. Возвращает dict с планом:
+    {
+      "plan_id": str,
+      "created_at": "YYYY-MM-DD",
+      "summary": "...",
+      "focus": [{"key":..., "score":...}, ...],
+      "tasks": [ {...}, ... ],
+      "notes": "..."
+    }
+    """
+    profile, assessment = _extract_profile_and_assessment(_safe_parse(user_data))
+    scores = _analyze_assessment(assessment) if assessment else {}
+    return generate_parsed_plan(profile, scores, max_focus=max_focus)
+
+def generate_parsed_plan(profile: Any, scores: Dict[Any, float], max_focus: int = 3) -> Dict[str, Any]:
+    """
+    generate_learning_plan по уже разобранному payload'у (ParseResult.profile/.scores из
+    planner.ai.parser.parse_payload) — без повторного декодирования и анализа.
+    """
+    weaknesses = _rank_weaknesses(scores, top_n=max_focus) if scores else []
+    return _build_plan(weaknesses, profile, date.today())
+
+def replan_learning_plan(previous: Dict[str, Any], user_data: Union[str, dict, list, None],
+                         max_focus: int = 3) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Инкрементальная перестройка плана previous по новым user_data.
+    Слабости ранжируются заново, но задачи строятся только для изменившихся областей фокуса:
+    - score навыка не изменился — задача остаётся как была (id, даты, прогресс);
+    - score изменился — задача пересчитывается, id, start_date и прочие поля клиента сохраняются;
+    - новый навык в фокусе — новая задача; выпавший — задача удаляется.
+    Если фокуса нет в старом или новом плане (план по профилю/дефолтный), план строится заново.
+    Возвращает (plan, changes), changes = {"kept", "updated", "added", "removed": [skill keys], "rebuilt": bool}.
+    """
+    parsed = _safe_parse(user_data)
+    today = date.today()
+    profile, assessment = _extract_profile_and_assessment(parsed)
+    scores = _analyze_assessment(assessment) if assessment else {}
+    weaknesses = _rank_weaknesses(scores, top_n=max_focus) if scores else []
+
+    old_focus = {f['key']: f['score'] for f in previous.get('focus') or []}
+    changes: Dict[str, Any] = {"kept": [], "updated": [], "added": [], "removed": [], "rebuilt": False}
+    if not weaknesses or not old_focus:
+        changes.update(added=[k for k, _ in weaknesses], removed=list(old_focus), rebuilt=True)
+        return _build_plan(weaknesses, profile, today), changes
+
+    old_tasks = {t['skill_key']: t for t in previous.get('tasks') or [] if t.get('skill_key') in old_focus}
+    tasks: List[Dict[str, Any]] = []
+    for idx, (key, score) in enumerate(weaknesses):
+        old = old_tasks.get(key)
+        if old is not None and old_focus[key] == score:
+            tasks.append(old)
+            changes["kept"].append(key)
+        elif old is not None:
+            task = _create_tasks_for_weakness((key, score), today, idx, task_id=old.get('id'))
+            task["start_date"] = old.get("start_date", task["start_date"])
+            tasks.append({**old, **task})
+            changes["updated"].append(key)
+        else:
+            tasks.append(_create_tasks_for_weakness((key, score), today, idx))
+            changes["added"].append(key)
+    focus_keys = {k for k, _ in weaknesses}
+    changes["removed"] = [k for k in old_focus if k not in focus_keys]
+
+    plan = dict(previous)
+    plan.update(
+        summary=f"Фокус на {', '.join([w[0] for w in weaknesses])} (определено по результатам оценки).",
+        focus=[{"key": k, "score": s} for k, s in weaknesses],
+        tasks=tasks,
+    )
+    return plan, changes
+
+def _stable_topk(norm: np.ndarray, top_n: int) -> np.ndarray:
+    """
+    Индексы top_n наименьших значений в каждой строке, в порядке np.argsort(kind='stable')[:, :top_n].
+    Для широких строк вместо полной сортировки: argpartition находит порог (top_n-е значение),
+    берутся все элементы меньше порога и первые по порядку равные ему — ровно top_n на строку —
+    и сортируется только эта маленькая матрица. Значения должны быть конечными.
+    """
+    n, width = norm.shape
+    if top_n <= 0 or width <= 2 * top_n:
+        return np.argsort(norm, axis=1, kind='stable')[:, :top_n]
+    kth = np.partition(norm, top_n - 1, axis=1)[:, top_n - 1:top_n]
+    less = norm < kth
+    ties = norm == kth
+    need = top_n - less.sum(axis=1, keepdims=True)
+    selected = less | (ties & (np.cumsum(ties, axis=1) <= need))
+    cols = np.nonzero(selected)[1].reshape(n, top_n)  # по возрастанию столбца внутри строки
+    picked = np.take_along_axis(norm, cols, axis=1)
+    return np.take_along_axis(cols, np.argsort(picked, axis=1, kind='stable'), axis=1)
+
+def _rank_weaknesses_batch(score_rows: List[Dict[str, float]], top_n: int = 3) -> List[List[Tuple[str, float]]]:
+    """
+    Векторизованный аналог _rank_weaknesses для многих пользователей сразу.
+    Строки группируются по числу шкал, каждая группа упаковывается в матрицу (n, k)
+    и нормируется/сортируется одним проходом NumPy. Порядок (включая ничьи) совпадает
+    с _rank_weaknesses: стабильная сортировка по нормированному значению в порядке ключей.
+    """
+    ranked: List[List[Tuple[str, float]]] = [[] for _ in score_rows]
+    groups: Dict[int, List[int]] = {}
+    for i, scores in enumerate(score_rows):
+        if scores:
+            groups.setdefault(len(scores), []).append(i)
+
+    for width, rows in groups.items():
+        mat = np.fromiter(chain.from_iterable(score_rows[i].values() for i in rows),
+                          dtype=np.float64, count=len(rows) * width).reshape(len(rows), width)
+        vmin = mat.min(axis=1, keepdims=True)
+        vmax = mat.max(axis=1, keepdims=True)
+        # NaN/inf ведут себя в min/max иначе, чем в numpy — такие строки считаем по-старому
+        with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            span = vmax - vmin
+            exact = (np.isfinite(mat).all(axis=1) & np.isfinite(span[:, 0])).tolist()
+            norm = np.where(span > 0, (mat - vmin) / np.where(span > 0, span, 1.0), 0.0)
+        if not all(exact):
+            norm = np.where(np.array(exact)[:, None], norm, 0.0)  # строки пересчитываются ниже
+        order = _stable_topk(norm, top_n).tolist()
+        for i, row_exact, row_order in zip(rows, exact, order):
+            scores = score_rows[i]
+            if not row_exact:
+                ranked[i] = _rank_weaknesses(scores, top_n=top_n)
+                continue
+            keys = list(scores)
+            ranked[i] = [(keys[j], scores[keys[j]]) for j in row_order]
+    return ranked
+
+def generate_learning_plans(batch: Iterable[Union[str, dict, list, None]], max_focus: int = 3) -> List[Dict[str, Any]]:
+    """
+    Пакетная версия generate_learning_plan: принимает iterable payload'ов и возвращает
+    список планов в том же порядке. Результат для каждого элемента совпадает с
+    generate_learning_plan (кроме случайных UUID), ранжирование слабостей выполняется
+    одним векторизованным проходом по всем пользователям.
+    """
+    analyzed = []
+    for user_data in batch:
+        profile, assessment = _extract_profile_and_assessment(_safe_parse(user_data))
+        analyzed.append((profile, _analyze_assessment(assessment) if assessment else {}))
+    return generate_parsed_plans(analyzed, max_focus=max_focus)
+
+def generate_parsed_plans(analyzed: Iterable[Tuple[Any, Dict[Any, float]]], max_focus: int = 3) -> List[Dict[str, Any]]:
+    """
+    generate_learning_plans по уже разобранным payload'ам: iterable пар (profile, scores).
+    """
+    today = date.today()
+    profiles: List[Any] = []
+    score_rows: List[Dict[str, float]] = []
+    for profile, scores in analyzed:
+        profiles.append(profile)
+        score_rows.append(scores)
+
+    ranked = _rank_weaknesses_batch(score_rows, top_n=max_focus)
+    new_id = _uuid4_stream().__next__
+    return [_build_plan(weaknesses, profile, today, new_id=new_id)
+            for weaknesses, profile in zip(ranked, profiles)]
+
 
 
 
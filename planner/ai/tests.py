@@ -0,0 +1,240 @@
+import json
+import os
+import tempfile
+import uuid
+from unittest import mock
+
+import numpy as np
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from .cache import PlanCache, plan_cache_key
+from .catalog import TaskTemplateCatalog, get_catalog, reset_catalog
+from .parser import _shape_cache, parse_payload
+from .planner import (
+    _rank_weaknesses,
+    _rank_weaknesses_batch,
+    _stable_topk,
+    generate_learning_plan,
+    generate_learning_plans,
+)
+
+
+def _without_ids(plan):
+    plan = dict(plan)
+    plan.pop('plan_id')
+    plan['tasks'] = [{k: v for k, v in t.items() if k != 'id'} for t in plan['tasks']]
+    return plan
+
+
+class GenerateLearningPlansTest(SimpleTestCase):
+
+    def setUp(self):
+        self.batch = [
+            {'assessment': {'scales': {'conscientiousness': 3.2, 'neuroticism': 4.1, 'motivation': 2.0}}},
+            {'assessment': {'scales': {'a': 1, 'b': 1, 'c': 1}}},                  # ничьи: порядок ключей
+            {'assessment': {'scales': {'x': 2, 'y': 'bad', 'z': 1.5}}},
+            {'assessment': {'items': [{'skill': 'time_management', 'answer': 2},
+                                      {'skill': 'communication', 'answer': 4},
+                                      {'skill': 'time_management', 'answer': 3}]}},
+            [3, 1, 2, 1e308, -1e308],                                         # переполнение span
+            {'profile': {'learning_style': 'visual'}},
+            '{"assessment": {"scales": {"motivation": 1, "communication": 5}}}',
+            None,
+        ]
+
+    def test_matches_single_user_function(self):
+        for max_focus in (3, 1, 0, 10):
+            expected = [_without_ids(generate_learning_plan(p, max_focus=max_focus)) for p in self.batch]
+            actual = [_without_ids(p) for p in generate_learning_plans(self.batch, max_focus=max_focus)]
+            self.assertEqual(actual, expected)
+        self.assertEqual([f['key'] for f in expected[1]['focus']], ['a', 'b', 'c'][:max_focus])
+
+    def test_ids_are_unique_uuid4(self):
+        plans = generate_learning_plans(self.batch)
+        ids = [p['plan_id'] for p in plans] + [t['id'] for p in plans for t in p['tasks']]
+        self.assertEqual(len(ids), len(set(ids)))
+        for value in ids:
+            self.assertEqual(uuid.UUID(value).version, 4)
+
+    def test_empty_batch(self):
+        self.assertEqual(generate_learning_plans([]), [])
+
+
+class TopKWeaknessesTest(SimpleTestCase):
+
+    def test_partial_selection_keeps_sort_order_and_ties(self):
+        rng = np.random.default_rng(7)
+        mat = rng.integers(0, 4, size=(200, 40)).astype(float)  # много ничьих
+        for top_n in (1, 3, 10):
+            expected = np.argsort(mat, axis=1, kind='stable')[:, :top_n]
+            np.testing.assert_array_equal(_stable_topk(mat, top_n), expected)
+
+    def test_single_and_batch_match_full_sort(self):
+        rows = [{f'skill_{j}': float((i * 7 + j * 3) % 5) for j in range(300)} for i in range(20)]
+        for scores in rows:
+            norm = sorted(scores.items(), key=lambda x: x[1] / 4)
+            self.assertEqual(_rank_weaknesses(scores, top_n=5), norm[:5])
+        self.assertEqual(_rank_weaknesses_batch(rows, top_n=5), [_rank_weaknesses(r, top_n=5) for r in rows])
+
+    def test_items_aggregated_to_means(self):
+        items = [{'skill': f's{i % 3}', 'answer': i % 5 + 1} for i in range(10000)]
+        plan = generate_learning_plan({'assessment': {'items': items}}, max_focus=3)
+        expected = {}
+        for it in items:
+            expected.setdefault(it['skill'], []).append(float(it['answer']))
+        self.assertEqual({f['key']: f['score'] for f in plan['focus']},
+                         {k: sum(v) / len(v) for k, v in expected.items()})
+
+
+class PlanCacheTest(SimpleTestCase):
+
+    payload = {'assessment': {'scales': {'motivation': 1, 'communication': 4}}}
+
+    def test_equivalent_payloads_share_a_key(self):
+        reordered = '{"assessment": {"scales": {"communication": 4, "motivation": 1}}}'
+        self.assertEqual(plan_cache_key(self.payload), plan_cache_key(reordered))
+        self.assertNotEqual(plan_cache_key(self.payload), plan_cache_key(self.payload, max_focus=1))
+
+    def test_hit_returns_same_plan_with_fresh_ids(self):
+        cache = PlanCache(maxsize=8)
+        first = cache.get_plan(self.payload)
+        second = cache.get_plan(self.payload)
+        self.assertEqual(_without_ids(first), _without_ids(second))
+        self.assertNotEqual(first['plan_id'], second['plan_id'])
+        self.assertNotEqual(first['tasks'][0]['id'], second['tasks'][0]['id'])
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_hit_skips_analysis_and_is_independent(self):
+        cache = PlanCache(maxsize=8)
+        first = cache.get_plan(self.payload)
+        first['tasks'][0]['metrics']['measure'] = 'changed'
+        with mock.patch('planner.ai.cache._analyze_assessment') as analyze, \
+                mock.patch('planner.ai.cache._rank_weaknesses') as rank:
+            second = cache.get_plan(self.payload)
+        analyze.assert_not_called()
+        rank.assert_not_called()
+        self.assertNotEqual(second['tasks'][0]['metrics']['measure'], 'changed')
+
+    def test_lru_eviction(self):
+        cache = PlanCache(maxsize=2)
+        for values in ([1, 2], [2, 1], [3, 1]):
+            cache.get_plan(values)
+        cache.get_plan([3, 1])
+        stats = cache.stats()
+        self.assertEqual((stats['size'], stats['evictions'], stats['hits'], stats['misses']), (2, 1, 1, 3))
+
+    def test_shared_tier(self):
+        shared = caches['default']
+        shared.clear()
+        PlanCache(maxsize=8, shared=shared).get_plan(self.payload)
+        other_worker = PlanCache(maxsize=8, shared=shared)
+        other_worker.get_plan(self.payload)
+        self.assertEqual(other_worker.stats()['shared_hits'], 1)
+        self.assertEqual(other_worker.stats()['misses'], 0)
+
+
+class TaskTemplateCatalogTest(SimpleTestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self._write(1, 'Первая версия')
+        reset_catalog()
+        self.addCleanup(reset_catalog)
+        self.addCleanup(os.remove, self.path)
+
+    def _write(self, version, title):
+        with open(self.path, 'w', encoding='utf-8') as fh:
+            json.dump({
+                'version': version,
+                'defaults': {'resources': [{'type': 'article'}], 'metrics': {'measure': 'self_report'}},
+                'skills': {'focus': {'title': title, 'duration_days': 10}},
+            }, fh, ensure_ascii=False)
+        # mtime должен измениться даже на файловых системах с грубым разрешением
+        os.utime(self.path, (version, version))
+
+    def test_tasks_built_from_catalog(self):
+        with override_settings(PLANNER_TASK_TEMPLATES_PATH=self.path):
+            plan = generate_learning_plan({'assessment': {'scales': {'focus': 1, 'unknown_skill': 3}}})
+            catalog = get_catalog()
+        first, second = plan['tasks']
+        self.assertEqual((first['title'], first['duration_days']), ('Первая версия', 10))
+        self.assertEqual(second['title'], 'Улучшение навыка: unknown_skill')
+        self.assertEqual(first['resources'], [{'type': 'article'}])
+        # у каждой задачи свои копии: изменение плана не трогает каталог
+        first['metrics']['measure'] = 'changed'
+        first['resources'][0]['type'] = 'changed'
+        self.assertEqual(second['metrics'], {'measure': 'self_report'})
+        self.assertEqual(catalog.default.resources, ({'type': 'article'},))
+
+    def test_nested_fragments_copied_deeply(self):
+        catalog = TaskTemplateCatalog.from_dict({'skills': {
+            'flat': {'resources': [{'type': 'article'}], 'metrics': {'measure': 'self_report'}},
+            'nested': {'resources': [{'tags': ['a']}], 'metrics': {'targets': {'weekly': 3}}},
+        }})
+        self.assertTrue(catalog.template_for('flat').flat)
+        nested = catalog.template_for('nested')
+        self.assertFalse(nested.flat)
+        resources, metrics = nested.fragments()
+        resources[0]['tags'].append('b')
+        metrics['targets']['weekly'] = 5
+        self.assertEqual(nested.fragments(), ([{'tags': ['a']}], {'targets': {'weekly': 3}}))
+
+    def test_reloads_when_version_changes(self):
+        with override_settings(PLANNER_TASK_TEMPLATES_PATH=self.path, PLANNER_TASK_TEMPLATES_CHECK_INTERVAL=0):
+            before = get_catalog()
+            self.assertIs(get_catalog(), before)
+            self._write(2, 'Вторая версия')
+            after = get_catalog()
+        self.assertIsNot(after, before)
+        self.assertEqual(after.version, 2)
+        self.assertEqual(after.template_for('focus').title, 'Вторая версия')
+        self.assertEqual(before.template_for('focus').title, 'Первая версия')
+
+    def test_default_catalog_covers_builtin_skills(self):
+        reset_catalog()
+        catalog = get_catalog()
+        for key in ('time_management', 'conscientiousness', 'neuroticism', 'motivation', 'communication'):
+            self.assertIn(key, catalog)
+
+
+class PayloadParserTest(SimpleTestCase):
+
+    def test_scores_match_planner_semantics(self):
+        result = parse_payload('{"assessment": {"items": [{"skill": "a", "answer": 2}, '
+                               '{"question": "a", "score": 4}, {"key": "b", "answer": 1}, "junk"]}}')
+        self.assertTrue(result.ok)
+        self.assertEqual(result.scores, {'a': 3.0, 'b': 1.0})
+        self.assertEqual([w['code'] for w in result.warnings], ['invalid_item'])
+        self.assertEqual(parse_payload([3, 1]).scores, {'item_0': 3.0, 'item_1': 1.0})
+
+    def test_falsy_value_falls_through_like_get_or(self):
+        # прежняя семантика .get() or ...: пустые scales не мешают взять items
+        payload = {'assessment': {'scales': {}, 'items': [{'skill': 'a', 'answer': 1}]}}
+        result = parse_payload(payload)
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(result.scores, {'a': 1.0})
+        self.assertEqual(parse_payload({'profile': {}, 'assessment': [2]}).profile, None)
+
+    def test_structured_errors(self):
+        cases = {
+            '{"assessment": ': 'invalid_json',
+            42: 'unsupported_type',
+            '{"something_else": 1}': 'unrecognized_shape',
+            '{"assessment": {"scales": {"a": "bad"}}}': 'no_scores',
+        }
+        for payload, code in cases.items():
+            with self.subTest(payload=payload):
+                result = parse_payload(payload)
+                self.assertFalse(result.ok)
+                self.assertEqual(result.errors[0]['code'], code)
+        self.assertTrue(parse_payload({'profile': {'learning_style': 'visual'}}).ok)
+
+    def test_extractor_cached_per_shape(self):
+        parse_payload({'assessment': {'scales': {'a': 1}}, 'profile': {}})
+        size = len(_shape_cache)
+        result = parse_payload({'assessment': {'scales': {'b': 2}}, 'profile': {}})
+        self.assertEqual(len(_shape_cache), size)
+        self.assertEqual(result.scores, {'b': 2.0})
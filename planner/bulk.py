@@ -0,0 +1,105 @@
+import logging
+
+from users.models import User
+
+from .ai.parser import parse_payload
+from .ai.planner import generate_parsed_plan, generate_parsed_plans
+from .models import LearningPlan
+from .storage import store_plans
+
+"""
+Общая логика пакетного создания планов: валидация элементов, генерация одним
+generate_learning_plans и сохранение планов и их задач через bulk_create (planner.storage).
+Используется PlannerBatchView и Celery-задачами (planner.tasks).
+Элемент пакета — dict в формате тела PlannerView.post ("user_data" или "assessment")
+с необязательным "user_id" (users.User).
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _error(idx, message, **extra):
+    return {"index": idx, "status": "error", "error": message, **extra}
+
+
+def generate_plans_safely(parsed_payloads, max_focus=3):
+    """
+    Генерирует планы одним пакетом по результатам parse_payload (без повторного разбора);
+    если пакетная генерация падает, повторяет поэлементно, чтобы ошибка одного payload'а
+    не валила весь пакет (ошибка возвращается вместо плана).
+    """
+    try:
+        return generate_parsed_plans([(parsed.profile, parsed.scores) for parsed in parsed_payloads],
+                                     max_focus=max_focus)
+    except Exception:
+        logger.exception("Batch plan generation failed, falling back to per-item generation")
+    plans = []
+    for parsed in parsed_payloads:
+        try:
+            plans.append(generate_parsed_plan(parsed.profile, parsed.scores, max_focus=max_focus))
+        except Exception as e:
+            plans.append(e)
+    return plans
+
+
+def prepare_plans(items, start_index=0, job_id=None):
+    """
+    Валидирует элементы и генерирует планы. Возвращает (results, to_create):
+    results — список по элементам (None для тех, что попали в to_create, иначе ошибка),
+    to_create — список (позиция в items, несохранённый LearningPlan).
+    Индексы в results считаются от start_index.
+    """
+    results = [None] * len(items)
+    valid = []  # (pos, user_data, user_id, ParseResult)
+    for pos, item in enumerate(items):
+        idx = start_index + pos
+        user_data = (item.get('user_data') or item.get('assessment')) if isinstance(item, dict) else None
+        user_id = item.get('user_id') if isinstance(item, dict) else None
+        if not user_data:
+            results[pos] = _error(idx, "Missing 'user_data' or 'assessment'.")
+        elif not isinstance(user_data, (dict, list, str)):
+            results[pos] = _error(idx, "'user_data' must be a dict, list or string.")
+        elif user_id is not None and not str(user_id).isdigit():
+            results[pos] = _error(idx, "'user_id' must be an integer.")
+        else:
+            parsed = parse_payload(user_data)
+            if parsed.ok:
+                valid.append((pos, user_data, int(user_id) if user_id is not None else None, parsed))
+            else:
+                results[pos] = _error(idx, "Malformed payload", errors=parsed.errors)
+
+    # Проверка user_id одним запросом на весь пакет
+    user_ids = {user_id for _, _, user_id, _ in valid if user_id is not None}
+    if user_ids:
+        existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        checked = []
+        for entry in valid:
+            pos, _, user_id, _ = entry
+            if user_id is not None and user_id not in existing:
+                results[pos] = _error(start_index + pos, f"User {user_id!r} not found.")
+            else:
+                checked.append(entry)
+        valid = checked
+
+    plans = generate_plans_safely([parsed for _, _, _, parsed in valid])
+    to_create = []
+    for (pos, user_data, user_id, _), learning_plan in zip(valid, plans):
+        if isinstance(learning_plan, Exception):
+            results[pos] = _error(start_index + pos, "Failed to generate learning plan", detail=str(learning_plan))
+        else:
+            to_create.append((pos, LearningPlan.from_generated(user_data, learning_plan,
+                                                               user_id=user_id, job_id=job_id)))
+    return results, to_create
+
+
+def save_plans(results, to_create, start_index=0):
+    """
+    Сохраняет подготовленные планы и их задачи (planner.storage.store_plans) и заполняет results.
+    Возвращает число созданных планов.
+    """
+    if not to_create:
+        return 0
+    plans = store_plans([obj for _, obj in to_create])
+    for (pos, obj), plan in zip(to_create, plans):
+        results[pos] = {"index": start_index + pos, "status": "created", "plan_id": obj.pk, "plan": plan}
+    return len(to_create)
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+"""
+Ограниченный пул для CPU-работы async-view (генерация планов, хэширование паролей — users.hashing).
+Event loop не блокируется: задача уходит в пул (потоки или процессы), а корутина ждёт future.
+Backpressure: одновременно в пуле (выполняются + ждут) не больше max_pending задач; сверх этого
+run() сразу бросает ExecutorSaturated, и view отвечает 503 с Retry-After вместо того, чтобы
+копить очередь и латентность. Настройки — PLANNER_EXECUTOR* и AUTH_HASH_EXECUTOR* в settings.
+"""
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    kind: 'thread' — ThreadPoolExecutor (общий кэш планов процесса, numpy отпускает GIL),
+    'process' — ProcessPoolExecutor (чистый CPU-параллелизм; fn и аргументы должны пиклиться).
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, kind: str = 'thread',
+                 initializer: Optional[Callable] = None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind!r}")
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self.kind = kind
+        # выполняется в каждом воркере при старте (для процессов — пиклируемая функция)
+        self.initializer = initializer
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    pool_cls = ProcessPoolExecutor if self.kind == 'process' else ThreadPoolExecutor
+                    self._pool = pool_cls(max_workers=self.max_workers, initializer=self.initializer)
+        return self._pool
+
+    def admit(self) -> None:
+        """
+        Дешёвая проверка до подготовки задачи (запросы к БД и т.п.): бросает ExecutorSaturated,
+        если пул заполнен. Место не резервируется — run() проверяет ещё раз.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self._pending} tasks in flight (max {self.max_pending})")
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self._pending} tasks in flight (max {self.max_pending})")
+            self._pending += 1
+            self.submitted += 1
+        try:
+            return await asyncio.wrap_future(self._get_pool().submit(fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+_plan_executor: Optional[BoundedExecutor] = None
+_plan_executor_lock = threading.Lock()
+
+
+def get_plan_executor() -> BoundedExecutor:
+    """
+    Пул процесса для генерации планов, сконфигурированный из settings (создаётся лениво).
+    """
+    global _plan_executor
+    if _plan_executor is None:
+        from django.conf import settings
+
+        with _plan_executor_lock:
+            if _plan_executor is None:
+                workers = settings.PLANNER_EXECUTOR_WORKERS
+                _plan_executor = BoundedExecutor(
+                    max_workers=workers,
+                    max_pending=settings.PLANNER_EXECUTOR_MAX_PENDING or 4 * workers,
+                    kind=settings.PLANNER_EXECUTOR,
+                )
+    return _plan_executor
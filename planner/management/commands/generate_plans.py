@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.ai.parser import parse_payload
+from planner.bulk import generate_plans_safely
+from planner.models import LearningPlan
+from planner.storage import store_plans
+from users.models import User
+
+
+def _read_chunks(fh, offset, chunk_size):
+    """
+    Читает JSONL построчно (в байтах) и отдаёт чанки (end_offset, line_offsets, lines).
+    """
+    fh.seek(offset)
+    lines, offsets = [], []
+    start = offset
+    for line in fh:
+        if line.strip():
+            lines.append(line)
+            offsets.append(offset)
+        offset += len(line)
+        if len(lines) >= chunk_size:
+            yield offset, offsets, lines
+            lines, offsets = [], []
+            start = offset
+    if lines or start != offset:
+        yield offset, offsets, lines
+
+
+def _plan_chunk(lines, max_focus):
+    """
+    Выполняется в процессе пула: разбирает строки, проверяет payload'ы через parse_payload
+    (как POST /planner/batch/) и строит планы одним пакетом по уже разобранным данным.
+    Формат записи — как у элемента POST /planner/batch/ ("user_data"/"assessment" + "user_id"),
+    либо сам payload, если это не dict.
+    Возвращает список (ok, user_data | ошибка, plan | None, user_id) в порядке строк;
+    ошибка — dict {"error": ..., ["errors": проблемы разбора]}.
+    """
+    results = [None] * len(lines)
+    valid = []  # (idx, user_data, user_id, ParseResult)
+    for idx, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            results[idx] = (False, {"error": f"Invalid JSON: {e}"}, None, None)
+            continue
+        if isinstance(record, dict):
+            user_data = record.get('user_data') or record.get('assessment')
+            user_id = record.get('user_id')
+        else:
+            user_data, user_id = record, None
+        if not user_data:
+            results[idx] = (False, {"error": "Missing 'user_data' or 'assessment'."}, None, None)
+        elif not isinstance(user_data, (dict, list, str)):
+            results[idx] = (False, {"error": "'user_data' must be a dict, list or string."}, None, None)
+        elif user_id is not None and not str(user_id).isdigit():
+            results[idx] = (False, {"error": "'user_id' must be an integer."}, None, None)
+        else:
+            parsed = parse_payload(user_data)
+            if parsed.ok:
+                valid.append((idx, user_data, int(user_id) if user_id is not None else None, parsed))
+            else:
+                results[idx] = (False, {"error": "Malformed payload", "errors": parsed.errors}, None, None)
+
+    plans = generate_plans_safely([parsed for _, _, _, parsed in valid], max_focus=max_focus)
+    for (idx, user_data, user_id, _), plan in zip(valid, plans):
+        if isinstance(plan, Exception):
+            results[idx] = (False, {"error": f"Failed to generate learning plan: {plan}"}, None, None)
+        else:
+            results[idx] = (True, user_data, plan, user_id)
+    return results
+
+
+def source_key(path, offset):
+    """
+    LearningPlan.source_key строки входного файла: хэш абсолютного пути и byte offset.
+    """
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return f"{digest}:{offset}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует планы обучения из JSONL-файла (одна запись на строку) и сохраняет их в БД "
+        "или в выходной JSONL. Файл читается потоково, планы строятся в ProcessPoolExecutor; "
+        "после каждого чанка печатается byte offset, с которого можно продолжить после сбоя. "
+        "Записи проверяются как элементы POST /planner/batch/, ошибки печатаются в stderr по строкам. "
+        "В БД план помечается строкой файла (LearningPlan.source_key): повторная обработка строки "
+        "не создаёт дубликат."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="Путь к входному JSONL.")
+        parser.add_argument('--output', help="Писать планы в этот JSONL вместо БД.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Число процессов пула (0 — без пула, в текущем процессе).")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Строк на одну задачу пула.")
+        parser.add_argument('--max-focus', type=int, default=3)
+        parser.add_argument('--start-offset', type=int, default=None,
+                            help="Начать с этого byte offset во входном файле.")
+        parser.add_argument('--checkpoint',
+                            help="Файл с последним обработанным offset: читается при старте, "
+                                 "обновляется после каждого чанка.")
+
+    def handle(self, *args, **options):
+        path = options['input']
+        if not os.path.exists(path):
+            raise CommandError(f"Input file not found: {path}")
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if chunk_size < 1 or workers < 0:
+            raise CommandError("--chunk-size must be >= 1 and --workers >= 0.")
+
+        checkpoint = options['checkpoint']
+        offset = options['start_offset']
+        if offset is None:
+            offset = self._read_checkpoint(checkpoint)
+
+        output = open(options['output'], 'a' if offset else 'w', encoding='utf-8') if options['output'] else None
+        self.path = path
+        self.stats = {'ok': 0, 'failed': 0, 'skipped': 0, 'started': time.monotonic()}
+        try:
+            with open(path, 'rb') as fh:
+                chunks = _read_chunks(fh, offset, chunk_size)
+                if workers == 0:
+                    for end, offsets, lines in chunks:
+                        self._commit(_plan_chunk(lines, options['max_focus']), end, offsets, output, checkpoint)
+                else:
+                    self._run_pool(chunks, workers, options['max_focus'], output, checkpoint)
+        finally:
+            if output is not None:
+                output.close()
+
+        elapsed = time.monotonic() - self.stats['started']
+        skipped = f", {self.stats['skipped']} already stored" if self.stats['skipped'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.stats['ok']} plans, {self.stats['failed']} failed{skipped} in {elapsed:.1f}s."
+        ))
+
+    def _run_pool(self, chunks, workers, max_focus, output, checkpoint):
+        # Не больше 2 * workers чанков в работе — память ограничена независимо от размера файла.
+        # Результаты коммитятся строго по порядку, чтобы checkpoint offset был монотонным.
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for end, offsets, lines in chunks:
+                pending.append((end, offsets, pool.submit(_plan_chunk, lines, max_focus)))
+                if len(pending) >= 2 * workers:
+                    end, offsets, future = pending.popleft()
+                    self._commit(future.result(), end, offsets, output, checkpoint)
+            while pending:
+                end, offsets, future = pending.popleft()
+                self._commit(future.result(), end, offsets, output, checkpoint)
+
+    def _commit(self, results, end, offsets, output, checkpoint):
+        failed = [(offset, r[1]) for offset, r in zip(offsets, results) if not r[0]]
+        ok = [(offset, r) for offset, r in zip(offsets, results) if r[0]]
+        if output is None:
+            # user_id проверяем одним запросом на чанк, иначе FK-ошибка уронит всю транзакцию
+            user_ids = {r[3] for _, r in ok if r[3] is not None}
+            existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True)) if user_ids else set()
+            missing = [(offset, r) for offset, r in ok if r[3] is not None and r[3] not in existing]
+            failed += [(offset, {"error": f"User {r[3]!r} not found."}) for offset, r in missing]
+            ok = [(offset, r) for offset, r in ok if r[3] is None or r[3] in existing]
+            # строки, чьи планы уже сохранены (сбой между store_plans и checkpoint), пропускаем
+            keys = {offset: source_key(self.path, offset) for offset, _ in ok}
+            stored = set(LearningPlan.objects.filter(source_key__in=keys.values())
+                         .values_list('source_key', flat=True)) if keys else set()
+            self.stats['skipped'] += sum(keys[offset] in stored for offset, _ in ok)
+            ok = [(offset, r) for offset, r in ok if keys[offset] not in stored]
+        if output is not None:
+            # offset строки позволяет отбросить дубликаты, если процесс упал между записью и checkpoint
+            for offset, (_, _, plan, user_id) in ok:
+                output.write(json.dumps({"offset": offset, "user_id": user_id, "plan": plan},
+                                        ensure_ascii=False) + "\n")
+            output.flush()
+            os.fsync(output.fileno())
+        elif ok:
+            store_plans([LearningPlan.from_generated(user_data, plan, user_id=user_id, source_key=keys[offset])
+                         for offset, (_, user_data, plan, user_id) in ok])
+        for offset, error in sorted(failed, key=lambda f: f[0]):
+            self.stderr.write(json.dumps({"offset": offset, **error}, ensure_ascii=False))
+
+        self.stats['ok'] += len(ok)
+        self.stats['failed'] += len(failed)
+        self._write_checkpoint(checkpoint, end)
+        elapsed = max(time.monotonic() - self.stats['started'], 1e-9)
+        done = self.stats['ok'] + self.stats['failed']
+        self.stdout.write(
+            f"{done} records ({self.stats['ok']} ok, {self.stats['failed']} failed), "
+            f"{done / elapsed:.0f} rec/s, offset {end}"
+        )
+
+    @staticmethod
+    def _read_checkpoint(checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint, encoding='utf-8') as fh:
+            value = fh.read().strip()
+        return int(value) if value else 0
+
+    @staticmethod
+    def _write_checkpoint(checkpoint, offset):
+        if not checkpoint:
+            return
+        tmp = f"{checkpoint}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            fh.write(str(offset))
+        os.replace(tmp, checkpoint)
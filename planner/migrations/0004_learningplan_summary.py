@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 16:33
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def fill_summary(apps, schema_editor):
+    """
+    Заполняет focus_keys/task_count у существующих планов (как LearningPlan.summary_fields) чанками.
+    """
+    LearningPlan = apps.get_model('planner', 'LearningPlan')
+    batch = []
+    for obj in LearningPlan.objects.only('id', 'plan').iterator(chunk_size=BATCH_SIZE):
+        plan = obj.plan if isinstance(obj.plan, dict) else {}
+        obj.focus_keys = [f.get('key') for f in plan.get('focus') or [] if isinstance(f, dict)]
+        obj.task_count = len(plan.get('tasks') or [])
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            LearningPlan.objects.bulk_update(batch, ['focus_keys', 'task_count'])
+            batch = []
+    if batch:
+        LearningPlan.objects.bulk_update(batch, ['focus_keys', 'task_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0003_planjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningplan',
+            name='focus_keys',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='learningplan',
+            name='task_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='learningplan',
+            index=models.Index(fields=['-created_at', '-id'], name='planner_plan_created_id_idx'),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 4.2 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+COLUMN_LIMITS = {'id': 64, 'title': 255, 'skill_key': 255}
+
+
+def _objective(LearningObjective, plan, task, position):
+    # как planner.storage.objective_from_task (на исторической модели)
+    data = dict(task) if isinstance(task, dict) else {"value": task}
+    columns = {}
+    for key, limit in COLUMN_LIMITS.items():
+        value = data.get(key)
+        if isinstance(value, str) and value and len(value) <= limit:
+            columns[key] = data.pop(key)
+    return LearningObjective(plan=plan, task_id=columns.get('id', ''), objective=columns.get('title', ''),
+                             skill_key=columns.get('skill_key', ''), position=position, data=data)
+
+
+def move_tasks_to_objectives(apps, schema_editor):
+    """
+    plan["tasks"] существующих планов -> строки LearningObjective, в JSON остаётся заголовок.
+    """
+    LearningPlan = apps.get_model('planner', 'LearningPlan')
+    LearningObjective = apps.get_model('planner', 'LearningObjective')
+    plans = []
+    for obj in LearningPlan.objects.only('id', 'plan').iterator(chunk_size=BATCH_SIZE):
+        if isinstance(obj.plan, dict) and 'tasks' in obj.plan:
+            plans.append(obj)
+        if len(plans) >= BATCH_SIZE:
+            _flush(LearningPlan, LearningObjective, plans)
+            plans = []
+    _flush(LearningPlan, LearningObjective, plans)
+
+
+def _flush(LearningPlan, LearningObjective, plans):
+    objectives = []
+    for obj in plans:
+        tasks = obj.plan.pop('tasks') or []
+        objectives += [_objective(LearningObjective, obj, task, pos) for pos, task in enumerate(tasks)]
+    LearningObjective.objects.bulk_create(objectives, batch_size=BATCH_SIZE)
+    LearningPlan.objects.bulk_update(plans, ['plan'], batch_size=BATCH_SIZE)
+
+
+def move_objectives_to_tasks(apps, schema_editor):
+    LearningPlan = apps.get_model('planner', 'LearningPlan')
+    LearningObjective = apps.get_model('planner', 'LearningObjective')
+    rows = LearningObjective.objects.exclude(task_id='').order_by('plan_id', 'position', 'id')
+    tasks_by_plan = {}
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        task = {'id': row.task_id}
+        if row.objective:
+            task['title'] = row.objective
+        if row.skill_key:
+            task['skill_key'] = row.skill_key
+        task.update(row.data or {})
+        tasks_by_plan.setdefault(row.plan_id, []).append(task)
+    plans = list(LearningPlan.objects.filter(id__in=tasks_by_plan).only('id', 'plan'))
+    for obj in plans:
+        obj.plan = {**(obj.plan or {}), 'tasks': tasks_by_plan[obj.id]}
+    LearningPlan.objects.bulk_update(plans, ['plan'], batch_size=BATCH_SIZE)
+    rows.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0004_learningplan_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningobjective',
+            name='data',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='learningobjective',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='learningobjective',
+            name='skill_key',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='learningobjective',
+            name='task_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='learningobjective',
+            index=models.Index(fields=['skill_key', 'is_completed'], name='planner_obj_skill_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learningplan',
+            index=models.Index(fields=['user', 'is_active', '-created_at'], name='planner_plan_user_active_idx'),
+        ),
+        migrations.RunPython(move_tasks_to_objectives, move_objectives_to_tasks),
+    ]
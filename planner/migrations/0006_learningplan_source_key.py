@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0005_normalize_objectives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningplan',
+            name='source_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 18:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('planner', '0006_learningplan_source_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planjob',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='plan_jobs', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,22 +1,133 @@
+import uuid
+from datetime import date, timedelta
+
+from django.conf import settings
 from django.db import models
 
 class LearningPlan(models.Model):
-    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    title = models.CharField(max_length=255)
-    description = models.TextField()
-    start_date = models.DateField()
-    end_date = models.DateField()
+    title = models.CharField(max_length=255, blank=True, default='')
+    description = models.TextField(blank=True, default='')
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    user_data = models.JSONField(null=True, blank=True)  # исходный payload, по которому строился план
+    plan = models.JSONField(default=dict, blank=True)  # заголовок плана; задачи — строки LearningObjective
+    job = models.ForeignKey('PlanJob', null=True, blank=True, related_name='plans', on_delete=models.SET_NULL)
+    # краткая проекция plan для списков (PlannerView.get), чтобы не читать тело плана
+    focus_keys = models.JSONField(default=list, blank=True)
+    task_count = models.PositiveIntegerField(default=0)
+    # "<хэш пути входного файла>:<byte offset строки>" для планов из generate_plans:
+    # повторная обработка той же строки (возобновление после сбоя) не создаёт дубликат
+    source_key = models.CharField(max_length=64, null=True, blank=True, unique=True)
+
+    class Meta:
+        indexes = [
+            # keyset-пагинация списка планов: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['-created_at', '-id'], name='planner_plan_created_id_idx'),
+            # активные планы пользователя, новые первыми
+            models.Index(fields=['user', 'is_active', '-created_at'], name='planner_plan_user_active_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @staticmethod
+    def summary_fields(plan):
+        """
+        Поля проекции (title, focus_keys, task_count) для dict плана.
+        """
+        return {
+            "title": (plan.get('summary') or '')[:255],
+            "focus_keys": [f.get('key') for f in plan.get('focus') or [] if isinstance(f, dict)],
+            "task_count": len(plan.get('tasks') or []),
+        }
+
+    @classmethod
+    def from_generated(cls, user_data, plan, user_id=None, job_id=None, source_key=None):
+        """
+        Несохранённый LearningPlan для результата generate_learning_plan:
+        title/description/даты заполняются из самого плана. plan хранится целиком до
+        planner.storage.store_plans, который выносит задачи в LearningObjective.
+        """
+        start = date.fromisoformat(plan['created_at']) if plan.get('created_at') else date.today()
+        end = start
+        for task in plan.get('tasks') or []:
+            try:
+                task_end = date.fromisoformat(task['start_date']) + timedelta(days=int(task.get('duration_days') or 0))
+            except (KeyError, TypeError, ValueError):
+                continue
+            end = max(end, task_end)
+        return cls(
+            user_id=user_id,
+            job_id=job_id,
+            source_key=source_key,
+            user_data=user_data,
+            plan=plan,
+            description=plan.get('notes') or '',
+            start_date=start,
+            end_date=end,
+            **cls.summary_fields(plan),
+        )
+
 class LearningObjective(models.Model):
+    """
+    Задача плана (элемент plan["tasks"]). id, заголовок и skill_key задачи — колонки
+    (skill_key индексирован для выборок вида «все открытые задачи по навыку»), остальные
+    поля задачи — в data. Сборка задачи обратно — planner.storage.task_from_objective.
+    """
     plan = models.ForeignKey(LearningPlan, related_name='objectives', on_delete=models.CASCADE)
     objective = models.CharField(max_length=255)
     is_completed = models.BooleanField(default=False)
+    task_id = models.CharField(max_length=64, blank=True, default='')
+    skill_key = models.CharField(max_length=255, blank=True, default='')
+    position = models.PositiveIntegerField(default=0)
+    data = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['skill_key', 'is_completed'], name='planner_obj_skill_open_idx'),
+        ]
+
+    def __str__(self):
+        return self.objective
+
+    def delete(self, *args, **kwargs):
+        # не сигнал post_delete: он отключил бы fast delete задач (каскад плана, queryset.delete)
+        from .storage import touch_plan
+
+        result = super().delete(*args, **kwargs)
+        touch_plan(self.plan_id)
+        return result
+
+class PlanJob(models.Model):
+    """
+    Асинхронная генерация пакета планов (Celery): прогресс по чанкам и ошибки по элементам.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # [{"index": ..., "error": ...}, ...]
+    # пользователь аутентификации, поставивший задание: только он (и staff) видит его статус.
+    # Задания анонимных клиентов доступны по job_id (uuid4)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, related_name='plan_jobs',
+                              on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.objective
\ No newline at end of file
+        return f"PlanJob {self.id} ({self.status} {self.processed}/{self.total})"
\ No newline at end of file
@@ -0,0 +1,70 @@
+import base64
+import json
+
+from django.utils.dateparse import parse_datetime
+
+"""
+Keyset (cursor) пагинация по (created_at, id) в порядке убывания.
+В отличие от OFFSET стоимость страницы не зависит от её номера: курсор — позиция последней
+строки предыдущей страницы, и запрос читает диапазон композитного индекса (created_at DESC, id DESC)
+начиная с неё. Курсор непрозрачен для клиента (base64 от [created_at, id]).
+"""
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _value(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        created = parse_datetime(created_at)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if created is None or not isinstance(pk, int):
+        raise InvalidCursor("Invalid cursor")
+    return created, pk
+
+
+def _keyset_queryset(queryset, cursor, field):
+    qs = queryset.order_by(f'-{field}', '-id')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        # created <= c AND NOT (created = c AND id >= pk): диапазон по индексу, ничьи добираются по id
+        qs = qs.filter(**{f'{field}__lte': created}).exclude(**{field: created, 'id__gte': pk})
+    return qs
+
+
+def _keyset_result(rows, limit, field):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(_value(last, field), _value(last, 'id'))
+
+
+def keyset_page(queryset, cursor=None, limit=10, field='created_at'):
+    """
+    Страница queryset (модели или .values()) после cursor. Возвращает (rows, next_cursor),
+    next_cursor — None на последней странице. Читает limit + 1 строк, COUNT(*) не выполняется.
+    """
+    qs = _keyset_queryset(queryset, cursor, field)
+    return _keyset_result(list(qs[:limit + 1]), limit, field)
+
+
+async def akeyset_page(queryset, cursor=None, limit=10, field='created_at'):
+    """
+    keyset_page для async-view (async ORM).
+    """
+    qs = _keyset_queryset(queryset, cursor, field)
+    return _keyset_result([row async for row in qs[:limit + 1]], limit, field)
@@ -0,0 +1,112 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api.response_cache import invalidate
+from users.models import User
+
+from .ai.parser import analyze_assessment, decode, extract_profile_and_assessment
+from .ai.planner import generate_learning_plan, replan_learning_plan
+from .models import LearningPlan
+from .storage import (
+    assemble_plan,
+    split_plan,
+    store_plan,
+    sync_objectives,
+    with_objectives,
+)
+
+"""
+Перепланирование после нового assessments.UserResponse (повторное прохождение теста).
+Баллы ответа накладываются на баллы, по которым строился текущий активный план пользователя,
+и план перестраивается инкрементально (planner.ai.planner.replan_learning_plan): неизменённые
+задачи сохраняются вместе с id и прогрессом, строка LearningPlan не пересоздаётся, а строки
+LearningObjective синхронизируются по id задачи (planner.storage.sync_objectives), поэтому
+is_completed остаётся на месте. Записываются только изменившиеся поля и строки;
+если не изменилось ничего — запросов на запись нет.
+UserResponse ссылается на auth.User, а LearningPlan — на users.User; они сопоставляются по email.
+Режим задаётся settings.PLANNER_REPLAN_MODE: incremental (по умолчанию), full или off.
+"""
+
+logger = logging.getLogger(__name__)
+
+MODE_INCREMENTAL = 'incremental'
+MODE_FULL = 'full'
+MODE_OFF = 'off'
+
+
+def response_scores(answers):
+    """
+    Баллы по шкалам из UserResponse.answers: payload assessment (scales/items/список чисел)
+    или плоский dict {шкала: балл}.
+    """
+    scores = analyze_assessment(answers)
+    if not scores and isinstance(answers, dict):
+        scores = analyze_assessment({'scales': answers})
+    return scores
+
+
+def _merged_user_data(previous_user_data, new_scores):
+    profile, assessment = extract_profile_and_assessment(decode(previous_user_data))
+    scores = analyze_assessment(assessment) if assessment else {}
+    scores.update(new_scores)
+    user_data = {"assessment": {"scales": scores}}
+    if profile:
+        user_data["profile"] = profile
+    return user_data
+
+
+def replan_for_response(response, mode=None):
+    """
+    Обновляет (или создаёт) активный план владельца response. Возвращает dict с plan_id и
+    изменениями по навыкам либо None, если план строить не для кого/не из чего.
+    """
+    mode = mode or settings.PLANNER_REPLAN_MODE
+    if mode == MODE_OFF:
+        return None
+    new_scores = response_scores(response.answers)
+    email = response.user.email
+    if not new_scores or not email:
+        return None
+    owner = User.objects.filter(email__iexact=email).only('id').first()
+    if owner is None:
+        return None
+
+    with transaction.atomic():
+        current = (with_objectives(LearningPlan.objects.select_for_update())
+                   .filter(user_id=owner.id, is_active=True)
+                   .order_by('-created_at', '-id').first())
+        if current is None:
+            user_data = _merged_user_data(None, new_scores)
+            created = LearningPlan.from_generated(user_data, generate_learning_plan(user_data), user_id=owner.id)
+            store_plan(created)
+            return {"plan_id": created.id, "created": True}
+
+        user_data = _merged_user_data(current.user_data, new_scores)
+        previous = assemble_plan(current)
+        if mode == MODE_FULL:
+            plan = generate_learning_plan(user_data)
+            changes = {"rebuilt": True}
+        else:
+            plan, changes = replan_learning_plan(previous, user_data)
+
+        fields = {}
+        if user_data != current.user_data:
+            fields['user_data'] = user_data
+        header, tasks = split_plan(plan)
+        if plan != previous:
+            generated = LearningPlan.from_generated(user_data, plan)
+            fields.update(end_date=generated.end_date, **LearningPlan.summary_fields(plan))
+            if header != current.plan:
+                fields['plan'] = header
+        if fields:
+            # UPDATE только изменившихся колонок, без перезаписи остальной строки
+            LearningPlan.objects.filter(pk=current.pk).update(updated_at=timezone.now(), **fields)
+            # update() сигналов не шлёт — кэш ответа view_learning_plan сбрасываем явно
+            invalidate('plan', current.pk)
+        # строки задач: только изменившиеся (сохранённые задачи сохраняют pk и is_completed)
+        rows = sync_objectives(current, tasks, touch=not fields) if plan != previous else {"created": 0, "updated": 0, "deleted": 0}
+    logger.debug("Replanned plan %s for response %s: %s", current.pk, response.pk, changes)
+    return {"plan_id": current.pk, "created": False, "updated_fields": sorted(fields), "objectives": rows, **changes}
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.response_cache import invalidate
+from assessments.models import UserResponse
+
+from .models import LearningObjective, LearningPlan
+from .replan import MODE_OFF
+from .storage import touch_plan
+
+
+@receiver(post_save, sender=UserResponse, dispatch_uid='planner_replan_on_response')
+def replan_on_response(sender, instance, created, raw=False, **kwargs):
+    """
+    Новый UserResponse (повторное прохождение теста) — после коммита ставим задачу
+    инкрементального перепланирования.
+    """
+    if not created or raw or settings.PLANNER_REPLAN_MODE == MODE_OFF:
+        return
+    from .tasks import replan_user_plan
+
+    transaction.on_commit(lambda: replan_user_plan.delay(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=LearningPlan, dispatch_uid='planner_invalidate_plan_response')
+def invalidate_plan(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate('plan', instance.pk)
+
+
+@receiver(post_save, sender=LearningObjective, dispatch_uid='planner_invalidate_objective_response')
+def invalidate_plan_objective(sender, instance, raw=False, **kwargs):
+    """
+    Сохранение задачи меняет страницу плана. Удаление одной задачи обрабатывает
+    LearningObjective.delete(), удаление queryset'ом — вызывающий (sync_objectives): приёмник
+    post_delete отключил бы fast delete и шёл бы на каждую строку.
+    """
+    if not raw:
+        touch_plan(instance.plan_id)
@@ -0,0 +1,181 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from api.response_cache import invalidate
+from users.models import User
+
+from .models import LearningObjective, LearningPlan
+
+"""
+Нормализованное хранение планов.
+LearningPlan.plan хранит заголовок плана (plan_id, created_at, summary, focus, notes), а каждая
+задача из plan["tasks"] — отдельная строка LearningObjective (task_id, title, skill_key, position,
+остальные поля в data). Запись — bulk_create планов и затем одним bulk_create всех их задач в одной
+транзакции; чтение — один prefetch задач на любое число планов (with_objectives + assemble_plan).
+"""
+
+_COLUMN_LIMITS = {'id': 64, 'title': 255, 'skill_key': 255}
+
+
+def split_plan(plan):
+    """
+    (заголовок без tasks, список задач) для dict плана.
+    """
+    header = {k: v for k, v in plan.items() if k != 'tasks'}
+    return header, list(plan.get('tasks') or [])
+
+
+def objective_from_task(task, position, plan=None):
+    """
+    Несохранённый LearningObjective для задачи плана. Значения, не помещающиеся в колонки
+    (не строки или длиннее колонки), остаются в data без потерь.
+    """
+    data = dict(task) if isinstance(task, dict) else {"value": task}
+    columns = {}
+    for key, limit in _COLUMN_LIMITS.items():
+        value = data.get(key)
+        if isinstance(value, str) and value and len(value) <= limit:
+            columns[key] = data.pop(key)
+    return LearningObjective(
+        plan=plan,
+        task_id=columns.get('id', ''),
+        objective=columns.get('title', ''),
+        skill_key=columns.get('skill_key', ''),
+        position=position,
+        data=data,
+    )
+
+
+def task_from_objective(obj):
+    task = {}
+    if obj.task_id:
+        task['id'] = obj.task_id
+    if obj.objective:
+        task['title'] = obj.objective
+    if obj.skill_key:
+        task['skill_key'] = obj.skill_key
+    task.update(obj.data or {})
+    return task
+
+
+def _task_fields(task):
+    obj = objective_from_task(task, 0)
+    return obj.task_id, obj.objective, obj.skill_key, obj.data
+
+
+def store_plans(plans):
+    """
+    Сохраняет несохранённые LearningPlan (из LearningPlan.from_generated, plan — полный dict):
+    bulk_create планов, затем bulk_create их задач, всё в одной транзакции.
+    У объектов plan заменяется на заголовок; возвращает список полных dict планов в том же порядке.
+    """
+    if not plans:
+        return []
+    full, objectives = [], []
+    for obj in plans:
+        full.append(obj.plan)
+        obj.plan, tasks = split_plan(obj.plan or {})
+        objectives.append(tasks)
+    batch_size = settings.PLANNER_BULK_CREATE_BATCH_SIZE
+    with transaction.atomic():
+        LearningPlan.objects.bulk_create(plans, batch_size=batch_size)
+        LearningObjective.objects.bulk_create(
+            [objective_from_task(task, pos, plan=obj)
+             for obj, tasks in zip(plans, objectives) for pos, task in enumerate(tasks)],
+            batch_size=batch_size,
+        )
+    return full
+
+
+def store_plan(obj):
+    """
+    store_plans для одного плана; возвращает полный dict плана.
+    """
+    return store_plans([obj])[0]
+
+
+def with_objectives(queryset=None):
+    """
+    queryset LearningPlan с задачами, подгружаемыми одним prefetch-запросом в порядке плана.
+    """
+    queryset = LearningPlan.objects.all() if queryset is None else queryset
+    return queryset.prefetch_related(
+        Prefetch('objectives', queryset=LearningObjective.objects.order_by('position', 'id')))
+
+
+def assemble_plan(obj):
+    """
+    Полный dict плана (как вернул generate_learning_plan) из заголовка и задач.
+    Задачи берутся из prefetch (with_objectives), иначе — отдельным запросом.
+    """
+    plan = dict(obj.plan or {})
+    objectives = list(obj.objectives.all())
+    if objectives or 'tasks' not in plan:
+        plan['tasks'] = [task_from_objective(o) for o in objectives]
+    return plan
+
+
+def load_plan(plan_id):
+    """
+    (LearningPlan, полный dict плана) — два запроса: план и его задачи.
+    """
+    obj = with_objectives().get(id=plan_id)
+    return obj, assemble_plan(obj)
+
+
+def touch_plan(plan_id):
+    """
+    Задачи — часть страницы плана: сдвигает updated_at плана (валидатор ETag) и сбрасывает
+    кэш ответа view_learning_plan.
+    """
+    LearningPlan.objects.filter(pk=plan_id).update(updated_at=timezone.now())
+    invalidate('plan', plan_id)
+
+
+def sync_objectives(obj, tasks, touch=True):
+    """
+    Приводит задачи сохранённого плана к tasks (список dict), трогая только отличающиеся строки:
+    задачи сопоставляются по id, у совпавших сохраняются pk и is_completed, изменившиеся
+    обновляются одним bulk_update, новые создаются bulk_create, пропавшие удаляются.
+    Задачи берутся из prefetch, если он был. Возвращает {"created", "updated", "deleted"}.
+    Bulk-операции сигналов не шлют: при изменениях план один раз сдвигается touch_plan
+    (touch=False — вызывающий уже обновил updated_at и кэш плана).
+    """
+    current = {o.task_id: o for o in obj.objectives.all() if o.task_id}
+    untracked = [o.pk for o in obj.objectives.all() if not o.task_id]
+    to_create, to_update, seen = [], [], set()
+    for pos, task in enumerate(tasks):
+        task_id, title, skill_key, data = _task_fields(task)
+        row = current.get(task_id) if task_id else None
+        if row is None or task_id in seen:
+            to_create.append(objective_from_task(task, pos, plan=obj))
+            continue
+        seen.add(task_id)
+        if (row.objective, row.skill_key, row.data, row.position) != (title, skill_key, data, pos):
+            row.objective, row.skill_key, row.data, row.position = title, skill_key, data, pos
+            to_update.append(row)
+    stale = [o.pk for task_id, o in current.items() if task_id not in seen] + untracked
+
+    with transaction.atomic():
+        if stale:
+            LearningObjective.objects.filter(pk__in=stale).delete()
+        if to_update:
+            LearningObjective.objects.bulk_update(to_update, ['objective', 'skill_key', 'data', 'position'])
+        if to_create:
+            LearningObjective.objects.bulk_create(to_create, batch_size=settings.PLANNER_BULK_CREATE_BATCH_SIZE)
+        if touch and (stale or to_update or to_create):
+            touch_plan(obj.pk)
+    return {"created": len(to_create), "updated": len(to_update), "deleted": len(stale)}
+
+
+def users_with_open_task(skill_key):
+    """
+    users.User с активным планом, где есть незавершённая задача по skill_key
+    (индексы planner_obj_skill_open_idx и PK плана, без разбора JSON).
+    """
+    plan_users = (LearningObjective.objects
+                  .filter(skill_key=skill_key, is_completed=False, plan__is_active=True)
+                  .values('plan__user_id'))
+    return User.objects.filter(id__in=plan_users)
@@ -1,11 +1,83 @@
 from celery import shared_task
-from .ai.planner import generate_learning_plan
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .ai.cache import generate_learning_plan_cached
+from .bulk import prepare_plans, save_plans
+from .models import LearningPlan, PlanJob
+from .replan import replan_for_response
+from .storage import store_plan
+
+# Сколько ошибок по элементам хранить в PlanJob.errors (остальные только считаются)
+MAX_STORED_ERRORS = 1000
+
 
 @shared_task
 def create_learning_plan(user_id, assessment_results):
     """
     Задача для создания персонализированного плана обучения на основе результатов тестирования.
+    Сохраняет LearningPlan и возвращает его id.
     """
-    plan = generate_learning_plan(user_id, assessment_results)
-    # Здесь можно добавить логику для сохранения плана в базе данных или отправки пользователю
-    return plan
\ No newline at end of file
+    plan = generate_learning_plan_cached(assessment_results)
+    new_plan = LearningPlan.from_generated(assessment_results, plan, user_id=user_id)
+    store_plan(new_plan)
+    return new_plan.id
+
+
+@shared_task
+def replan_user_plan(response_id):
+    """
+    Инкрементально перестраивает план владельца UserResponse (см. planner.replan).
+    """
+    from assessments.models import UserResponse
+
+    response = UserResponse.objects.select_related('user').filter(pk=response_id).first()
+    if response is None:
+        return None
+    return replan_for_response(response)
+
+
+def enqueue_plan_job(items, owner=None):
+    """
+    Создаёт PlanJob (owner — пользователь аутентификации или None) и после коммита транзакции
+    раскладывает элементы на чанки (settings.PLANNER_ASYNC_CHUNK_SIZE) — по одной задаче
+    generate_plans_chunk на чанк.
+    """
+    job = PlanJob.objects.create(total=len(items), owner=owner)
+    chunk_size = settings.PLANNER_ASYNC_CHUNK_SIZE
+    chunks = [(start, items[start:start + chunk_size]) for start in range(0, len(items), chunk_size)]
+
+    def dispatch():
+        for start, chunk in chunks:
+            generate_plans_chunk.delay(str(job.id), chunk, start)
+
+    transaction.on_commit(dispatch)
+    return job
+
+
+@shared_task
+def generate_plans_chunk(job_id, items, start_index=0):
+    """
+    Обрабатывает один чанк PlanJob: генерация одним пакетом, bulk_create и
+    атомарное обновление счётчиков задания. Последний чанк переводит задание в done.
+    """
+    PlanJob.objects.filter(id=job_id, status=PlanJob.STATUS_PENDING).update(status=PlanJob.STATUS_RUNNING)
+    try:
+        results, to_create = prepare_plans(items, start_index=start_index, job_id=job_id)
+        created = save_plans(results, to_create, start_index=start_index)
+    except Exception as e:
+        results = [{"index": start_index + pos, "status": "error", "error": str(e)} for pos in range(len(items))]
+        created = 0
+
+    errors = [{"index": r["index"], "error": r["error"]} for r in results if r["status"] == "error"]
+    with transaction.atomic():
+        job = PlanJob.objects.select_for_update().get(id=job_id)
+        if errors and len(job.errors) < MAX_STORED_ERRORS:
+            job.errors = (job.errors + errors)[:MAX_STORED_ERRORS]
+        job.processed = F('processed') + len(items)
+        job.succeeded = F('succeeded') + created
+        job.failed = F('failed') + len(errors)
+        job.save(update_fields=['errors', 'processed', 'succeeded', 'failed', 'updated_at'])
+        PlanJob.objects.filter(id=job_id, processed__gte=F('total')).update(status=PlanJob.STATUS_DONE)
+    return {"created": created, "failed": len(errors)}
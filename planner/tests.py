@@ -1,5 +1,23 @@
-from django.test import TestCase
-from .models import Plan
+import io
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User as AuthUser
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from assessments.models import PsychologicalTest, UserResponse
+from users.models import User
+from .ai.planner import generate_learning_plan
+from .models import LearningObjective, LearningPlan as Plan
+from .models import PlanJob
+from .storage import load_plan, store_plan, store_plans, sync_objectives, users_with_open_task
+from .tasks import create_learning_plan
 
 class PlanModelTest(TestCase):
 
@@ -7,13 +25,344 @@ class PlanModelTest(TestCase):
         self.plan = Plan.objects.create(
             title="Test Plan",
             description="This is a test plan for learning.",
-            duration=30
+            start_date=date(2024, 1, 1),
+            end_date=date(2024, 1, 1) + timedelta(days=30)
         )
 
     def test_plan_creation(self):
         self.assertEqual(self.plan.title, "Test Plan")
         self.assertEqual(self.plan.description, "This is a test plan for learning.")
-        self.assertEqual(self.plan.duration, 30)
+        self.assertEqual((self.plan.end_date - self.plan.start_date).days, 30)
 
     def test_plan_str(self):
-        self.assertEqual(str(self.plan), "Test Plan")
\ No newline at end of file
+        self.assertEqual(str(self.plan), "Test Plan")
+
+
+class PlannerBatchViewTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('planner-batch')
+        self.user = User.objects.create(email='batch@example.com')
+
+    def test_all_items_created_in_one_insert(self):
+        items = [
+            {"user_data": {"assessment": {"scales": {"motivation": 1, "communication": 4}}},
+             "user_id": self.user.id},
+            {"assessment": [3, 1, 2]},
+            {"user_data": {"profile": {"learning_style": "visual"}}},
+        ]
+        # счётчик throttle + SELECT users + SAVEPOINT + INSERT планов + INSERT задач + RELEASE
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, {"items": items}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(Plan.objects.count(), 3)
+        first = Plan.objects.get(id=response.data['results'][0]['plan_id'])
+        self.assertEqual(first.user_id, self.user.id)
+        self.assertEqual(first.plan['focus'][0]['key'], 'motivation')
+        self.assertTrue(first.title.startswith('Фокус на motivation'))
+
+    def test_payloads_parsed_once(self):
+        items = [{"user_data": json.dumps({"assessment": {"scales": {"motivation": 1, "communication": 4}}})},
+                 {"user_data": {"profile": {"learning_style": "visual"}}}]
+        # генерация берёт profile/scores из parse_payload и не разбирает payload второй раз
+        with mock.patch('planner.ai.planner._safe_parse', side_effect=AssertionError("parsed twice")):
+            batch = self.client.post(self.url, {"items": items}, format='json')
+            single = self.client.post(reverse('planner'), items[0], format='json')
+        self.assertEqual(batch.status_code, 201)
+        self.assertEqual(single.status_code, 201)
+        self.assertEqual(single.data['plan']['focus'][0]['key'], 'motivation')
+        self.assertEqual(batch.data['results'][1]['plan']['tasks'][0]['title'], "Визуальные материалы и конспекты")
+
+    def test_partial_failure_reported_per_item(self):
+        items = [
+            {"user_data": {"assessment": {"scales": {"a": 1}}}},
+            {"something_else": 1},
+            {"user_data": 42},
+            {"user_data": [1, 2], "user_id": 999999},
+            {"user_data": {"scales": {"a": 1}}},
+        ]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 207)
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'error', 'error', 'error'])
+        self.assertEqual([r['index'] for r in response.data['results']], [0, 1, 2, 3, 4])
+        self.assertEqual(response.data['results'][4]['errors'][0]['code'], 'no_scores')
+        self.assertEqual(Plan.objects.count(), 1)
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.client.post(self.url, {"items": []}, format='json').status_code, 400)
+        with self.settings(PLANNER_BATCH_MAX_ITEMS=2):
+            response = self.client.post(self.url, {"items": [{"user_data": [1]}] * 3}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Plan.objects.count(), 0)
+
+
+class PlannerListViewTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        payloads = [{"assessment": {"scales": {"a": i % 3, "b": 1, "c": 2}}} for i in range(25)]
+        store_plans([Plan.from_generated(p, generate_learning_plan(p)) for p in payloads])
+        # одинаковый created_at у части строк — курсор должен различать их по id
+        first_ids = list(Plan.objects.order_by('id').values_list('id', flat=True)[:12])
+        Plan.objects.filter(id__in=first_ids).update(created_at=Plan.objects.get(id=first_ids[0]).created_at)
+
+    def test_cursor_walks_all_plans_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse('planner'), params)
+            self.assertEqual(response.status_code, 200)
+            seen += [p['id'] for p in response.data['plans']]
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+        expected = list(Plan.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_lists_summary_projection_only(self):
+        item = self.client.get(reverse('planner'), {"limit": 1}).data['plans'][0]
+        plan = Plan.objects.get(id=item['id'])
+        self.assertEqual(set(item), {'id', 'created_at', 'plan_summary'})
+        self.assertEqual(item['plan_summary'], {"title": plan.title, "focus": [f['key'] for f in plan.plan['focus']],
+                                                "task_count": plan.objectives.count()})
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('planner'), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class GeneratePlansCommandTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email='backfill@example.com')
+        records = [
+            {"user_data": {"assessment": {"scales": {"motivation": 1, "communication": 4}}}, "user_id": self.user.id},
+            [3, 1, 2],
+            "not json at all",
+            {"user_data": {"assessment": {"items": [{"skill": "time_management", "answer": 2}]}}},
+            {"user_data": [1, 2], "user_id": 999999},
+        ]
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            for record in records:
+                fh.write((record if isinstance(record, str) else json.dumps(record)) + "\n")
+        self.addCleanup(os.remove, self.path)
+
+    def _run(self, *args, workers=0):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('generate_plans', self.path, '--workers', str(workers), '--chunk-size', '2', *args,
+                     stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_writes_plans_to_db_and_reports_errors(self):
+        out, err = self._run()
+        self.assertEqual(Plan.objects.count(), 3)
+        self.assertEqual(Plan.objects.filter(user=self.user).count(), 1)
+        self.assertIn("Done: 3 plans, 2 failed", out)
+        self.assertEqual(len(err.strip().splitlines()), 2)
+
+    def test_resumes_from_checkpoint_into_output_file(self):
+        checkpoint = self.path + '.offset'
+        output = self.path + '.out'
+        self.addCleanup(lambda: [os.remove(p) for p in (checkpoint, output) if os.path.exists(p)])
+        with open(self.path, 'rb') as fh:
+            second_chunk = len(fh.readline()) + len(fh.readline())
+        with open(checkpoint, 'w') as fh:
+            fh.write(str(second_chunk))
+
+        self._run('--output', output, '--checkpoint', checkpoint)
+        with open(output, encoding='utf-8') as fh:
+            written = [json.loads(line) for line in fh]
+        self.assertGreaterEqual(min(r['offset'] for r in written), second_chunk)
+        self.assertEqual(len(written), 2)  # "time_management" и запись с несуществующим user_id
+        with open(checkpoint) as fh:
+            self.assertEqual(int(fh.read()), os.path.getsize(self.path))
+        self.assertEqual(Plan.objects.count(), 0)
+
+    def test_validates_records_like_batch_endpoint(self):
+        with open(self.path, 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps({"user_data": '{"assessment": {"scales": '}) + "\n")
+            fh.write(json.dumps({"user_data": {"assessment": {"scales": {"motivation": "high"}}}}) + "\n")
+        out, err = self._run()
+        self.assertIn("Done: 3 plans, 4 failed", out)
+        errors = [json.loads(line) for line in err.strip().splitlines()]
+        self.assertEqual([e['error'] for e in errors[-2:]], ["Malformed payload", "Malformed payload"])
+        self.assertEqual([e['errors'][0]['code'] for e in errors[-2:]], ['invalid_json', 'no_scores'])
+
+    def test_rerun_over_stored_lines_does_not_duplicate_plans(self):
+        checkpoint = self.path + '.offset'
+        self.addCleanup(lambda: os.path.exists(checkpoint) and os.remove(checkpoint))
+        self._run('--checkpoint', checkpoint)
+        # сбой после store_plans, но до записи checkpoint: следующий запуск повторяет чанк
+        with open(checkpoint, 'w') as fh:
+            fh.write('0')
+        out, _ = self._run('--checkpoint', checkpoint)
+        self.assertIn("Done: 0 plans, 2 failed, 3 already stored", out)
+        self.assertEqual(Plan.objects.count(), 3)
+
+    def test_process_pool(self):
+        out, _ = self._run(workers=2)
+        self.assertIn("Done: 3 plans, 2 failed", out)
+        self.assertEqual(Plan.objects.count(), 3)
+
+
+# eager-задачи здесь изображают worker: PLANNER_ASYNC_ENABLED включён, как при настоящем брокере
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_EAGER_PROPAGATES=True, PLANNER_ASYNC_ENABLED=True)
+class AsyncPlanPipelineTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(email='async@example.com')
+
+    def test_single_plan_enqueued_and_polled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('planner'), {"async": True, "user_data": [3, 1, 2]}, format='json')
+        self.assertEqual(response.status_code, 202)
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['status'], PlanJob.STATUS_DONE)
+        self.assertEqual(status_response.data['succeeded'], 1)
+        plan = Plan.objects.get(id=status_response.data['plan_ids'][0])
+        self.assertEqual(plan.plan['focus'][0]['key'], 'item_1')
+
+    def test_batch_fans_out_into_chunks(self):
+        items = [{"user_data": [i, 1, 2], "user_id": self.user.id} for i in range(5)] + [{"nothing": 1}]
+        with self.settings(PLANNER_ASYNC_CHUNK_SIZE=2), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('planner-batch'), {"async": True, "items": items}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = PlanJob.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.status, job.total, job.processed), (PlanJob.STATUS_DONE, 6, 6))
+        self.assertEqual((job.succeeded, job.failed), (5, 1))
+        self.assertEqual(job.errors[0]['index'], 5)
+        self.assertEqual(job.plans.filter(user=self.user).count(), 5)
+
+    def test_without_broker_async_request_is_served_synchronously(self):
+        with self.settings(PLANNER_ASYNC_ENABLED=False):
+            response = self.client.post(reverse('planner'), {"async": True, "user_data": [3, 1, 2]}, format='json')
+            batch = self.client.post(reverse('planner-batch'), {"async": True, "items": [{"user_data": [1, 2]}]},
+                                     format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['plan']['focus'][0]['key'], 'item_1')
+        self.assertEqual(batch.status_code, 201)
+        self.assertFalse(PlanJob.objects.exists())
+
+    def test_job_status_is_visible_to_its_owner_only(self):
+        owner = AuthUser.objects.create(username='owner')
+        self.client.force_authenticate(owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('planner'), {"async": True, "user_data": [3, 1, 2]}, format='json')
+        url = response.data['status_url']
+        self.assertEqual(PlanJob.objects.get(id=response.data['job_id']).owner, owner)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.force_authenticate(AuthUser.objects.create(username='other'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_authenticate(AuthUser.objects.create(username='staff', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_status_for_unknown_job(self):
+        response = self.client.get(reverse('planner-job', args=['00000000-0000-0000-0000-000000000000']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_create_learning_plan_task_persists(self):
+        plan_id = create_learning_plan.delay(self.user.id, {"assessment": {"scales": {"motivation": 1}}}).get()
+        plan = Plan.objects.get(id=plan_id)
+        self.assertEqual(plan.user_id, self.user.id)
+        self.assertEqual(plan.plan['focus'][0]['key'], 'motivation')
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_EAGER_PROPAGATES=True,
+                   PLANNER_REPLAN_MODE='incremental')
+class IncrementalReplanTest(TestCase):
+
+    def setUp(self):
+        self.auth_user = AuthUser.objects.create(username='retake', email='retake@example.com')
+        self.user = User.objects.create(email='retake@example.com')
+        self.test = PsychologicalTest.objects.create(title='Big Five', description='')
+        user_data = {"profile": {"learning_style": "visual"},
+                     "assessment": {"scales": {"a": 1, "b": 2, "c": 3, "d": 4, "e": 5}}}
+        self.plan = Plan.from_generated(user_data, generate_learning_plan(user_data), user_id=self.user.id)
+        self.task_ids = {t['skill_key']: t['id'] for t in store_plan(self.plan)['tasks']}
+        self.plan.objectives.filter(skill_key='a').update(is_completed=True)
+
+    def _retake(self, answers):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserResponse.objects.create(user=self.auth_user, test=self.test, answers=answers)
+        self.plan, plan = load_plan(self.plan.id)
+        return {t['skill_key']: t for t in plan['tasks']}
+
+    def test_only_changed_focus_area_is_recomputed(self):
+        tasks = self._retake({"b": 1.5, "d": 0.5})
+        self.assertEqual([f['key'] for f in self.plan.plan['focus']], ['d', 'a', 'b'])
+        self.assertEqual(tasks['a']['id'], self.task_ids['a'])
+        self.assertEqual(tasks['b']['id'], self.task_ids['b'])
+        self.assertEqual(tasks['b']['baseline_score'], 1.5)
+        self.assertNotIn('c', tasks)
+        self.assertNotIn(tasks['d']['id'], self.task_ids.values())
+        self.assertEqual(self.plan.user_data['profile'], {"learning_style": "visual"})
+        self.assertEqual(Plan.objects.count(), 1)
+        self.assertEqual(list(LearningObjective.objects.filter(is_completed=True).values_list('skill_key', flat=True)),
+                         ['a'])
+        self.assertEqual(self.plan.task_count, 3)
+
+    def test_unchanged_focus_writes_only_user_data(self):
+        _, before = load_plan(self.plan.id)
+        objective_ids = set(LearningObjective.objects.values_list('id', flat=True))
+        self._retake({"e": 4.5})
+        self.assertEqual(load_plan(self.plan.id)[1], before)
+        self.assertEqual(set(LearningObjective.objects.values_list('id', flat=True)), objective_ids)
+        self.assertEqual(self.plan.user_data['assessment']['scales']['e'], 4.5)
+
+    def test_identical_retake_writes_nothing(self):
+        from .replan import replan_for_response
+
+        response = UserResponse(user=self.auth_user, test=self.test, answers={"a": 1})
+        with self.assertNumQueries(5):  # владелец, SAVEPOINT, SELECT ... FOR UPDATE, задачи, RELEASE
+            result = replan_for_response(response)
+        self.assertEqual(result['updated_fields'], [])
+        self.assertEqual(result['kept'], ['a', 'b', 'c'])
+
+
+class PlanStorageTest(TestCase):
+
+    def setUp(self):
+        self.users = User.objects.bulk_create([User(email=f'storage{i}@example.com') for i in range(3)])
+        payloads = [{"assessment": {"scales": {"time_management": i, "motivation": 2, "communication": 3}}}
+                    for i in range(3)]
+        self.generated = [generate_learning_plan(p) for p in payloads]
+        with self.assertNumQueries(4):  # SAVEPOINT, INSERT планов, INSERT задач, RELEASE
+            store_plans([Plan.from_generated(p, g, user_id=u.id)
+                         for p, g, u in zip(payloads, self.generated, self.users)])
+
+    def test_plan_reassembled_with_single_prefetch(self):
+        plan_ids = list(Plan.objects.order_by('id').values_list('id', flat=True))
+        self.assertNotIn('tasks', Plan.objects.get(id=plan_ids[0]).plan)
+        with self.assertNumQueries(2):
+            plan, data = load_plan(plan_ids[0])
+        self.assertEqual(json.loads(json.dumps(self.generated[0])), data)
+
+    def test_open_task_lookup_by_skill(self):
+        LearningObjective.objects.filter(plan__user=self.users[1], skill_key='time_management').update(is_completed=True)
+        self.assertEqual(set(users_with_open_task('time_management')), {self.users[0], self.users[2]})
+        Plan.objects.filter(user=self.users[2]).update(is_active=False)
+        self.assertEqual(list(users_with_open_task('time_management')), [self.users[0]])
+
+    def test_sync_removing_tasks_touches_plan_once(self):
+        obj = Plan.objects.order_by('id').first()
+        before = obj.updated_at
+        _, data = load_plan(obj.id)
+        # 2 SELECT задач (без prefetch), SAVEPOINT, один fast DELETE, одно UPDATE плана, RELEASE
+        with self.assertNumQueries(6):
+            rows = sync_objectives(obj, data['tasks'][:1])
+        self.assertEqual(rows['deleted'], len(data['tasks']) - 1)
+        self.assertGreater(Plan.objects.get(id=obj.id).updated_at, before)
+
+        objective = obj.objectives.get()
+        touched = Plan.objects.get(id=obj.id).updated_at
+        objective.delete()
+        self.assertGreater(Plan.objects.get(id=obj.id).updated_at, touched)
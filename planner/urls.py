@@ -4,6 +4,12 @@ from . import views
 urlpatterns = [
     # Основной API: GET - список планов (параметр ?limit=), POST - создать новый план (JSON)
     path('', views.PlannerView.as_view(), name='planner'),
+    # POST { "items": [...] } - пакетное создание планов (bulk_create, результат по каждому элементу)
+    path('batch/', views.PlannerBatchView.as_view(), name='planner-batch'),
+    # GET - прогресс асинхронного задания (POST с "async": true возвращает job_id)
+    path('jobs/<uuid:job_id>/', views.PlanJobView.as_view(), name='planner-job'),
+    # GET - счётчики кэша планов (только для админов)
+    path('cache/stats/', views.PlannerCacheStatsView.as_view(), name='planner-cache-stats'),
 
     # Функциональные endpoint'ы (function-based views), пригодны для form POST / просмотра в браузере
     path('create/', views.create_learning_plan, name='create-learning-plan'),      # POST form -> создаёт план и возвращает JSON
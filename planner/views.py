@@ -1,11 +1,23 @@
 # ...existing code...
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
-from .models import LearningPlan
-from .ai.planner import generate_learning_plan
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from api.replicas import ReplicaReadMixin
+from api.throttling import PlannerRateThrottle
+from api.response_cache import add_validators, conditional_response, get_response_cache, validators
+from .models import LearningPlan, PlanJob
+from .ai.cache import generate_learning_plan_cached, generate_parsed_plan_cached, get_plan_cache
+from .ai.parser import parse_payload
+from .bulk import prepare_plans, save_plans
+from .pagination import InvalidCursor, keyset_page
+from .storage import load_plan, store_plan
+from .tasks import enqueue_plan_job
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
+from rest_framework.utils.urls import replace_query_param
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,27 +25,108 @@ logger = logging.getLogger(__name__)
 def create_learning_plan(request):
     if request.method == 'POST':
         user_data = request.POST.get('user_data')
-        learning_plan = generate_learning_plan(user_data)
-        new_plan = LearningPlan.objects.create(user_data=user_data, plan=learning_plan)
+        learning_plan = generate_learning_plan_cached(user_data)
+        new_plan = LearningPlan.from_generated(user_data, learning_plan)
+        store_plan(new_plan)
         return JsonResponse({'plan_id': new_plan.id, 'plan': learning_plan}, status=201)
     return JsonResponse({'error': 'Invalid request method'}, status=400)
 
 def view_learning_plan(request, plan_id):
-    try:
-        plan = LearningPlan.objects.get(id=plan_id)
-        return render(request, 'planner/plan.html', {'plan': plan})
-    except LearningPlan.DoesNotExist:
-        return JsonResponse({'error': 'Plan not found'}, status=404)
+    """
+    HTML плана. Отрендеренная страница кэшируется (api.response_cache, namespace 'plan'),
+    условный запрос при промахе кэша проверяется по одному updated_at, без загрузки задач.
+    """
+    cache = get_response_cache()
+    entry = cache.get('plan', plan_id)
+    if entry is None:
+        updated_at = LearningPlan.objects.filter(pk=plan_id).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return JsonResponse({'error': 'Plan not found'}, status=404)
+        conditional = conditional_response(request, validators('plan', plan_id, updated_at))
+        if conditional is not None:
+            cache.not_modified('plan')
+            return add_validators(conditional, validators('plan', plan_id, updated_at))
+        try:
+            plan, plan_data = load_plan(plan_id)
+        except LearningPlan.DoesNotExist:
+            return JsonResponse({'error': 'Plan not found'}, status=404)
+        response = render(request, 'planner/plan.html', {'plan': plan, 'plan_data': plan_data,
+                                                         'tasks': plan_data['tasks']})
+        entry = validators('plan', plan.pk, plan.updated_at)
+        entry.update(content=response.content, content_type=response['Content-Type'])
+        cache.set('plan', plan_id, entry)
+        return add_validators(response, entry)
+
+    conditional = conditional_response(request, entry)
+    if conditional is not None:
+        cache.not_modified('plan')
+        return add_validators(conditional, entry)
+    return add_validators(HttpResponse(entry['content'], content_type=entry['content_type']), entry)
     
 # ...existing code...
-class PlannerView(APIView):
+def _job_body(job):
+    return {"job_id": str(job.id), "status": job.status, "total": job.total,
+            "status_url": reverse('planner-job', args=[job.id])}
+
+def _accepted(job):
+    return Response(_job_body(job), status=status.HTTP_202_ACCEPTED)
+
+def wants_async(payload):
+    """
+    Поставить ли запрос в очередь: клиент прислал "async": true и есть настоящий брокер
+    (PLANNER_ASYNC_ENABLED); иначе запрос обрабатывается синхронно.
+    """
+    return isinstance(payload, dict) and bool(payload.get('async')) and settings.PLANNER_ASYNC_ENABLED
+
+def enqueue_for(request, items):
+    """
+    enqueue_plan_job от имени пользователя запроса (аутентифицированного — владельца задания).
+    """
+    user = getattr(request, 'user', None)
+    return enqueue_plan_job(items, owner=user if user is not None and user.is_authenticated else None)
+
+def validate_plan_request(payload):
+    """
+    Проверка тела POST /planner/ (общая для PlannerView и его async-варианта).
+    Возвращает (user_data, ParseResult, None) или (None, None, (тело ошибки, HTTP-статус)).
+    """
+    user_data = payload.get('user_data') or payload.get('assessment') if isinstance(payload, dict) else None
+    if not user_data:
+        return None, None, ({"error": "Missing 'user_data' or 'assessment' in request body."},
+                            status.HTTP_400_BAD_REQUEST)
+
+    # Простая валидация: user_data должен быть dict или сериализуемым в JSON
+    if not isinstance(user_data, (dict, list, str)):
+        return None, None, ({"error": "'user_data' must be a dict, list or string."},
+                            status.HTTP_400_BAD_REQUEST)
+    # Разбор до генерации: битый payload — 400 со списком проблем, а не план по умолчанию
+    parsed = parse_payload(user_data)
+    if not parsed.ok:
+        return None, None, ({"error": "Malformed payload", "errors": parsed.errors},
+                            status.HTTP_400_BAD_REQUEST)
+    return user_data, parsed, None
+
+class PlannerCacheStatsView(APIView):
+    """
+    GET: счётчики кэша планов текущего процесса (hits/misses/evictions). Только для админов.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_plan_cache().stats(), status=status.HTTP_200_OK)
+
+class PlannerView(ReplicaReadMixin, APIView):
     """
     Улучшенный PlannerView:
-    - GET: возвращает последние планы (параметр ?limit=)
+    - GET: возвращает последние планы — краткую проекцию (?limit=, ?cursor= из next_cursor)
     - POST: принимает JSON { "user_data": { ... } } или { "assessment": {...} },
             генерирует план через generate_learning_plan, сохраняет LearningPlan и возвращает результат.
+            С "async": true план генерируется в Celery: 202 и job_id (статус — GET /planner/jobs/<job_id>/);
+            без брокера (PLANNER_ASYNC_ENABLED выключен) — синхронно, как без "async".
     Замечание: добавить аутентификацию/permissions в production.
+    POST ограничен по частоте (scope 'planner', API_THROTTLE_RATES).
     """
+    throttle_classes = [PlannerRateThrottle]
     def get(self, request):
         try:
             limit = int(request.query_params.get('limit', 10))
@@ -41,17 +134,28 @@ class PlannerView(APIView):
         except Exception:
             limit = 10
 
-        plans_qs = LearningPlan.objects.all().order_by('-created_at')[:limit]
-        plans = []
-        for p in plans_qs:
-            plans.append({
-                "id": p.id,
-                "created_at": getattr(p, "created_at", None),
-                "user_data": p.user_data if hasattr(p, "user_data") else None,
-                "plan_summary": (p.plan[:200] if isinstance(p.plan, str) else p.plan)  # краткое представление
-            })
+        # только проекция (без plan/user_data), keyset по индексу (created_at DESC, id DESC)
+        plans_qs = LearningPlan.objects.values('id', 'created_at', 'title', 'focus_keys', 'task_count')
+        try:
+            rows, next_cursor = keyset_page(plans_qs, request.query_params.get('cursor'), limit)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        plans = [{
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "plan_summary": {
+                "title": row["title"],
+                "focus": row["focus_keys"],
+                "task_count": row["task_count"],
+            },
+        } for row in rows]
 
-        return Response({"count": len(plans), "plans": plans}, status=status.HTTP_200_OK)
+        return Response({
+            "count": len(plans),
+            "plans": plans,
+            "next_cursor": next_cursor,
+            "next": replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor) if next_cursor else None,
+        }, status=status.HTTP_200_OK)
 
     def post(self, request):
         """
@@ -63,29 +167,107 @@ class PlannerView(APIView):
         }
         """
         payload = request.data
-        user_data = payload.get('user_data') or payload.get('assessment')
-        if not user_data:
-            return Response({"error": "Missing 'user_data' or 'assessment' in request body."},
-                            status=status.HTTP_400_BAD_REQUEST)
-
-        # Простая валидация: user_data должен быть dict или сериализуемым в JSON
-        if not isinstance(user_data, (dict, list, str)):
-            return Response({"error": "'user_data' must be a dict, list or string."},
-                            status=status.HTTP_400_BAD_REQUEST)
+        user_data, parsed, error = validate_plan_request(payload)
+        if error:
+            return Response(error[0], status=error[1])
+        # { "async": true, ... } — генерация в Celery, клиент опрашивает статус по job_id
+        if wants_async(payload):
+            return _accepted(enqueue_for(request, [{"user_data": user_data, "user_id": payload.get('user_id')}]))
         try:
-            # Здесь ваша логика генерации — вызывает модуль ai.planner
-            learning_plan = generate_learning_plan(user_data)
+            # Здесь ваша логика генерации — вызывает модуль ai.planner (через кэш планов)
+            learning_plan = generate_parsed_plan_cached(parsed)
 
             # Сохранение в БД
-            new_plan = LearningPlan.objects.create(user_data=user_data, plan=learning_plan)
+            new_plan = LearningPlan.from_generated(user_data, learning_plan)
+            store_plan(new_plan)
 
             response_data = {
                 "plan_id": new_plan.id,
                 "plan": learning_plan
             }
+            if parsed.warnings:
+                response_data["warnings"] = parsed.warnings
             return Response(response_data, status=status.HTTP_201_CREATED)
         except Exception as e:
             logger.exception("Error generating learning plan")
             return Response({"error": "Failed to generate learning plan", "detail": str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PlannerBatchView(APIView):
+    """
+    Пакетное создание планов:
+    - POST: принимает JSON { "items": [ {...}, ... ] } (или просто список), где каждый элемент
+            имеет тот же формат, что тело PlannerView.post ("user_data" или "assessment"),
+            плюс необязательный "user_id" (users.User).
+            Планы генерируются одним вызовом generate_learning_plans и сохраняются чанками
+            bulk_create в одной транзакции.
+    Ответ содержит результат по каждому элементу (по индексу): "created" с plan_id или "error".
+    Статус: 201 — всё создано, 207 — частично, 400 — ни одного валидного элемента.
+    С { "async": true, "items": [...] } пакет ставится в очередь Celery чанками
+    (PLANNER_ASYNC_CHUNK_SIZE) и сразу возвращается 202 с job_id (если PLANNER_ASYNC_ENABLED,
+    иначе пакет обрабатывается синхронно).
+    """
+    throttle_classes = [PlannerRateThrottle]
+
+    def post(self, request):
+        payload = request.data
+        items = payload.get('items') if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty list in 'items'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        max_items = settings.PLANNER_BATCH_MAX_ITEMS
+        if len(items) > max_items:
+            return Response({"error": f"Too many items: {len(items)} > {max_items}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if wants_async(payload):
+            return _accepted(enqueue_for(request, items))
+
+        results, to_create = prepare_plans(items)
+        try:
+            created = save_plans(results, to_create)
+        except Exception as e:
+            logger.exception("Error saving learning plans batch")
+            return Response({"error": "Failed to save learning plans", "detail": str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if created == len(items):
+            status_code = status.HTTP_201_CREATED
+        elif created:
+            status_code = status.HTTP_207_MULTI_STATUS
+        else:
+            status_code = status.HTTP_400_BAD_REQUEST
+        return Response({"created": created, "failed": len(items) - created, "results": results},
+                        status=status_code)
+
+
+class PlanJobView(APIView):
+    """
+    GET: прогресс асинхронного задания генерации планов (PlanJob):
+    статус, total/processed/succeeded/failed, ошибки по элементам и id созданных планов
+    (не больше ?limit=, по умолчанию 100).
+    Задание с владельцем видят только он и staff; чужое — 404, как несуществующее.
+    """
+    def get(self, request, job_id):
+        job = PlanJob.objects.filter(id=job_id).first()
+        user = request.user
+        if job is None or (job.owner_id is not None and job.owner_id != user.id and not user.is_staff):
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 100)), 1000))
+        except (TypeError, ValueError):
+            limit = 100
+        return Response({
+            "job_id": str(job.id),
+            "status": job.status,
+            "total": job.total,
+            "processed": job.processed,
+            "succeeded": job.succeeded,
+            "failed": job.failed,
+            "progress": job.processed / job.total if job.total else 1.0,
+            "errors": job.errors[:limit],
+            "plan_ids": list(job.plans.order_by('id').values_list('id', flat=True)[:limit]),
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
+        }, status=status.HTTP_200_OK)
 # ...existing code...
\ No newline at end of file
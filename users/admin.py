@@ -1,15 +1,22 @@
 from django.contrib import admin
+
+from api.admin_tools import ScalableModelAdmin
 from .models import UserProfile,User
 
 
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(ScalableModelAdmin):
     list_display = ('user', 'date_of_birth', 'gender')
-    search_fields = ('user__username', 'gender')
+    list_filter = ('gender',)
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    autocomplete_fields = ('user',)
 
 
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(ScalableModelAdmin):
     list_display = ('id', 'email', 'first_name', 'last_name', 'created_at')
-    search_fields = ('email', 'first_name', 'last_name')
+    search_fields = ('email',)
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
 
 
 
@@ -0,0 +1,82 @@
+import functools
+import os
+import threading
+from typing import Optional, Tuple
+
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+
+from planner.executor import BoundedExecutor
+
+from .onboarding import _user_attributes, hash_passwords
+
+"""
+Хэширование паролей для async входа и регистрации (api/async_views.py) в отдельном пуле.
+Хэшер намеренно медленный (PBKDF2 — ~сотни мс CPU на пароль); в общем пуле потоков
+sync_to_async или в потоке запроса всплеск входов занимает все потоки воркера, и остальные
+endpoint'ы ждут. Здесь хэширование идёт только в пуле AUTH_HASH_EXECUTOR_WORKERS воркеров,
+а сверх AUTH_HASH_EXECUTOR_MAX_PENDING задач пул сразу отказывает (ExecutorSaturated -> 503).
+Потоков по умолчанию достаточно: hashlib.pbkdf2_hmac (и argon2/bcrypt) отпускают GIL.
+Воркеры пула работают с пониженным приоритетом (AUTH_HASH_EXECUTOR_NICE): при нехватке CPU
+остальные запросы вытесняют хэширование, а не наоборот (в Linux nice действует на поток).
+Функции пула не обращаются к БД — пользователь читается и сохраняется в async-view.
+"""
+
+
+def verify_password(password: str, encoded: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Проверяет пароль. Возвращает (верен ли, новый хэш или None) — новый хэш, если хэш
+    устарел (сменился хэшер или число итераций), как при User.check_password.
+    Без хэша (пользователь не найден) один раз хэширует пароль, чтобы время ответа
+    не выдавало существование пользователя (как ModelBackend.authenticate).
+    """
+    if encoded is None:
+        make_password(password)
+        return False, None
+    if not check_password(password, encoded):
+        return False, None
+    try:
+        must_update = identify_hasher(encoded).must_update(encoded)
+    except ValueError:
+        must_update = False
+    return True, make_password(password) if must_update else None
+
+
+def hash_new_password(password: str, row: dict):
+    """
+    validate_password (с атрибутами пользователя из row: email, first_name, last_name)
+    и make_password: хэш или список сообщений валидации.
+    """
+    return hash_passwords([(password, _user_attributes(row))])[0]
+
+
+def _lower_priority(increment: int) -> None:
+    try:
+        os.nice(increment)
+    except (AttributeError, OSError):
+        # Windows или запрет на изменение приоритета — работаем с обычным
+        pass
+
+
+_hash_executor: Optional[BoundedExecutor] = None
+_hash_executor_lock = threading.Lock()
+
+
+def get_hash_executor() -> BoundedExecutor:
+    """
+    Пул процесса для хэширования паролей, сконфигурированный из settings (создаётся лениво).
+    """
+    global _hash_executor
+    if _hash_executor is None:
+        from django.conf import settings
+
+        with _hash_executor_lock:
+            if _hash_executor is None:
+                workers = settings.AUTH_HASH_EXECUTOR_WORKERS
+                _hash_executor = BoundedExecutor(
+                    max_workers=workers,
+                    max_pending=settings.AUTH_HASH_EXECUTOR_MAX_PENDING or 4 * workers,
+                    kind=settings.AUTH_HASH_EXECUTOR,
+                    initializer=functools.partial(_lower_priority, settings.AUTH_HASH_EXECUTOR_NICE)
+                    if settings.AUTH_HASH_EXECUTOR_NICE else None,
+                )
+    return _hash_executor
@@ -0,0 +1,72 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.onboarding import chunked, import_chunk, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Массово создаёт пользователей (аутентификации и users.User) из CSV или JSONL: "
+        "email, password, first_name, last_name. Файл читается потоково чанками; занятые email "
+        "проверяются одним запросом на чанк, пароли хэшируются в ProcessPoolExecutor, записи "
+        "вставляются bulk_create в транзакции на чанк. Ошибки по строкам — в stderr (JSON)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="Путь к CSV или JSONL.")
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help="Формат файла (по умолчанию по расширению: .csv — csv, иначе jsonl).")
+        parser.add_argument('--workers', type=int, default=settings.USERS_IMPORT_WORKERS,
+                            help="Число процессов хэширования (0 — без пула, в текущем процессе).")
+        parser.add_argument('--chunk-size', type=int, default=settings.USERS_IMPORT_CHUNK_SIZE,
+                            help="Записей на одну транзакцию.")
+        parser.add_argument('--report', help="Записать отчёт по каждой строке в этот JSONL.")
+
+    def handle(self, *args, **options):
+        path = options['input']
+        if not os.path.exists(path):
+            raise CommandError(f"Input file not found: {path}")
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if chunk_size < 1 or workers < 0:
+            raise CommandError("--chunk-size must be >= 1 and --workers >= 0.")
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+
+        report = open(options['report'], 'w', encoding='utf-8') if options['report'] else None
+        self.stats = {'created': 0, 'failed': 0, 'started': time.monotonic()}
+        pool = ProcessPoolExecutor(max_workers=workers) if workers else None
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as fh:
+                for records in chunked(read_records(fh, fmt), chunk_size):
+                    self._write(import_chunk(records, executor=pool, workers=workers), report)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if report is not None:
+                report.close()
+
+        elapsed = time.monotonic() - self.stats['started']
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.stats['created']} users created, {self.stats['failed']} failed in {elapsed:.1f}s."
+        ))
+
+    def _write(self, results, report):
+        for result in results:
+            if result["status"] == "created":
+                self.stats['created'] += 1
+            else:
+                self.stats['failed'] += 1
+                self.stderr.write(json.dumps(result, ensure_ascii=False))
+            if report is not None:
+                report.write(json.dumps(result, ensure_ascii=False) + "\n")
+        elapsed = max(time.monotonic() - self.stats['started'], 1e-9)
+        done = self.stats['created'] + self.stats['failed']
+        self.stdout.write(
+            f"{done} records ({self.stats['created']} created, {self.stats['failed']} failed), "
+            f"{done / elapsed:.0f} rec/s"
+        )
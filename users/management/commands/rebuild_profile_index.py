@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from users.profile_index import rebuild, strategy
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает таблицу атрибутов профиля (ProfileAttributeValue) по User.profile. "
+        "Нужна после изменений профилей в обход save() (queryset.update, loaddata), "
+        "добавления атрибута в PROFILE_ATTRIBUTES и перехода на USER_PROFILE_INDEX=table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Пользователей на bulk_create.")
+
+    def handle(self, *args, **options):
+        written = rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {written} attribute values written (active strategy: {strategy()})."
+        ))
@@ -0,0 +1,121 @@
+# Generated by Django 4.2 on 2026-10-18 17:22
+
+import math
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+MAX_TEXT_LENGTH = 255
+
+# Атрибуты на момент миграции (копия users.profile_index.PROFILE_ATTRIBUTES): миграция не должна
+# меняться вместе с живым кодом — новые атрибуты заполняет rebuild_profile_index
+ATTRIBUTES = (
+    ('learning_style', ('learning_style',), 'text'),
+    ('conscientiousness', ('scales', 'conscientiousness'), 'number'),
+    ('neuroticism', ('scales', 'neuroticism'), 'number'),
+    ('motivation', ('scales', 'motivation'), 'number'),
+)
+
+
+def _expression_indexes():
+    """
+    Индексы стратегии expression (PostgreSQL): выражения — те же, что строят фильтры
+    users.profile_index (profile -> ключ), плюс GIN по профилю для запросов по вхождению.
+    """
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+
+    paths = {
+        'learning_style': 'profile__learning_style',
+        'conscientiousness': 'profile__scales__conscientiousness',
+        'neuroticism': 'profile__scales__neuroticism',
+        'motivation': 'profile__scales__motivation',
+    }
+    indexes = [models.Index(models.F(path), name=f'users_prof_{name}'[:30]) for name, path in paths.items()]
+    indexes.append(GinIndex(OpClass(models.F('profile'), name='jsonb_path_ops'), name='users_prof_gin'))
+    return indexes
+
+
+def add_expression_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('users', 'User')
+    for index in _expression_indexes():
+        schema_editor.add_index(User, index)
+
+
+def remove_expression_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('users', 'User')
+    for index in _expression_indexes():
+        schema_editor.remove_index(User, index)
+
+
+def attribute_values(profile):
+    """
+    Замороженная копия users.profile_index.attribute_values для ATTRIBUTES.
+    """
+    values = {}
+    for name, path, kind in ATTRIBUTES:
+        value = profile
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if kind == 'text' and isinstance(value, str) and len(value) <= MAX_TEXT_LENGTH:
+            values[name] = ('text', value)
+        elif (kind == 'number' and isinstance(value, (int, float)) and not isinstance(value, bool)
+              and math.isfinite(value)):
+            values[name] = ('number', float(value))
+    return values
+
+
+def fill_attributes(apps, schema_editor):
+    """
+    Заполняет таблицу атрибутов по существующим профилям (как rebuild_profile_index).
+    """
+    User = apps.get_model('users', 'User')
+    ProfileAttributeValue = apps.get_model('users', 'ProfileAttributeValue')
+    rows = []
+    for user_id, profile in User.objects.values_list('id', 'profile').iterator(chunk_size=BATCH_SIZE):
+        rows.extend(ProfileAttributeValue(user_id=user_id, name=name,
+                                          text_value=value if kind == 'text' else None,
+                                          number_value=value if kind == 'number' else None)
+                    for name, (kind, value) in attribute_values(profile).items())
+        if len(rows) >= BATCH_SIZE:
+            ProfileAttributeValue.objects.bulk_create(rows)
+            rows = []
+    ProfileAttributeValue.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileAttributeValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('text_value', models.CharField(blank=True, max_length=255, null=True)),
+                ('number_value', models.FloatField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profile_attributes', to='users.user')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='profileattributevalue',
+            index=models.Index(fields=['name', 'text_value'], name='users_profattr_text_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profileattributevalue',
+            index=models.Index(fields=['name', 'number_value'], name='users_profattr_number_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='profileattributevalue',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='users_profattr_user_name_uniq'),
+        ),
+        migrations.RunPython(add_expression_indexes, remove_expression_indexes),
+        migrations.RunPython(fill_attributes, migrations.RunPython.noop),
+    ]
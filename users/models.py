@@ -12,11 +12,42 @@ class User(models.Model):
     last_name = models.CharField(max_length=150, blank=True)
     profile = models.JSONField(default=dict, blank=True)  # психологический профиль и т.п.
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)  # валидатор ETag/Last-Modified для UserDetail
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='users_user_created_id_idx'),
+            # инкрементальная выгрузка (api.export): updated_at > since в порядке (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='users_user_updated_id_idx'),
+        ]
 
     def __str__(self):
         return self.email
 
 
+class ProfileAttributeValue(models.Model):
+    """
+    Денормализованное значение объявленного атрибута User.profile (users.profile_index):
+    индексируемая замена фильтрации по JSON там, где нет индексов по выражениям JSON.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='profile_attributes')
+    name = models.CharField(max_length=64)
+    text_value = models.CharField(max_length=255, null=True, blank=True)
+    number_value = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='users_profattr_user_name_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['name', 'text_value'], name='users_profattr_text_idx'),
+            models.Index(fields=['name', 'number_value'], name='users_profattr_number_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.name}"
+
+
 class UserProfile(models.Model):
     """
     Дополнительный профиль пользователя (например, предпочтения или демографические данные).
@@ -31,6 +62,12 @@ class UserProfile(models.Model):
     date_of_birth = models.DateField(null=True, blank=True)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True)
     preferences = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='users_profile_updated_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email}'s Profile"
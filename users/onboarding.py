@@ -0,0 +1,230 @@
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core import exceptions as django_exceptions
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import User
+
+"""
+Массовый онбординг пользователей (команда import_users и POST /users/import/).
+Запись — как тело RegisterView.post: email, password, необязательные first_name и last_name.
+На чанк записей:
+- проверка полей и дубликатов внутри чанка;
+- занятые email — одним запросом (UNION по users.User и пользователям аутентификации);
+- validate_password и хэширование паролей — в пуле процессов (PBKDF2 по умолчанию
+  намеренно медленный: ~десятки мс на пароль, поэтому это основная работа импорта);
+- пользователи аутентификации и users.User — bulk_create чанками в одной транзакции.
+Отчёт по каждой записи: {"line", "email", "status": "created" | "error", "error"?}.
+"""
+
+FIELDS = ('email', 'password', 'first_name', 'last_name')
+
+
+def read_records(fh, fmt):
+    """
+    Читает записи из текстового потока: fmt 'csv' (заголовок с колонками FIELDS) или 'jsonl'.
+    Отдаёт (номер строки, dict | сообщение об ошибке разбора).
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(fh)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"Invalid JSON: {e}"
+                continue
+            yield line_no, record if isinstance(record, dict) else "Expected a JSON object."
+    else:
+        raise ValueError(f"Unknown format: {fmt!r}")
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def hash_passwords(entries):
+    """
+    Выполняется в процессе пула: validate_password и make_password для пачки пар
+    (пароль, атрибуты пользователя аутентификации). Атрибуты нужны валидаторам вроде
+    UserAttributeSimilarityValidator: пароль не должен повторять email или имя.
+    Возвращает список хэшей или списков сообщений валидации (в порядке пар).
+    """
+    AuthUser = get_user_model()
+    results = []
+    for password, attributes in entries:
+        try:
+            validate_password(password, AuthUser(**attributes))
+        except django_exceptions.ValidationError as ve:
+            results.append(ve.messages)
+            continue
+        results.append(make_password(password))
+    return results
+
+
+def _hash_all(entries, executor, workers):
+    if executor is None or len(entries) < 2:
+        return hash_passwords(entries)
+    # ~4 пачки на воркер: меньше пиклинга, чем по паролю, и ровная загрузка
+    size = max(1, -(-len(entries) // (4 * workers)))
+    results = []
+    for batch in executor.map(hash_passwords, list(chunked(entries, size))):
+        results.extend(batch)
+    return results
+
+
+def _error(line, email, message, **extra):
+    return {"line": line, "email": email, "status": "error", "error": message, **extra}
+
+
+def _user_attributes(row):
+    AuthUser = get_user_model()
+    attributes = {"email": row["email"], "first_name": row["first_name"], "last_name": row["last_name"]}
+    username_field = getattr(AuthUser, 'USERNAME_FIELD', 'email')
+    if AuthUser is not User and username_field != 'email':
+        attributes[username_field] = row["email"]
+    return attributes
+
+
+def _max_lengths():
+    """
+    Пределы длины email и имён: email становится и users.User.email, и username пользователя
+    аутентификации (150 символов при 254 у EmailField) — берётся меньший max_length.
+    """
+    AuthUser = get_user_model()
+    models = [User] if AuthUser is User else [User, AuthUser]
+    email_fields = [User._meta.get_field('email')]
+    if AuthUser is not User:
+        email_fields.append(AuthUser._meta.get_field(getattr(AuthUser, 'USERNAME_FIELD', 'email')))
+    return {
+        "email": min(field.max_length for field in email_fields),
+        "first_name": min(model._meta.get_field('first_name').max_length for model in models),
+        "last_name": min(model._meta.get_field('last_name').max_length for model in models),
+    }
+
+
+def _clean(line, record, max_lengths):
+    """
+    Нормализует запись (max_lengths — из _max_lengths, один раз на чанк);
+    возвращает (row, None) или (None, отчёт об ошибке).
+    """
+    if not isinstance(record, dict):
+        return None, _error(line, None, record)
+    email = str(record.get('email') or '').strip().lower()
+    password = record.get('password')
+    if not email or not password:
+        return None, _error(line, email or None, "email и password обязательны.")
+    try:
+        validate_email(email)
+    except django_exceptions.ValidationError:
+        return None, _error(line, email, "Некорректный email.")
+    row = {
+        "line": line,
+        "email": email,
+        "password": str(password),
+        "first_name": str(record.get('first_name') or '').strip(),
+        "last_name": str(record.get('last_name') or '').strip(),
+    }
+    # иначе на PostgreSQL bulk_create всего чанка упадёт с DataError
+    for field, limit in max_lengths.items():
+        if len(row[field]) > limit:
+            return None, _error(line, email, f"Поле {field} длиннее {limit} символов.")
+    return row, None
+
+
+def _taken_emails(emails):
+    """
+    Email'ы, уже занятые в users.User или у пользователей аутентификации (username = email,
+    как в RegisterView), — один запрос.
+    """
+    AuthUser = get_user_model()
+    api_emails = User.objects.filter(email__in=emails).values_list('email', flat=True)
+    if AuthUser is User:
+        return set(api_emails)
+    auth_emails = AuthUser.objects.filter(username__in=emails).values_list('username', flat=True)
+    return set(api_emails.union(auth_emails))
+
+
+def _dedupe(rows, report):
+    taken = _taken_emails([row["email"] for row in rows]) if rows else set()
+    fresh = []
+    for row in rows:
+        if row["email"] in taken:
+            report[row["line"]] = _error(row["line"], row["email"], "Пользователь с таким email уже существует.")
+        else:
+            fresh.append(row)
+    return fresh
+
+
+def save_users(rows, batch_size=None):
+    """
+    Создаёт пользователей аутентификации и users.User для строк {"email", "hash", "first_name",
+    "last_name"} в одной транзакции. Возвращает созданные users.User в порядке строк.
+    """
+    batch_size = batch_size or settings.USERS_BULK_CREATE_BATCH_SIZE
+    AuthUser = get_user_model()
+    with transaction.atomic():
+        if AuthUser is not User:
+            AuthUser.objects.bulk_create(
+                [AuthUser(username=row["email"], email=row["email"], password=row["hash"],
+                          first_name=row["first_name"], last_name=row["last_name"]) for row in rows],
+                batch_size=batch_size)
+        return User.objects.bulk_create(
+            [User(email=row["email"], first_name=row["first_name"], last_name=row["last_name"])
+             for row in rows],
+            batch_size=batch_size)
+
+
+def import_chunk(records, executor=None, workers=1, batch_size=None):
+    """
+    Импортирует чанк записей [(line, record), ...]. executor — concurrent.futures.Executor
+    с workers воркерами для хэширования (None — в текущем процессе).
+    Возвращает отчёт по записям в порядке чанка.
+    """
+    report = {}
+    rows, seen = [], set()
+    max_lengths = _max_lengths()
+    for line, record in records:
+        row, error = _clean(line, record, max_lengths)
+        if error is not None:
+            report[line] = error
+        elif row["email"] in seen:
+            report[line] = _error(line, row["email"], "Email повторяется в импорте.")
+        else:
+            seen.add(row["email"])
+            rows.append(row)
+
+    rows = _dedupe(rows, report)
+    hashed = []
+    entries = [(row["password"], _user_attributes(row)) for row in rows]
+    for row, result in zip(rows, _hash_all(entries, executor, workers)):
+        if isinstance(result, list):
+            report[row["line"]] = _error(row["line"], row["email"], "Неподходящий пароль.", details=result)
+        else:
+            row["hash"] = result
+            hashed.append(row)
+
+    if hashed:
+        try:
+            created = save_users(hashed, batch_size)
+        except IntegrityError:
+            # email заняли параллельно между проверкой и вставкой — проверяем ещё раз
+            hashed = _dedupe(hashed, report)
+            created = save_users(hashed, batch_size) if hashed else []
+        for row, api_user in zip(hashed, created):
+            report[row["line"]] = {"line": row["line"], "email": row["email"], "status": "created",
+                                   "id": api_user.pk}
+    return [report[line] for line, _ in records]
@@ -0,0 +1,178 @@
+import math
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import ProfileAttributeValue, User
+
+"""
+Фильтрация пользователей по объявленным атрибутам User.profile (PROFILE_ATTRIBUTES) с индексами.
+Форма профиля: {"learning_style": "visual", "scales": {"neuroticism": 4.1, ...}, ...}.
+Фильтр — пары "атрибут[__оператор]" -> значение, операторы: exact (по умолчанию), in, gt, gte,
+lt, lte (последние четыре — только для чисел); условия объединяются через AND.
+Стратегии (USER_PROFILE_INDEX; auto — expression на PostgreSQL, иначе table):
+- expression — lookups по ключам JSON (profile__scales__neuroticism__gte); на PostgreSQL их
+  обслуживают индексы по тем же выражениям (profile -> ...) из миграции users.0004 — по одному
+  на атрибут — и GIN (jsonb_path_ops) по всему профилю для поиска по вхождению;
+- table — денормализованная таблица ProfileAttributeValue (user, name, text/number) с индексами
+  (name, значение); условие — id IN (подзапрос по индексу). Работает на любой СУБД, включая
+  SQLite; синхронизируется сигналом post_save пользователя (users/signals.py).
+Изменения в обход save() (queryset.update, загрузка дампа) и смена стратегии требуют
+rebuild_profile_index. Новый атрибут — добавить в PROFILE_ATTRIBUTES, для PostgreSQL —
+миграцию с его индексом, затем rebuild_profile_index.
+Числовой атрибут должен хранить число: на PostgreSQL jsonb сравнивает строку с числом как
+«строка больше любого числа», в таблицу нечисловое значение не попадает.
+"""
+
+
+class ProfileAttribute(NamedTuple):
+    name: str
+    path: Tuple[str, ...]
+    kind: str  # 'text' | 'number'
+
+    @property
+    def lookup(self) -> str:
+        return '__'.join(('profile',) + self.path)
+
+
+PROFILE_ATTRIBUTES: Dict[str, ProfileAttribute] = {
+    attr.name: attr for attr in (
+        ProfileAttribute('learning_style', ('learning_style',), 'text'),
+        ProfileAttribute('conscientiousness', ('scales', 'conscientiousness'), 'number'),
+        ProfileAttribute('neuroticism', ('scales', 'neuroticism'), 'number'),
+        ProfileAttribute('motivation', ('scales', 'motivation'), 'number'),
+    )
+}
+
+OPERATORS = {'text': ('exact', 'in'), 'number': ('exact', 'in', 'gt', 'gte', 'lt', 'lte')}
+MAX_TEXT_LENGTH = 255
+
+
+def strategy(using=None) -> str:
+    value = settings.USER_PROFILE_INDEX
+    if value == 'auto':
+        alias = using or router.db_for_read(User)
+        return 'expression' if connections[alias].vendor == 'postgresql' else 'table'
+    if value not in ('expression', 'table'):
+        raise ValueError(f"Unknown USER_PROFILE_INDEX: {value!r}")
+    return value
+
+
+def _lookup_value(profile: Any, path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(profile, dict):
+            return None
+        profile = profile.get(key)
+    return profile
+
+
+def attribute_values(profile: Any) -> Dict[str, Tuple[str, Any]]:
+    """
+    Значения объявленных атрибутов профиля: имя -> ('text' | 'number', значение).
+    Значение другого типа (или отсутствующее) не индексируется.
+    """
+    values = {}
+    for attr in PROFILE_ATTRIBUTES.values():
+        value = _lookup_value(profile, attr.path)
+        if attr.kind == 'text' and isinstance(value, str) and len(value) <= MAX_TEXT_LENGTH:
+            values[attr.name] = ('text', value)
+        elif (attr.kind == 'number' and isinstance(value, (int, float)) and not isinstance(value, bool)
+              and math.isfinite(value)):
+            values[attr.name] = ('number', float(value))
+    return values
+
+
+def _rows(user_id, values):
+    return [ProfileAttributeValue(user_id=user_id, name=name,
+                                  text_value=value if kind == 'text' else None,
+                                  number_value=value if kind == 'number' else None)
+            for name, (kind, value) in values.items()]
+
+
+def sync_user(user: User, created: bool = False) -> None:
+    """
+    Приводит строки ProfileAttributeValue пользователя к его профилю (стратегия table).
+    Пишет только при расхождении: новому пользователю — один INSERT (или ничего, если
+    атрибутов нет), существующему — сверка с его строками одним SELECT и, если атрибуты
+    изменились, замена строк в транзакции.
+    """
+    values = attribute_values(user.profile)
+    if created:
+        if values:
+            ProfileAttributeValue.objects.bulk_create(_rows(user.pk, values))
+        return
+    stored = {name: ('text', text) if text is not None else ('number', number)
+              for name, text, number in ProfileAttributeValue.objects.filter(user_id=user.pk)
+              .values_list('name', 'text_value', 'number_value')}
+    if stored == values:
+        return
+    with transaction.atomic():
+        ProfileAttributeValue.objects.filter(user_id=user.pk).delete()
+        ProfileAttributeValue.objects.bulk_create(_rows(user.pk, values))
+
+
+def rebuild(chunk_size: int = 2000) -> int:
+    """
+    Полная пересборка таблицы атрибутов чанками. Возвращает число записанных строк.
+    """
+    written = 0
+    with transaction.atomic():
+        ProfileAttributeValue.objects.all().delete()
+        rows = []
+        for user_id, profile in User.objects.values_list('id', 'profile').iterator(chunk_size=chunk_size):
+            rows.extend(_rows(user_id, attribute_values(profile)))
+            if len(rows) >= chunk_size:
+                ProfileAttributeValue.objects.bulk_create(rows, batch_size=chunk_size)
+                written += len(rows)
+                rows = []
+        ProfileAttributeValue.objects.bulk_create(rows, batch_size=chunk_size)
+    return written + len(rows)
+
+
+def _convert(attr: ProfileAttribute, op: str, raw: str):
+    values = raw.split(',') if op == 'in' else [raw]
+    if attr.kind == 'number':
+        try:
+            values = [float(v) for v in values]
+        except ValueError:
+            raise ValidationError({f"{attr.name}__{op}": "Expected a number."})
+        if not all(math.isfinite(v) for v in values):
+            raise ValidationError({f"{attr.name}__{op}": "Expected a finite number."})
+    return values if op == 'in' else values[0]
+
+
+def parse_filters(params, ignore=()) -> List[Tuple[ProfileAttribute, str, Any]]:
+    """
+    Разбирает параметры запроса (QueryDict или dict) в [(атрибут, оператор, значение)].
+    Параметры из ignore (пагинация) пропускаются; неизвестный атрибут, оператор или
+    значение — ValidationError (400): опечатка не должна молча вернуть всех пользователей.
+    """
+    conditions = []
+    for key in params:
+        if key in ignore:
+            continue
+        name, _, op = key.partition('__')
+        attr = PROFILE_ATTRIBUTES.get(name)
+        if attr is None:
+            raise ValidationError({key: f"Unknown profile attribute; declared: {', '.join(PROFILE_ATTRIBUTES)}."})
+        op = op or 'exact'
+        if op not in OPERATORS[attr.kind]:
+            raise ValidationError({key: f"Unsupported operator for {attr.kind} attribute; "
+                                        f"use one of: {', '.join(OPERATORS[attr.kind])}."})
+        conditions.append((attr, op, _convert(attr, op, params[key])))
+    return conditions
+
+
+def filter_users(queryset, conditions, using=None):
+    """
+    Накладывает условия parse_filters() на queryset пользователей выбранной стратегией.
+    """
+    if strategy(using or queryset.db) == 'expression':
+        return queryset.filter(**{f"{attr.lookup}__{op}": value for attr, op, value in conditions})
+    for attr, op, value in conditions:
+        column = 'text_value' if attr.kind == 'text' else 'number_value'
+        matching = ProfileAttributeValue.objects.filter(name=attr.name, **{f"{column}__{op}": value})
+        queryset = queryset.filter(id__in=matching.values('user_id'))
+    return queryset
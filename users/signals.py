@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.response_cache import invalidate
+
+from .models import User, UserProfile
+from .profile_index import strategy, sync_user
+
+
+@receiver([post_save, post_delete], sender=User, dispatch_uid='users_invalidate_user_response')
+def invalidate_user(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate('user', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile, dispatch_uid='users_invalidate_profile_response')
+def invalidate_profile(sender, instance, **kwargs):
+    # профиль относится к ответу UserDetail своего пользователя
+    invalidate('user', instance.user_id)
+
+
+@receiver(post_save, sender=User, dispatch_uid='users_sync_profile_attributes')
+def sync_profile_attributes(sender, instance, created=False, update_fields=None, using=None, **kwargs):
+    # таблица атрибутов нужна только стратегии table; save() без profile в update_fields её не меняет
+    if update_fields is not None and 'profile' not in update_fields:
+        return
+    if strategy(using) == 'table':
+        sync_user(instance, created=created)
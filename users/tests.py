@@ -1,6 +1,20 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User as AuthUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import User
+from rest_framework.test import APIClient
+
+from .models import ProfileAttributeValue, User
+from .onboarding import import_chunk
 
 class UserModelTests(TestCase):
 
@@ -26,4 +40,161 @@ class UserViewsTests(TestCase):
     def test_user_profile_view(self):
         response = self.client.get(reverse('user_profile', args=[self.user.id]))
         self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'testuser')
\ No newline at end of file
+        self.assertContains(response, 'testuser')
+
+IMPORT_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=IMPORT_HASHERS, USERS_IMPORT_WORKERS=0)
+class UserImportTest(TestCase):
+
+    def setUp(self):
+        User.objects.create(email='taken@example.com')
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def _file(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        return path
+
+    def _run(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_users', path, '--chunk-size', '2', *args, stdout=out, stderr=err)
+        return out.getvalue(), [json.loads(line) for line in err.getvalue().splitlines()]
+
+    def test_csv_import_with_row_errors(self):
+        path = self._file('users.csv', (
+            "email,password,first_name,last_name\n"
+            "Anna@Example.com,Str0ng-pass-1,Anna,Ivanova\n"
+            "anna@example.com,Str0ng-pass-2,,\n"
+            "taken@example.com,Str0ng-pass-3,,\n"
+            "weak@example.com,123,,\n"
+            ",Str0ng-pass-4,,\n"
+            "boris@example.com,Str0ng-pass-5,Boris,\n"
+        ))
+        report = os.path.join(self.tmpdir, 'report.jsonl')
+        out, errors = self._run(path, '--workers', '0', '--report', report)
+        self.assertIn("Done: 2 users created, 4 failed", out)
+        self.assertEqual([e['line'] for e in errors], [3, 4, 5, 6])
+        self.assertEqual(errors[2]['error'], "Неподходящий пароль.")
+        anna = AuthUser.objects.get(username='anna@example.com')
+        self.assertTrue(anna.check_password('Str0ng-pass-1'))
+        self.assertEqual(User.objects.get(email='anna@example.com').first_name, 'Anna')
+        self.assertEqual(User.objects.count(), 3)
+        with open(report, encoding='utf-8') as fh:
+            self.assertEqual([r['status'] for r in map(json.loads, fh)],
+                             ['created', 'error', 'error', 'error', 'error', 'created'])
+
+    def test_jsonl_import_in_process_pool(self):
+        path = self._file('users.jsonl', "\n".join([
+            json.dumps({"email": f"user{i}@example.com", "password": f"Str0ng-pass-{i}"}) for i in range(5)
+        ] + ["{broken"]))
+        out, errors = self._run(path, '--workers', '2')
+        self.assertIn("Done: 5 users created, 1 failed", out)
+        self.assertEqual(errors[0]['line'], 6)
+        self.assertTrue(AuthUser.objects.get(username='user4@example.com').check_password('Str0ng-pass-4'))
+
+    def test_queries_per_chunk_do_not_grow_with_rows(self):
+        def queries(n, offset):
+            records = [(i, {"email": f"q{offset + i}@example.com", "password": "Str0ng-pass"}) for i in range(n)]
+            with CaptureQueriesContext(connection) as ctx:
+                import_chunk(records)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(2, 0), queries(50, 100))
+
+    def test_long_email_and_password_like_user_attributes_are_row_errors(self):
+        long_email = 'a' * 64 + '@' + 'b' * 60 + '.' + 'c' * 60 + '.com'  # валиден, но длиннее username
+        report = import_chunk([
+            (1, {"email": long_email, "password": "Str0ng-pass-1"}),
+            (2, {"email": "ivanovskaya@example.com", "password": "ivanovskaya", "last_name": "Ivanovskaya"}),
+            (3, {"email": "ok@example.com", "password": "Str0ng-pass-3"}),
+        ])
+        self.assertEqual([r['status'] for r in report], ['error', 'error', 'created'])
+        self.assertEqual(report[0]['error'], "Поле email длиннее 150 символов.")
+        self.assertEqual(report[1]['error'], "Неподходящий пароль.")
+        self.assertTrue(any('similar' in message for message in report[1]['details']))
+        self.assertFalse(AuthUser.objects.filter(username=long_email).exists())
+
+    def test_admin_endpoint(self):
+        client = APIClient()
+        items = [{"email": "new@example.com", "password": "Str0ng-pass-1"},
+                 {"email": "taken@example.com", "password": "Str0ng-pass-2"}]
+        client.force_authenticate(AuthUser.objects.create(username='staff', is_staff=False))
+        self.assertEqual(client.post('/users/import/', {"items": items}, format='json').status_code, 403)
+
+        client.force_authenticate(AuthUser.objects.create(username='admin', is_staff=True))
+        response = client.post('/users/import/', {"items": items}, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.json()['results']], ['created', 'error'])
+
+        upload = SimpleUploadedFile('users.csv', b"email,password\nfile@example.com,Str0ng-pass-3\n")
+        response = client.post('/users/import/', {"file": upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.filter(email='file@example.com').exists())
+
+
+class ProfileSegmentTest(TestCase):
+    url = '/api/users/segment/'
+
+    def setUp(self):
+        profiles = {
+            'ann': {"learning_style": "visual", "scales": {"neuroticism": 4.2, "motivation": 2}},
+            'bob': {"learning_style": "visual", "scales": {"neuroticism": 2.0}},
+            'eve': {"learning_style": "auditory", "scales": {"neuroticism": 4.8}},
+            'max': {"learning_style": 7, "scales": {"neuroticism": "high"}},
+            'zoe': {},
+        }
+        for name, profile in profiles.items():
+            User.objects.create(email=f'{name}@example.com', profile=profile)
+        self.client = APIClient()
+
+    def _emails(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(row['email'].split('@')[0] for row in response.json()['results'])
+
+    def test_filters_use_attribute_table(self):
+        self.assertEqual(ProfileAttributeValue.objects.count(), 7)  # значения не того типа не индексируются
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._emails({'learning_style': 'visual', 'neuroticism__gte': '3.5'}), ['ann'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('users_profileattributevalue', ctx.captured_queries[0]['sql'])
+        self.assertEqual(self._emails({'learning_style__in': 'visual,auditory'}), ['ann', 'bob', 'eve'])
+        self.assertEqual(self._emails({'neuroticism__lt': '4.5', 'motivation': '2'}), ['ann'])
+
+    @override_settings(USER_PROFILE_INDEX='expression')
+    def test_expression_strategy_matches_table(self):
+        self.assertEqual(self._emails({'learning_style': 'visual', 'neuroticism__gte': '3.5'}), ['ann'])
+        self.assertEqual(self._emails({'learning_style__in': 'visual,auditory'}), ['ann', 'bob', 'eve'])
+
+    def test_side_table_follows_save(self):
+        bob = User.objects.get(email='bob@example.com')
+        bob.profile = {"learning_style": "visual", "scales": {"neuroticism": 3.9}}
+        bob.save()
+        self.assertEqual(self._emails({'neuroticism__gte': '3.5', 'learning_style': 'visual'}), ['ann', 'bob'])
+        bob.delete()
+        self.assertFalse(ProfileAttributeValue.objects.filter(user_id=bob.pk).exists())
+
+    def test_save_without_attribute_changes_skips_side_table(self):
+        ann = User.objects.get(email='ann@example.com')
+        ann.first_name = 'Ann'
+        ann.profile['notes'] = 'not indexed'
+        with self.assertNumQueries(2):  # UPDATE пользователя и сверка атрибутов, без записи
+            ann.save()
+        with self.assertNumQueries(1):
+            User.objects.create(email='new@example.com', profile={"notes": "not indexed"})
+
+    def test_rebuild_after_bulk_update(self):
+        User.objects.filter(email='zoe@example.com').update(profile={"learning_style": "visual"})
+        self.assertEqual(self._emails({'learning_style': 'visual'}), ['ann', 'bob'])
+        call_command('rebuild_profile_index', stdout=io.StringIO())
+        self.assertEqual(self._emails({'learning_style': 'visual'}), ['ann', 'bob', 'zoe'])
+
+    def test_invalid_filters(self):
+        for params in ({'neurotisism': '3'}, {'neuroticism__gte': 'high'}, {'learning_style__gte': 'a'},
+                       {'neuroticism': 'nan'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+        self.assertEqual(self.client.get(self.url, {'page_size': 2}).json()['results'].__len__(), 2)
@@ -3,7 +3,7 @@ from django.http import JsonResponse
 from .models import UserProfile,User
 from .serializers import UserProfileSerializer,UserSerializer
 from rest_framework import viewsets,generics
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 # from django.contrib.auth import get_user_model
@@ -12,13 +12,41 @@ from django.core import exceptions as django_exceptions
 from django.contrib.auth import authenticate, login, get_user_model, logout
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.views import APIView
+from api.replicas import ReplicaReadMixin
+from api.throttling import AuthRateThrottle
+from api.response_cache import CachedRetrieveMixin
+import io
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.conf import settings
+from .onboarding import import_chunk, read_records
+from .pagination import UserCursorPagination
+from .profile_index import filter_users, parse_filters
+
+class UserList(ReplicaReadMixin, generics.ListCreateAPIView):
+    queryset = User.objects.all()
+    serializer_class = UserSerializer
 
-class UserList(generics.ListCreateAPIView):
+class UserSegmentView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    GET: пользователи, чей профиль подходит под фильтр по объявленным атрибутам
+    (users.profile_index), например ?learning_style=visual&neuroticism__gte=3.5.
+    Фильтр — по индексам (JSON-выражения на PostgreSQL или таблица атрибутов), без загрузки
+    профилей в Python; курсорная пагинация (?cursor=, ?page_size=).
+    """
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = UserCursorPagination
+
+    def get_queryset(self):
+        paginator = self.pagination_class
+        conditions = parse_filters(self.request.query_params,
+                                   ignore=(paginator.cursor_query_param, paginator.page_size_query_param))
+        return filter_users(super().get_queryset(), conditions)
 
-class UserDetail(generics.RetrieveUpdateDestroyAPIView):
+class UserDetail(CachedRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
+    cache_namespace = 'user'
     queryset = User.objects.all()
     serializer_class = UserSerializer
  
@@ -52,6 +80,8 @@ class RegisterView(APIView):
     - если AUTH_USER_MODEL != api.User, пытается создать запись в модели аутентификации (create_user)
     Возвращает сериализованные данные api.User (без пароля).
     """
+    throttle_classes = [AuthRateThrottle]
+
     def post(self, request):
         data = request.data or {}
         email = (data.get('email') or '').strip().lower()
@@ -127,6 +157,61 @@ class RegisterView(APIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class UserImportView(APIView):
+    """
+    Массовый онбординг (только для админов), логика — users.onboarding:
+    - POST multipart: файл "file" (CSV с заголовком или JSONL; формат — поле "format"
+      или расширение файла);
+    - POST JSON: { "items": [ {"email", "password", "first_name", "last_name"}, ... ] } или список.
+    Не больше USERS_IMPORT_MAX_ITEMS записей; большие файлы — командой import_users.
+    Ответ: отчёт по каждой записи ("created" с id users.User или "error").
+    Статус: 201 — всё создано, 207 — частично, 400 — ничего.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        max_items = settings.USERS_IMPORT_MAX_ITEMS
+        upload = request.FILES.get('file')
+        if upload is not None:
+            fmt = request.data.get('format') or ('csv' if upload.name.lower().endswith('.csv') else 'jsonl')
+            if fmt not in ('csv', 'jsonl'):
+                return Response({"error": "format must be 'csv' or 'jsonl'."}, status=status.HTTP_400_BAD_REQUEST)
+            fh = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                records = list(islice(read_records(fh, fmt), max_items + 1))
+            except (UnicodeDecodeError, ValueError) as e:
+                return Response({"error": "Failed to read file.", "detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            payload = request.data
+            items = payload.get('items') if isinstance(payload, dict) else payload
+            if not isinstance(items, list):
+                return Response({"error": "Expected a 'file' upload or a list in 'items'."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            records = list(enumerate(items, start=1))
+        if not records:
+            return Response({"error": "No records to import."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(records) > max_items:
+            return Response({"error": f"Too many records (> {max_items}); use the import_users command."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        workers = settings.USERS_IMPORT_WORKERS
+        if workers and len(records) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = import_chunk(records, executor=pool, workers=workers)
+        else:
+            results = import_chunk(records)
+
+        created = sum(1 for r in results if r["status"] == "created")
+        if created == len(results):
+            status_code = status.HTTP_201_CREATED
+        elif created:
+            status_code = status.HTTP_207_MULTI_STATUS
+        else:
+            status_code = status.HTTP_400_BAD_REQUEST
+        return Response({"created": created, "failed": len(results) - created, "results": results},
+                        status=status_code)
+
+
 try:
     from rest_framework.authtoken.models import Token
     _HAS_TOKEN = True
@@ -140,6 +225,8 @@ class LoginView(APIView):
     Если установлен django-rest-framework authtoken — возвращает token.
     Иначе создаёт сессию (login) и возвращает данные пользователя.
     """
+    throttle_classes = [AuthRateThrottle]
+
     def post(self, request):
         data = request.data or {}
         email = (data.get('email') or '').strip().lower()
@@ -160,14 +247,13 @@ class LoginView(APIView):
 
         # Если установлен TokenAuth — возвращаем токен
         if _HAS_TOKEN:
+            # user — пользователь аутентификации, а не users.User: UserSerializer к нему не подходит
             token, _ = Token.objects.get_or_create(user=user)
-            serializer = UserSerializer(user)
-            return Response({"token": token.key, "user": serializer.data}, status=status.HTTP_200_OK)
+            return Response({"token": token.key, "user": _user_data(user)}, status=status.HTTP_200_OK)
 
         # Иначе делаем session login (cookie) и возвращаем данные пользователя
         login(request, user)
-        serializer = UserSerializer(user)
-        return Response({"message": "Logged in", "user": serializer.data}, status=status.HTTP_200_OK)
+        return Response({"message": "Logged in", "user": _user_data(user)}, status=status.HTTP_200_OK)
 # ...existing code...
 
 logger = logging.getLogger(__name__)
@@ -190,6 +276,19 @@ except Exception:
 
 User = get_user_model()
 
+
+def _user_data(user):
+    """
+    Минимальное представление пользователя аутентификации (get_user_model()).
+    """
+    return {
+        "id": getattr(user, "id", None),
+        "email": getattr(user, "email", None),
+        "first_name": getattr(user, "first_name", ""),
+        "last_name": getattr(user, "last_name", ""),
+        "profile": getattr(user, "profile", None),
+    }
+
 class ProfileView(APIView):
     """
     GET: возвращает профиль текущего пользователя.
@@ -203,14 +302,7 @@ class ProfileView(APIView):
         if _HAS_SERIALIZER and UserSerializer:
             return Response(UserSerializer(user).data, status=status.HTTP_200_OK)
         # fallback: минимальный ответ
-        data = {
-            "id": getattr(user, "id", None),
-            "email": getattr(user, "email", None),
-            "first_name": getattr(user, "first_name", ""),
-            "last_name": getattr(user, "last_name", ""),
-            "profile": getattr(user, "profile", None),
-        }
-        return Response(data, status=status.HTTP_200_OK)
+        return Response(_user_data(user), status=status.HTTP_200_OK)
 
     def patch(self, request):
         return self._update(request, partial=True)